@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Векторизованное совмещение сегментов транскрипции с репликами спикеров
+Реплики хранятся в отсортированных массивах, кандидаты ищутся через searchsorted/bisect
+"""
+
+from bisect import bisect_left
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from segments import UNKNOWN_ID, SegmentTable
+
+# Максимальное расстояние (сек), на котором стратегия еще дает ненулевой счет
+STRATEGY_REACH = {
+    "strict": 0.0,
+    "smart": 3.0,
+    "aggressive": 5.0,
+}
+
+# Запас окна кандидатов (сек): лишние кандидаты безопасны, пропущенные - нет
+WINDOW_MARGIN = 1.0
+
+# Максимальное число пар (сегмент, реплика), обрабатываемых за один проход
+MAX_PAIRS_PER_BATCH = 1 << 21
+
+
+class AlignmentEngine:
+    """
+    Совмещение по интервалам на NumPy
+
+    Дает те же результаты, что и эталонный перебор find_best_speaker
+    (tests/test_alignment.py): счет считается теми же операциями с плавающей точкой, при равенстве
+    счетов побеждает реплика, стоящая раньше во входном списке.
+    Для каждого сегмента рассматриваются только реплики, начало которых
+    попадает в окно [начало - охват - макс. длительность, конец + охват].
+    """
+
+    def __init__(self, speaker_segments):
+        """
+        Args:
+            speaker_segments: Реплики спикеров (SegmentTable или [{"start", "end", "speaker"}])
+        """
+        table = SegmentTable.coerce(speaker_segments)
+
+        # Стабильная сортировка сохраняет исходный порядок для равных начал
+        self.order = np.argsort(table.start, kind="stable")
+        self.starts = table.start[self.order]
+        self.ends = table.end[self.order]
+        self.speaker_ids = table.speaker[self.order]
+        self.speakers = table.speakers
+        self.max_duration = float(np.max(self.ends - self.starts, initial=0.0))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def assign(self, t_starts: Sequence[float], t_ends: Sequence[float],
+               strategy: str = "smart") -> List[str]:
+        """
+        Лучший спикер для каждого сегмента транскрипции
+
+        Args:
+            t_starts: Начала сегментов транскрипции
+            t_ends: Концы сегментов транскрипции
+            strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+
+        Returns:
+            Имена спикеров ("Unknown", если ни одна реплика не дала положительный счет)
+        """
+        return [self.speakers.name(i) for i in self.assign_ids(t_starts, t_ends, strategy).tolist()]
+
+    def assign_ids(self, t_starts: Sequence[float], t_ends: Sequence[float],
+                   strategy: str = "smart") -> np.ndarray:
+        """То же, что assign, но ID спикеров из общего SpeakerIndex (UNKNOWN_ID - не найден)"""
+        t_starts = np.asarray(t_starts, dtype=np.float64)
+        t_ends = np.asarray(t_ends, dtype=np.float64)
+        count = len(t_starts)
+        result = np.full(count, UNKNOWN_ID, dtype=np.int32)
+
+        if count == 0 or len(self) == 0 or strategy not in STRATEGY_REACH:
+            return result
+
+        t_mids = (t_starts + t_ends) / 2
+
+        # Окно кандидатов по началу реплики
+        reach = STRATEGY_REACH[strategy] + WINDOW_MARGIN
+        low = np.minimum(np.minimum(t_starts, t_ends), t_mids) - reach - self.max_duration
+        high = np.maximum(np.maximum(t_starts, t_ends), t_mids) + reach
+        first = np.searchsorted(self.starts, low, side="left")
+        last = np.searchsorted(self.starts, high, side="right")
+        counts = np.maximum(last - first, 0)
+
+        best_turns = np.full(count, -1, dtype=np.int64)
+
+        # Пачки сегментов с ограниченным числом пар
+        cumulative = np.cumsum(counts)
+        batch_start = 0
+        while batch_start < count:
+            offset = cumulative[batch_start - 1] if batch_start else 0
+            batch_end = int(np.searchsorted(cumulative, offset + MAX_PAIRS_PER_BATCH, side="right"))
+            batch_end = min(max(batch_end, batch_start + 1), count)
+
+            self._assign_batch(
+                np.arange(batch_start, batch_end), first, counts,
+                t_starts, t_ends, t_mids, strategy, best_turns
+            )
+            batch_start = batch_end
+
+        found = best_turns >= 0
+        result[found] = self.speaker_ids[best_turns[found]]
+        return result
+
+    def _assign_batch(self, segment_ids: np.ndarray, first: np.ndarray, counts: np.ndarray,
+                      t_starts: np.ndarray, t_ends: np.ndarray, t_mids: np.ndarray,
+                      strategy: str, best_turns: np.ndarray):
+        """Счета для всех пар (сегмент, кандидат) пачки и выбор лучшей реплики"""
+        batch_counts = counts[segment_ids]
+        total = int(batch_counts.sum())
+        if total == 0:
+            return
+
+        # Развертка окон в плоские массивы пар
+        pair_segments = np.repeat(segment_ids, batch_counts)
+        pair_base = np.repeat(np.cumsum(batch_counts) - batch_counts, batch_counts)
+        pair_turns = np.repeat(first[segment_ids], batch_counts) + (np.arange(total) - pair_base)
+
+        scores = self._scores(
+            t_starts[pair_segments], t_ends[pair_segments], t_mids[pair_segments],
+            self.starts[pair_turns], self.ends[pair_turns], strategy
+        )
+
+        positive = scores > 0
+        if not positive.any():
+            return
+        pair_segments = pair_segments[positive]
+        pair_turns = pair_turns[positive]
+        scores = scores[positive]
+
+        # Максимальный счет, при равенстве - реплика раньше во входном списке
+        ranking = np.lexsort((self.order[pair_turns], -scores, pair_segments))
+        ranked_segments = pair_segments[ranking]
+        _, first_in_group = np.unique(ranked_segments, return_index=True)
+        winners = ranking[first_in_group]
+        best_turns[pair_segments[winners]] = pair_turns[winners]
+
+    @staticmethod
+    def _scores(t_start: np.ndarray, t_end: np.ndarray, t_mid: np.ndarray,
+                s_start: np.ndarray, s_end: np.ndarray, strategy: str) -> np.ndarray:
+        """Счета стратегий (те же формулы, что и в эталоне find_best_speaker)"""
+        overlap = np.maximum(0, np.minimum(t_end, s_end) - np.maximum(t_start, s_start))
+
+        if strategy == "strict":
+            return overlap
+
+        if strategy == "smart":
+            min_gap = np.minimum(np.abs(t_mid - s_start), np.abs(t_mid - s_end))
+            gap_to_mid = np.abs(t_mid - (s_start + s_end) / 2)
+            proximity = np.where(
+                min_gap < 2.0, np.maximum(0, 2.0 - min_gap),
+                np.where(gap_to_mid < 3.0, np.maximum(0, 1.0 - gap_to_mid / 3.0), 0.0)
+            )
+        else:
+            min_distance = np.minimum.reduce([
+                np.abs(t_start - s_start), np.abs(t_start - s_end),
+                np.abs(t_end - s_start), np.abs(t_end - s_end),
+                np.abs(t_mid - s_start), np.abs(t_mid - s_end)
+            ])
+            proximity = np.where(min_distance < 5.0, np.maximum(0, 5.0 - min_distance), 0.0)
+
+        return np.where(overlap > 0, overlap * 10, proximity)
+
+
+class MidpointIndex:
+    """
+    Поиск ближайшей по средней точке реплики через bisect
+
+    Эквивалентен линейному поиску find_nearest_speaker (tests/test_alignment.py):
+    расстояния считаются так же, при равенстве побеждает реплика раньше во входном списке.
+    """
+
+    def __init__(self, speaker_segments):
+        """
+        Args:
+            speaker_segments: Реплики спикеров (SegmentTable или [{"start", "end", "speaker"}])
+        """
+        table = SegmentTable.coerce(speaker_segments)
+        mids = {}
+        for index, mid in enumerate(((table.start + table.end) / 2).tolist()):
+            # Для одинаковых средних точек достаточно первой реплики
+            if mid == mid and mid not in mids:
+                mids[mid] = index
+
+        self.mids = sorted(mids)
+        self.first_index = [mids[mid] for mid in self.mids]
+        self.speaker_ids = table.speaker.tolist()
+        self.speakers = table.speakers
+
+    def nearest(self, t_mid: float) -> Tuple[Optional[str], float]:
+        """
+        Ближайший спикер и расстояние до средней точки его реплики
+
+        Returns:
+            (спикер, расстояние) или (None, inf), если реплик нет
+        """
+        speaker_id, distance = self.nearest_id(t_mid)
+        return (None if speaker_id is None else self.speakers.name(speaker_id)), distance
+
+    def nearest_id(self, t_mid: float) -> Tuple[Optional[int], float]:
+        """То же, что nearest, но ID спикера"""
+        if t_mid != t_mid:
+            return None, float("inf")
+
+        position = bisect_left(self.mids, t_mid)
+        best_distance = float("inf")
+        best_index = None
+
+        # Расстояние монотонно по обе стороны от t_mid: идем от соседей наружу,
+        # пока расстояние не превышает лучшее (равные нужны для выбора по порядку)
+        for step, start in ((-1, position - 1), (1, position)):
+            candidate = start
+            while 0 <= candidate < len(self.mids):
+                distance = abs(t_mid - self.mids[candidate])
+                if distance > best_distance:
+                    break
+                index = self.first_index[candidate]
+                if distance < best_distance or index < best_index:
+                    best_distance = distance
+                    best_index = index
+                candidate += step
+
+        if best_index is None:
+            return None, best_distance
+        return self.speaker_ids[best_index], best_distance
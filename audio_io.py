@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Загрузка аудио и его представление в памяти
+Аудио декодируется один раз и передается всем этапам пайплайна
+"""
+
+import math
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+import numpy as np
+
+# Whisper, HF pipeline и pyannote работают с 16 кГц моно
+TARGET_SAMPLE_RATE = 16000
+
+# Размер блока потокового декодера по умолчанию (секунды)
+DEFAULT_BLOCK_DURATION = 30.0
+
+
+@dataclass
+class AudioData:
+    """Декодированное аудио: моно float32 массив с частотой дискретизации"""
+    waveform: np.ndarray
+    sample_rate: int = TARGET_SAMPLE_RATE
+    source_path: Optional[str] = None
+    # Смещение начала окна относительно начала исходного файла (секунды)
+    offset: float = 0.0
+    # Хеш содержимого исходного файла (заполняется, если включены кеши)
+    content_hash: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Длительность аудио в секундах"""
+        return len(self.waveform) / self.sample_rate if self.sample_rate else 0.0
+
+    def trim(self, max_duration: float) -> "AudioData":
+        """Возвращает первые max_duration секунд (без копирования данных)"""
+        max_samples = int(max_duration * self.sample_rate)
+        if len(self.waveform) <= max_samples:
+            return self
+        return replace(self, waveform=self.waveform[:max_samples])
+
+    def window(self, start: float = 0.0, end: Optional[float] = None) -> "AudioData":
+        """Окно [start, end) в секундах относительно начала массива (без копирования)"""
+        first = max(0, int(start * self.sample_rate))
+        last = len(self.waveform) if end is None else max(first, int(end * self.sample_rate))
+        if first == 0 and last >= len(self.waveform):
+            return self
+        return replace(self, waveform=self.waveform[first:last],
+                       offset=self.offset + first / self.sample_rate)
+
+    def to_pyannote(self) -> Dict:
+        """Формат входных данных для pyannote: {"waveform": (channel, time), "sample_rate"}"""
+        import torch
+
+        waveform = torch.from_numpy(np.ascontiguousarray(self.waveform, dtype=np.float32))
+        return {"waveform": waveform.unsqueeze(0), "sample_rate": self.sample_rate}
+
+
+class StreamingDecoder:
+    """
+    Потоковый декодер аудио с ограниченным потреблением памяти
+    
+    Выдает блоки фиксированного размера (моно float32, целевая частота) и
+    поддерживает чтение произвольных временных окон. Бэкенды:
+    soundfile (блочное чтение + потоковый ресемплинг soxr), ffmpeg (pipe),
+    librosa (запасной вариант, декодирует запрошенное окно целиком).
+    """
+    
+    def __init__(self, audio_path: Union[str, Path], sample_rate: int = TARGET_SAMPLE_RATE,
+                 block_duration: float = DEFAULT_BLOCK_DURATION, backend: Optional[str] = None):
+        """
+        Args:
+            audio_path: Путь к аудиофайлу
+            sample_rate: Целевая частота дискретизации
+            block_duration: Длительность одного блока в секундах
+            backend: Бэкенд декодирования (soundfile, ffmpeg, librosa), по умолчанию - автовыбор
+        """
+        self.audio_path = str(audio_path)
+        self.sample_rate = sample_rate
+        self.block_size = max(1, int(block_duration * sample_rate))
+        self.backend = backend or self._select_backend()
+        self._duration = None
+    
+    def _select_backend(self) -> str:
+        """Выбор самого дешевого бэкенда, который умеет читать файл"""
+        try:
+            import soundfile as sf
+            sf.info(self.audio_path)
+            return "soundfile"
+        except Exception:
+            pass
+        
+        if shutil.which("ffmpeg"):
+            return "ffmpeg"
+        
+        return "librosa"
+    
+    @property
+    def duration(self) -> float:
+        """Длительность файла в секундах (без декодирования)"""
+        if self._duration is None:
+            self._duration = probe_duration(self.audio_path, self.backend)
+        return self._duration
+    
+    def blocks(self, start: float = 0.0, end: Optional[float] = None) -> Iterator[np.ndarray]:
+        """
+        Итератор по блокам фиксированного размера (последний блок может быть короче)
+        
+        Args:
+            start: Начало окна в секундах
+            end: Конец окна в секундах (None - до конца файла)
+        """
+        if end is not None and end <= start:
+            return
+        
+        if self.backend == "soundfile":
+            chunks = self._soundfile_chunks(start, end)
+        elif self.backend == "ffmpeg":
+            chunks = self._ffmpeg_chunks(start, end)
+        else:
+            chunks = self._librosa_chunks(start, end)
+        
+        yield from _rebatch(chunks, self.block_size)
+    
+    def read(self, start: float = 0.0, end: Optional[float] = None) -> AudioData:
+        """
+        Чтение временного окна в один массив
+        
+        Буфер выделяется заранее по длительности файла, поэтому пиковая память
+        равна размеру результата плюс один блок.
+        """
+        window_end = self.duration if end is None else min(end, self.duration)
+        expected = max(0, int(round((window_end - start) * self.sample_rate)))
+        
+        waveform = np.empty(expected, dtype=np.float32)
+        filled = 0
+        for block in self.blocks(start, end):
+            if filled + len(block) > len(waveform):
+                # Оценка длительности оказалась заниженной - расширяем буфер
+                grown = np.empty(max(filled + len(block), len(waveform) * 2), dtype=np.float32)
+                grown[:filled] = waveform[:filled]
+                waveform = grown
+            waveform[filled:filled + len(block)] = block
+            filled += len(block)
+        
+        return AudioData(waveform[:filled], self.sample_rate, self.audio_path, offset=start)
+    
+    def _soundfile_chunks(self, start: float, end: Optional[float]) -> Iterator[np.ndarray]:
+        """Блочное чтение через soundfile с потоковым ресемплингом"""
+        import soundfile as sf
+        
+        with sf.SoundFile(self.audio_path) as f:
+            source_rate = f.samplerate
+            start_frame = min(int(start * source_rate), f.frames)
+            end_frame = f.frames if end is None else min(int(end * source_rate), f.frames)
+            f.seek(start_frame)
+            
+            resampler = None
+            if source_rate != self.sample_rate:
+                import soxr
+                resampler = soxr.ResampleStream(source_rate, self.sample_rate, 1, dtype="float32")
+            
+            read_size = max(1, math.ceil(self.block_size * source_rate / self.sample_rate))
+            remaining = end_frame - start_frame
+            
+            while remaining > 0:
+                data = f.read(min(read_size, remaining), dtype="float32", always_2d=True)
+                if len(data) == 0:
+                    break
+                remaining -= len(data)
+                mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+                
+                if resampler is not None:
+                    mono = resampler.resample_chunk(mono, last=remaining <= 0)
+                yield mono
+            
+            if resampler is not None and remaining > 0:
+                # Файл закончился раньше заявленного - сбрасываем хвост ресемплера
+                yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+    
+    def _ffmpeg_chunks(self, start: float, end: Optional[float]) -> Iterator[np.ndarray]:
+        """Декодирование через ffmpeg pipe (ffmpeg сам делает даунмикс и ресемплинг)"""
+        command = ["ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error"]
+        if start > 0:
+            command += ["-ss", f"{start:.3f}"]
+        command += ["-i", self.audio_path]
+        if end is not None:
+            command += ["-t", f"{end - start:.3f}"]
+        command += ["-f", "f32le", "-ac", "1", "-ar", str(self.sample_rate), "-"]
+        
+        # stderr пишется во временный файл: pipe, который читается только после
+        # wait(), при многословных ошибках заполняется и блокирует ffmpeg
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+            block_bytes = self.block_size * 4
+            try:
+                while True:
+                    raw = process.stdout.read(block_bytes)
+                    if not raw:
+                        break
+                    # Отбрасываем неполный сэмпл на случай обрыва потока
+                    raw = raw[:len(raw) - len(raw) % 4]
+                    yield np.frombuffer(raw, dtype=np.float32)
+                
+                if process.wait() != 0:
+                    stderr.seek(0)
+                    error = stderr.read().decode(errors="replace").strip()
+                    raise RuntimeError(f"ffmpeg завершился с ошибкой: {error}")
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+                process.stdout.close()
+    
+    def _librosa_chunks(self, start: float, end: Optional[float]) -> Iterator[np.ndarray]:
+        """Запасной вариант: librosa декодирует окно целиком"""
+        import librosa
+        
+        duration = None if end is None else end - start
+        audio, _ = librosa.load(self.audio_path, sr=self.sample_rate, mono=True,
+                                offset=start, duration=duration)
+        yield np.asarray(audio, dtype=np.float32)
+
+
+def _rebatch(chunks: Iterator[np.ndarray], block_size: int) -> Iterator[np.ndarray]:
+    """Перенарезка потока массивов произвольной длины в блоки фиксированного размера"""
+    buffer = np.empty(block_size, dtype=np.float32)
+    filled = 0
+    
+    for chunk in chunks:
+        position = 0
+        while position < len(chunk):
+            take = min(block_size - filled, len(chunk) - position)
+            buffer[filled:filled + take] = chunk[position:position + take]
+            filled += take
+            position += take
+            
+            if filled == block_size:
+                yield buffer.copy()
+                filled = 0
+    
+    if filled:
+        yield buffer[:filled].copy()
+
+
+def probe_duration(audio_path: Union[str, Path], backend: Optional[str] = None) -> float:
+    """
+    Длительность аудиофайла в секундах без полного декодирования
+    
+    Args:
+        audio_path: Путь к аудиофайлу
+        backend: Подсказка, каким бэкендом файл читается
+    """
+    audio_path = str(audio_path)
+    
+    if backend in (None, "soundfile"):
+        try:
+            import soundfile as sf
+            info = sf.info(audio_path)
+            return info.frames / info.samplerate
+        except Exception:
+            pass
+    
+    if shutil.which("ffprobe"):
+        try:
+            output = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=noprint_wrappers=1:nokey=1", audio_path],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+            return float(output)
+        except (subprocess.CalledProcessError, ValueError):
+            pass
+    
+    import librosa
+    return float(librosa.get_duration(path=audio_path))
+
+
+def load_audio(audio_path: Union[str, Path], sample_rate: int = TARGET_SAMPLE_RATE,
+               start: float = 0.0, end: Optional[float] = None) -> AudioData:
+    """
+    Декодирование аудиофайла в моно float32 с ресемплингом
+    
+    Декодирование идет блоками через StreamingDecoder, без временных WAV файлов
+    и без промежуточных копий сигнала в исходной частоте дискретизации.
+    Если задано окно, декодер перематывает к start и читает только его.
+
+    Args:
+        audio_path: Путь к аудиофайлу
+        sample_rate: Целевая частота дискретизации
+        start: Начало окна в секундах
+        end: Конец окна в секундах (None - до конца файла)
+
+    Returns:
+        Декодированное аудио
+    """
+    return StreamingDecoder(audio_path, sample_rate=sample_rate).read(start, end)
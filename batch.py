@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Пакетная обработка: каталог, glob или JSONL-манифест
+Модели загружаются один раз, процессор остается "теплым" между файлами
+"""
+
+import glob
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Расширения, которые берутся из каталога (см. "Поддерживаемые форматы" в README)
+AUDIO_EXTENSIONS = {
+    ".wav", ".mp3", ".m4a", ".flac", ".ogg", ".wma",
+    ".mp4", ".avi", ".mkv", ".mov"
+}
+
+# Параметры process(), которые можно переопределить в строке манифеста
+MANIFEST_OPTIONS = {
+    "min_speakers", "max_speakers", "min_segment_duration",
+    "alignment_strategy", "time_limit", "start", "end"
+}
+
+# Параметры process(), относящиеся к этапу декодирования
+DECODE_OPTIONS = {"time_limit", "start", "end"}
+
+
+@dataclass
+class BatchItem:
+    """Один файл пакета"""
+    audio_path: Path
+    output_dir: Path
+    # Переопределения параметров process() из манифеста
+    options: Dict = field(default_factory=dict)
+
+    @property
+    def result_path(self) -> Path:
+        return self.output_dir / f"{self.audio_path.stem}_result.json"
+
+
+def is_batch_input(spec: str) -> bool:
+    """Является ли аргумент каталогом, glob-шаблоном или JSONL-манифестом"""
+    path = Path(spec)
+    if path.is_dir() or path.suffix.lower() == ".jsonl":
+        return True
+    return not path.exists() and any(char in spec for char in "*?[")
+
+
+def collect_batch_items(spec: str, output_dir: str) -> List[BatchItem]:
+    """
+    Список файлов пакета
+
+    Args:
+        spec: Каталог (рекурсивно), glob-шаблон или JSONL-манифест
+              (строки вида {"audio": "path", "output": "dir", "start": 0, ...})
+        output_dir: Базовая директория результатов
+
+    Returns:
+        Файлы в стабильном порядке
+    """
+    path = Path(spec)
+    output_root = Path(output_dir)
+
+    if path.suffix.lower() == ".jsonl" and path.is_file():
+        return _collect_from_manifest(path, output_root)
+
+    if path.is_dir():
+        # Структура подкаталогов сохраняется, чтобы одинаковые имена не конфликтовали
+        files = sorted(f for f in path.rglob("*")
+                       if f.is_file() and f.suffix.lower() in AUDIO_EXTENSIONS)
+        return [BatchItem(f, output_root / f.parent.relative_to(path)) for f in files]
+
+    files = sorted(Path(f) for f in glob.glob(spec, recursive=True))
+    return [BatchItem(f, output_root) for f in files if f.is_file()]
+
+
+def _collect_from_manifest(manifest_path: Path, output_root: Path) -> List[BatchItem]:
+    items = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{manifest_path}:{line_number}: некорректный JSON: {e}")
+
+            audio = entry.get("audio") or entry.get("path")
+            if not audio:
+                raise ValueError(f"{manifest_path}:{line_number}: не указано поле 'audio'")
+
+            # Относительные пути - от каталога манифеста
+            audio_path = Path(audio)
+            if not audio_path.is_absolute():
+                audio_path = manifest_path.parent / audio_path
+
+            item_output = Path(entry["output"]) if entry.get("output") else output_root
+            options = {k: v for k, v in entry.items() if k in MANIFEST_OPTIONS}
+            items.append(BatchItem(audio_path, item_output, options))
+
+    return items
+
+
+class BatchRunner:
+    """Последовательная обработка пакета одним экземпляром AudioProcessor"""
+
+    def __init__(self, processor, process_options: Optional[Dict] = None,
+                 skip_existing: bool = True):
+        """
+        Args:
+            processor: Загруженный AudioProcessor (переиспользуется для всех файлов)
+            process_options: Общие параметры process()
+            skip_existing: Пропускать файлы, для которых уже есть *_result.json
+        """
+        self.processor = processor
+        self.process_options = process_options or {}
+        self.skip_existing = skip_existing
+
+    def run(self, items: List[BatchItem], report_path: Optional[Path] = None) -> Dict:
+        """
+        Обработка всех файлов с отчетом по каждому
+
+        Ошибка на одном файле не останавливает пакет.
+
+        Returns:
+            Отчет: сводка и статус каждого файла
+        """
+        batch_start = time.time()
+        records = []
+
+        for index, item in enumerate(items, 1):
+            print(f"\n📦 [{index}/{len(items)}] {item.audio_path}")
+            records.append(self._process_item(item))
+
+        return self._finish(records, batch_start, report_path)
+
+    def _finish(self, records: List[Dict], batch_start: float, report_path: Optional[Path],
+                extra: Optional[Dict] = None) -> Dict:
+        report = {
+            "summary": summarize_records(records, time.time() - batch_start),
+            "files": records
+        }
+        if extra:
+            report.update(extra)
+
+        if report_path is not None:
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Отчет пакета сохранен: {report_path}")
+
+        print_batch_summary(report)
+        return report
+
+    def _skipped_record(self, item: BatchItem) -> Optional[Dict]:
+        """Запись отчета для уже обработанного файла или None"""
+        if self.skip_existing and item.result_path.exists():
+            print(f"⏭️  Результат уже есть: {item.result_path}")
+            return {"audio_file": str(item.audio_path), "output_dir": str(item.output_dir),
+                    "status": "skipped"}
+        return None
+
+    def _process_item(self, item: BatchItem) -> Dict:
+        skipped = self._skipped_record(item)
+        if skipped is not None:
+            return skipped
+
+        record = {"audio_file": str(item.audio_path), "output_dir": str(item.output_dir)}
+
+        item_start = time.time()
+        try:
+            options = {**self.process_options, **item.options}
+            result = self.processor.process(str(item.audio_path), str(item.output_dir), **options)
+            record.update(result_record(result))
+            record["status"] = "ok"
+        except Exception as e:
+            print(f"❌ Ошибка обработки {item.audio_path}: {e}")
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+
+        record["wall_time"] = time.time() - item_start
+        return record
+
+
+class PrefetchingBatchRunner(BatchRunner):
+    """
+    Конвейер пакета: декодирование следующих файлов во время инференса текущего
+
+    Пул потоков декодирует следующие файлы, пока текущий находится в инференсе.
+    Инференс и запись идут через process() в основном потоке, поэтому модели не
+    используются конкурентно, а контрольные точки (job_dir) работают как при
+    последовательной обработке. Время декодирования входит в total_time файла,
+    хотя и перекрывается с инференсом предыдущего. Память ограничена: заранее
+    декодируется не больше prefetch файлов.
+    """
+
+    def __init__(self, processor, process_options: Optional[Dict] = None,
+                 skip_existing: bool = True, prefetch: int = 2, decode_workers: int = 2):
+        """
+        Args:
+            processor: Загруженный AudioProcessor
+            process_options: Общие параметры process()
+            skip_existing: Пропускать файлы, для которых уже есть *_result.json
+            prefetch: Сколько файлов декодировать заранее
+            decode_workers: Потоков декодирования
+        """
+        super().__init__(processor, process_options, skip_existing)
+        self.prefetch = max(1, prefetch)
+        self.decode_workers = max(1, decode_workers)
+
+    def run(self, items: List[BatchItem], report_path: Optional[Path] = None) -> Dict:
+        batch_start = time.time()
+        records: List[Optional[Dict]] = [None] * len(items)
+
+        pending = []
+        for index, item in enumerate(items):
+            skipped = self._skipped_record(item)
+            if skipped is not None:
+                records[index] = skipped
+            else:
+                pending.append(index)
+
+        with ThreadPoolExecutor(max_workers=self.decode_workers,
+                                thread_name_prefix="decode") as decoder:
+            futures = {}
+
+            def schedule(position: int):
+                if position < len(pending) and position not in futures:
+                    futures[position] = decoder.submit(self._decode_item, items[pending[position]])
+
+            for position in range(min(self.prefetch + 1, len(pending))):
+                schedule(position)
+
+            for position, index in enumerate(pending):
+                # Держим prefetch файлов в декодировании впереди текущего
+                schedule(position + self.prefetch)
+                item = items[index]
+                print(f"\n📦 [{index + 1}/{len(items)}] {item.audio_path}")
+                records[index] = self._process_decoded(item, futures.pop(position))
+
+        return self._finish(records, batch_start, report_path)
+
+    def _decode_item(self, item: BatchItem) -> tuple:
+        """Декодирование в фоновом потоке: (аудио, время декодирования)"""
+        options = {**self.process_options, **item.options}
+        decode_options = {k: v for k, v in options.items() if k in DECODE_OPTIONS}
+        decode_start = time.time()
+        audio = self.processor.decode(str(item.audio_path), **decode_options)
+        return audio, time.time() - decode_start
+
+    def _process_decoded(self, item: BatchItem, decode_future) -> Dict:
+        """Инференс и запись одного файла через process() с заранее декодированным аудио"""
+        record = {"audio_file": str(item.audio_path), "output_dir": str(item.output_dir)}
+        options = {**self.process_options, **item.options}
+        process_options = {k: v for k, v in options.items() if k not in DECODE_OPTIONS}
+
+        wait_start = time.time()
+        try:
+            audio, decode_time = decode_future.result()
+            record["decode_wait"] = time.time() - wait_start
+
+            item_start = time.time()
+            result = self.processor.process(audio, str(item.output_dir), decode_time=decode_time,
+                                            **process_options)
+            record["wall_time"] = time.time() - item_start
+        except Exception as e:
+            print(f"❌ Ошибка обработки {item.audio_path}: {e}")
+            record["status"] = "failed"
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+
+        record.update(result_record(result))
+        record["status"] = "ok"
+        return record
+
+
+def estimate_duration(item: BatchItem, options: Optional[Dict] = None) -> float:
+    """
+    Длительность обрабатываемой части файла для планирования (с учетом окна и time_limit)
+
+    Returns:
+        Секунды; 0.0, если длительность определить не удалось
+    """
+    from audio_io import probe_duration
+
+    try:
+        duration = probe_duration(item.audio_path)
+    except Exception:
+        return 0.0
+
+    options = {**(options or {}), **item.options}
+    start = options.get("start") or 0.0
+    if options.get("end") is not None:
+        duration = min(duration, options["end"])
+    duration = max(0.0, duration - start)
+    if options.get("time_limit"):
+        duration = min(duration, options["time_limit"])
+    return duration
+
+
+def longest_first(indices: List[int], durations: Dict[int, float]) -> List[int]:
+    """
+    Порядок выдачи файлов процессам: сначала самые длинные (LPT)
+
+    Процессы берут следующий файл по мере освобождения, поэтому короткие
+    файлы в конце очереди выравнивают нагрузку, а длинный файл не достается
+    последним одному процессу, пока остальные простаивают.
+    """
+    return sorted(indices, key=lambda index: -durations.get(index, 0.0))
+
+
+# Процессор, загруженный в основном процессе до fork (общие веса, --share-models)
+_shared_processor = None
+
+
+def _pool_worker(worker_id: int, processor_kwargs: Optional[Dict], process_options: Dict,
+                 num_threads: int, cpus: Optional[List[int]], tasks, results):
+    """
+    Процесс пула: файлы из общей очереди до сигнала None
+
+    Без processor_kwargs используется процессор, унаследованный от основного
+    процесса через fork, иначе загружается собственный.
+    """
+    from parallel import process_memory, set_thread_budget
+
+    set_thread_budget(num_threads, cpus)
+
+    load_start = time.time()
+    if processor_kwargs is None:
+        processor = _shared_processor
+    else:
+        try:
+            from main import AudioProcessor
+            processor = AudioProcessor(**processor_kwargs)
+        except Exception as e:
+            results.put(("failed", worker_id, f"{type(e).__name__}: {e}"))
+            return
+    results.put(("ready", worker_id, time.time() - load_start, process_memory(),
+                 getattr(processor, "load_timings", [])))
+
+    runner = BatchRunner(processor, process_options, skip_existing=False)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        index, item = task
+        results.put(("start", worker_id, index))
+        print(f"\n📦 [процесс {worker_id}] {item.audio_path}")
+        results.put(("done", worker_id, index, runner._process_item(item)))
+
+    results.put(("exit", worker_id, process_memory()))
+
+
+class WorkerPoolBatchRunner(BatchRunner):
+    """
+    Пакет в N процессах, у каждого свой AudioProcessor
+
+    Каждый процесс получает фиксированный бюджет потоков torch и, по желанию,
+    собственный набор ядер, чтобы процессы не конкурировали за одни и те же
+    ядра. Файлы выдаются из общей очереди в порядке убывания длительности.
+
+    По умолчанию модели загружаются в каждом процессе (spawn): память - N копий
+    моделей. С share_models модели загружаются один раз в основном процессе,
+    веса переносятся в разделяемую память, а процессы создаются через fork
+    и используют одну копию (только CPU).
+    """
+
+    # Период проверки, что процессы пула живы (секунды)
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, processor_kwargs: Dict, process_options: Optional[Dict] = None,
+                 skip_existing: bool = True, workers: int = 2,
+                 threads_per_worker: Optional[int] = None, pin_cpus: bool = False,
+                 share_models: bool = False):
+        """
+        Args:
+            processor_kwargs: Параметры AudioProcessor для процессов пула
+            process_options: Общие параметры process()
+            skip_existing: Пропускать файлы, для которых уже есть *_result.json
+            workers: Количество процессов
+            threads_per_worker: Потоки torch на процесс (по умолчанию - ядра поровну)
+            pin_cpus: Привязать каждый процесс к своему набору ядер
+            share_models: Загрузить модели один раз и разделить веса между процессами (fork)
+        """
+        from parallel import default_worker_threads
+
+        if workers < 1:
+            raise ValueError("Количество процессов должно быть положительным")
+        super().__init__(None, process_options, skip_existing)
+        self.processor_kwargs = processor_kwargs
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or default_worker_threads(workers)
+        self.pin_cpus = pin_cpus
+        self.share_models = share_models
+
+    def run(self, items: List[BatchItem], report_path: Optional[Path] = None) -> Dict:
+        batch_start = time.time()
+        records: List[Optional[Dict]] = [None] * len(items)
+
+        pending = []
+        for index, item in enumerate(items):
+            skipped = self._skipped_record(item)
+            if skipped is not None:
+                records[index] = skipped
+            else:
+                pending.append(index)
+
+        durations = {index: estimate_duration(items[index], self.process_options) for index in pending}
+        order = longest_first(pending, durations)
+
+        pool = {"workers": []}
+        if order:
+            pool = self._run_pool(items, order, durations, records)
+
+        return self._finish(records, batch_start, report_path, pool)
+
+    def _load_shared_processor(self) -> Dict:
+        """
+        Загрузка моделей в основном процессе перед fork
+
+        Returns:
+            Раздел отчета: размер общих весов и память основного процесса
+        """
+        global _shared_processor
+        from parallel import process_memory, set_thread_budget
+
+        # Основной процесс не запускает пул потоков OpenMP: после fork
+        # он неработоспособен в дочерних процессах
+        set_thread_budget(1)
+
+        from main import AudioProcessor
+
+        _shared_processor = AudioProcessor(**self.processor_kwargs)
+        shared = _shared_processor.share_memory()
+        memory = process_memory()
+        print(f"🔗 Веса моделей в разделяемой памяти: {shared / 1024 ** 2:.0f} МБ "
+              f"(RSS основного процесса {memory['rss'] / 1024 ** 2:.0f} МБ)")
+        return {"shared_weights": shared, "parent_memory": memory,
+                "load_time": _shared_processor.load_time, "load_steps": _shared_processor.load_timings}
+
+    def _run_pool(self, items: List[BatchItem], order: List[int], durations: Dict[int, float],
+                  records: List[Optional[Dict]]) -> Dict:
+        """Запуск процессов, раздача файлов и сбор записей отчета; возвращает раздел отчета о пуле"""
+        import multiprocessing
+        from parallel import worker_cpu_sets
+
+        pool = {}
+        if self.share_models:
+            if "fork" not in multiprocessing.get_all_start_methods():
+                raise RuntimeError("Общие веса требуют fork, а он недоступен на этой платформе")
+            pool["shared_models"] = self._load_shared_processor()
+
+        count = min(self.workers, len(order))
+        cpu_sets = worker_cpu_sets(count, self.threads_per_worker) if self.pin_cpus else None
+        if self.pin_cpus and cpu_sets is None:
+            print(f"⚠️  Привязка к ядрам недоступна: нужно {count * self.threads_per_worker} ядер")
+
+        print(f"🚀 Пул пакета: {count} процессов × {self.threads_per_worker} потоков torch"
+              f"{', привязка к ядрам' if cpu_sets else ''}{', общие веса (fork)' if self.share_models else ''}"
+              f"; файлы - от длинных к коротким")
+
+        context = multiprocessing.get_context("fork" if self.share_models else "spawn")
+        tasks = context.Queue()
+        results = context.Queue()
+        worker_kwargs = None if self.share_models else self.processor_kwargs
+
+        stats = [{"worker": worker_id, "cpus": cpu_sets[worker_id] if cpu_sets else None,
+                  "threads": self.threads_per_worker, "files": 0, "audio_duration": 0.0,
+                  "busy_time": 0.0, "load_time": None, "load_steps": [],
+                  "memory_ready": None, "memory": None}
+                 for worker_id in range(count)]
+        processes = [
+            context.Process(
+                target=_pool_worker, name=f"batch-worker-{worker_id}", daemon=True,
+                args=(worker_id, worker_kwargs, self.process_options, self.threads_per_worker,
+                      stats[worker_id]["cpus"], tasks, results)
+            )
+            for worker_id in range(count)
+        ]
+        # Процессы создаются до первой записи в очередь: при fork в основном
+        # процессе еще нет фонового потока очереди
+        for process in processes:
+            process.start()
+        for index in order:
+            tasks.put((index, items[index]))
+        for _ in range(count):
+            tasks.put(None)
+
+        ready_at = {}
+        in_flight = {}
+        alive = set(range(count))
+        remaining = len(order)
+        try:
+            while alive:
+                try:
+                    message = results.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    remaining -= self._reap_dead_workers(processes, alive, in_flight, items, records)
+                    continue
+
+                kind, worker_id = message[:2]
+                if kind == "ready":
+                    ready_at[worker_id] = time.time()
+                    (stats[worker_id]["load_time"], stats[worker_id]["memory_ready"],
+                     stats[worker_id]["load_steps"]) = message[2:]
+                elif kind == "start":
+                    in_flight[worker_id] = message[2]
+                elif kind == "done":
+                    index, record = message[2:]
+                    in_flight.pop(worker_id, None)
+                    records[index] = record
+                    remaining -= 1
+                    stats[worker_id]["files"] += 1
+                    stats[worker_id]["busy_time"] += record.get("wall_time", 0.0)
+                    if record["status"] == "ok":
+                        stats[worker_id]["audio_duration"] += record.get("audio_duration", 0.0)
+                elif kind == "failed":
+                    print(f"❌ Процесс {worker_id} не смог загрузить модели: {message[2]}")
+                    alive.discard(worker_id)
+                elif kind == "exit":
+                    stats[worker_id]["memory"] = message[2]
+                    alive.discard(worker_id)
+        finally:
+            finished = time.time()
+            for process in processes:
+                process.join(timeout=self.POLL_INTERVAL)
+                if process.is_alive():
+                    process.terminate()
+
+        # Файлы, до которых не дошла очередь: все процессы пула завершились
+        for index in order:
+            if records[index] is None:
+                records[index] = {"audio_file": str(items[index].audio_path),
+                                  "output_dir": str(items[index].output_dir),
+                                  "status": "failed", "error": "RuntimeError: нет работающих процессов пула"}
+
+        for worker_id, worker in enumerate(stats):
+            # Доля времени от готовности процесса до конца пакета, занятая файлами
+            active = finished - ready_at[worker_id] if worker_id in ready_at else 0.0
+            worker["utilization"] = worker["busy_time"] / active if active > 0 else 0.0
+        pool["workers"] = stats
+        return pool
+
+    def _reap_dead_workers(self, processes, alive: set, in_flight: Dict[int, int],
+                           items: List[BatchItem], records: List[Optional[Dict]]) -> int:
+        """Процессы, завершившиеся аварийно: файл в обработке отмечается ошибкой; возвращает число таких файлов"""
+        lost = 0
+        for worker_id in list(alive):
+            process = processes[worker_id]
+            if process.is_alive():
+                continue
+            alive.discard(worker_id)
+            print(f"❌ Процесс {worker_id} завершился с кодом {process.exitcode}")
+            index = in_flight.pop(worker_id, None)
+            if index is not None:
+                records[index] = {"audio_file": str(items[index].audio_path),
+                                  "output_dir": str(items[index].output_dir), "status": "failed",
+                                  "error": f"RuntimeError: процесс пула завершился с кодом {process.exitcode}"}
+                lost += 1
+        return lost
+
+
+def result_record(result: Dict) -> Dict:
+    """Поля результата process(), попадающие в отчет пакета"""
+    window = result.get("time_window", {})
+    return {
+        "audio_duration": window.get("end", 0.0) - window.get("start", 0.0),
+        "segments": len(result.get("segments", [])),
+        "transcription_time": result.get("transcription_time"),
+        "diarization_time": result.get("diarization_time"),
+    }
+
+
+def summarize_records(records: List[Dict], wall_time: float) -> Dict:
+    """Сводка пакета: количество по статусам и пропускная способность"""
+    processed = [r for r in records if r["status"] == "ok"]
+    audio_seconds = sum(r.get("audio_duration", 0.0) for r in processed)
+
+    return {
+        "total": len(records),
+        "ok": len(processed),
+        "failed": sum(1 for r in records if r["status"] == "failed"),
+        "skipped": sum(1 for r in records if r["status"] == "skipped"),
+        "audio_hours": audio_seconds / 3600,
+        "wall_hours": wall_time / 3600,
+        # Часов аудио на час работы
+        "throughput": audio_seconds / wall_time if wall_time > 0 else 0.0,
+    }
+
+
+def print_batch_summary(report: Dict):
+    summary = report["summary"]
+    print("\n📊 Итоги пакета:")
+    print(f"   • Всего файлов: {summary['total']}")
+    print(f"   • Обработано: {summary['ok']}")
+    print(f"   • Пропущено (уже есть результат): {summary['skipped']}")
+    print(f"   • Ошибок: {summary['failed']}")
+    print(f"   • Аудио: {summary['audio_hours']:.2f} ч за {summary['wall_hours'] * 60:.1f} мин")
+    print(f"   • Пропускная способность: {summary['throughput']:.1f} ч аудио / ч")
+
+    shared = report.get("shared_models")
+    if shared:
+        print(f"   • Общие веса моделей: {shared['shared_weights'] / 1024 ** 2:.0f} МБ на все процессы")
+
+    for worker in report.get("workers", []):
+        cpus = worker["cpus"]
+        pinned = f"ядра {cpus[0]}-{cpus[-1]}, " if cpus else ""
+        memory = worker.get("memory") or {}
+        private = (f", собственная память {memory['private'] / 1024 ** 2:.0f} МБ"
+                   if memory.get("private") is not None else "")
+        print(f"   • Процесс {worker['worker']} ({pinned}{worker['threads']} потоков): "
+              f"{worker['files']} файлов, {worker['audio_duration'] / 3600:.2f} ч аудио, "
+              f"загрузка {worker['utilization'] * 100:.0f}%{private}")
+
+    failed = [r for r in report["files"] if r["status"] == "failed"]
+    if failed:
+        print("❌ Файлы с ошибками:")
+        for record in failed:
+            print(f"   • {record['audio_file']}: {record['error']}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк совмещения: эталонный линейный перебор против AlignmentEngine
+
+Пример: python benchmarks/bench_alignment.py --segments 8000 --turns 5000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+from alignment import AlignmentEngine
+from test_alignment import find_best_speaker
+
+
+def make_session(hours: float, turns: int, segments: int, speakers: int, seed: int = 0):
+    """Синтетическая запись: реплики по очереди с паузами и сегменты Whisper"""
+    rng = random.Random(seed)
+    duration = hours * 3600
+
+    speaker_segments = []
+    position = 0.0
+    mean_turn = duration / turns
+    for _ in range(turns):
+        length = rng.uniform(0.3, 1.7) * mean_turn * 0.9
+        speaker_segments.append({
+            "start": position,
+            "end": position + length,
+            "speaker": f"Спикер {rng.randint(1, speakers)}"
+        })
+        position += length + rng.uniform(0.0, 0.2) * mean_turn
+
+    transcription = []
+    position = 0.0
+    mean_segment = duration / segments
+    for _ in range(segments):
+        length = rng.uniform(0.5, 1.5) * mean_segment
+        transcription.append((position, position + length * 0.95))
+        position += length
+
+    return speaker_segments, transcription
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=6.0, help="Длительность записи (часы)")
+    parser.add_argument("--segments", type=int, default=8000, help="Сегменты транскрипции")
+    parser.add_argument("--turns", type=int, default=5000, help="Реплики диаризации")
+    parser.add_argument("--speakers", type=int, default=6, help="Количество спикеров")
+    parser.add_argument("--skip-reference", action="store_true", help="Не запускать медленный эталон")
+    args = parser.parse_args()
+
+    speaker_segments, transcription = make_session(args.hours, args.turns, args.segments, args.speakers)
+    starts = [start for start, _ in transcription]
+    ends = [end for _, end in transcription]
+
+    print(f"📊 {args.segments} сегментов × {args.turns} реплик, {args.hours} ч")
+    print(f"{'стратегия':<12}{'эталон, с':>12}{'движок, с':>12}{'ускорение':>12}  совпадение")
+
+    for strategy in ("strict", "smart", "aggressive"):
+        engine_start = time.perf_counter()
+        engine = AlignmentEngine(speaker_segments)
+        fast = engine.assign(starts, ends, strategy)
+        engine_time = time.perf_counter() - engine_start
+
+        if args.skip_reference:
+            print(f"{strategy:<12}{'-':>12}{engine_time:>12.4f}{'-':>12}")
+            continue
+
+        reference_start = time.perf_counter()
+        slow = [
+            find_best_speaker(start, end, (start + end) / 2, speaker_segments, strategy)
+            for start, end in transcription
+        ]
+        reference_time = time.perf_counter() - reference_start
+
+        match = "✅" if fast == slow else "❌"
+        print(f"{strategy:<12}{reference_time:>12.3f}{engine_time:>12.4f}"
+              f"{reference_time / engine_time:>11.0f}x  {match}")
+
+
+if __name__ == "__main__":
+    main()
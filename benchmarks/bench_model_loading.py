@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного старта: загрузка Whisper и модели диаризации
+последовательно и одновременно
+
+Каждый запуск - отдельный процесс (импорты и файловый кеш процесса не
+переиспользуются). Показывает общее время и время каждого шага, включая
+неудачные попытки загрузки pyannote.
+
+Пример: python benchmarks/bench_model_loading.py --model large --models-dir ./models --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LOAD_SCRIPT = """
+import json, sys
+sys.path.insert(0, {root!r})
+from main import AudioProcessor
+processor = AudioProcessor(**{kwargs!r})
+print("@@" + json.dumps({{"total": processor.load_time, "steps": processor.load_timings}}))
+"""
+
+
+def measure_load(processor_kwargs: dict) -> dict:
+    """Один холодный старт AudioProcessor в новом процессе"""
+    script = LOAD_SCRIPT.format(root=str(ROOT), kwargs=processor_kwargs)
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith("@@"):
+            return json.loads(line[2:])
+    raise RuntimeError(f"Загрузка завершилась с ошибкой:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base", help="Модель Whisper")
+    parser.add_argument("--custom-model", help="Кастомная модель Whisper (transformers)")
+    parser.add_argument("--models-dir", default="./models", help="Директория локальных моделей")
+    parser.add_argument("--device", default="cpu", help="Устройство")
+    parser.add_argument("--runs", type=int, default=3, help="Запусков на режим")
+    args = parser.parse_args()
+
+    base_kwargs = {
+        "whisper_model": args.model, "custom_whisper_model": args.custom_model,
+        "local_models_dir": args.models_dir, "device": args.device,
+        "audio_cache": False, "stage_cache": False,
+    }
+
+    results = {}
+    # Режимы чередуются, чтобы прогрев файлового кеша ОС не давал преимущества одному из них
+    for _ in range(args.runs):
+        for label, parallel_load in (("последовательно", False), ("параллельно", True)):
+            results.setdefault(label, []).append(measure_load(dict(base_kwargs, parallel_load=parallel_load)))
+
+    for label, runs in results.items():
+        totals = [run["total"] for run in runs]
+        print(f"\n⏱️  {label}: медиана {statistics.median(totals):.2f}с, мин {min(totals):.2f}с")
+        steps = {}
+        for run in runs:
+            for step in run["steps"]:
+                steps.setdefault((step["step"], step["status"]), []).append(step["seconds"])
+        for (name, status), seconds in steps.items():
+            mark = "" if status == "ok" else " ❌"
+            print(f"   {statistics.median(seconds):8.2f}с  {name}{mark}")
+
+    sequential = statistics.median(run["total"] for run in results["последовательно"])
+    parallel = statistics.median(run["total"] for run in results["параллельно"])
+    print(f"\n🚀 Ускорение холодного старта: {sequential / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
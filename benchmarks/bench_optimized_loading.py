@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк загрузки кастомной модели Whisper: from_pretrained против
+оптимизированного пакета model-converter.py (mmap без копирования)
+
+Каждый запуск - отдельный процесс. Для каждого режима показывает время
+загрузки модели с процессором, пиковую память процесса (ru_maxrss) и
+собственную память (USS) после загрузки; --output сохраняет результаты в JSON.
+
+Пример:
+    python model-converter.py openai/whisper-large-v3 -o models/large-v3-opt --variants fp32,fp16,int8
+    python benchmarks/bench_optimized_loading.py openai/whisper-large-v3 models/large-v3-opt --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MB = 1024 ** 2
+
+LOAD_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+from parallel import process_memory
+import torch
+
+started = time.perf_counter()
+if {variant!r} is None:
+    from transformers import WhisperForConditionalGeneration, WhisperProcessor
+    model = WhisperForConditionalGeneration.from_pretrained(
+        {source!r}, torch_dtype=getattr(torch, {dtype!r}), low_cpu_mem_usage=True)
+    processor = WhisperProcessor.from_pretrained({source!r})
+else:
+    from optimized_models import load_optimized_whisper
+    model, processor, _, _ = load_optimized_whisper({source!r}, device="cpu", variant={variant!r})
+seconds = time.perf_counter() - started
+
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak = peak if sys.platform == "darwin" else peak * 1024
+print("@@" + json.dumps({{"seconds": seconds, "peak": peak, "memory": process_memory()}}))
+"""
+
+
+def measure_load(source: str, variant, dtype: str) -> dict:
+    """Одна загрузка модели в новом процессе"""
+    script = LOAD_SCRIPT.format(root=str(ROOT), source=source, variant=variant, dtype=dtype)
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith("@@"):
+            return json.loads(line[2:])
+    raise RuntimeError(f"Загрузка завершилась с ошибкой:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Исходная модель: HF model ID или директория save_pretrained")
+    parser.add_argument("package", help="Оптимизированный пакет (model-converter.py)")
+    parser.add_argument("--dtype", default="float32", help="Тип данных from_pretrained (по умолчанию float32)")
+    parser.add_argument("--variants", help="Варианты пакета через запятую (по умолчанию все)")
+    parser.add_argument("--runs", type=int, default=3, help="Запусков на режим")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    from optimized_models import read_manifest
+
+    manifest = read_manifest(args.package)
+    variants = args.variants.split(",") if args.variants else list(manifest["variants"])
+
+    modes = [(f"from_pretrained ({args.dtype})", args.source, None)]
+    modes += [(f"mmap {variant}", args.package, variant) for variant in variants]
+
+    results = {}
+    # Режимы чередуются, чтобы прогрев файлового кеша ОС не давал преимущества одному из них
+    for _ in range(args.runs):
+        for label, source, variant in modes:
+            results.setdefault(label, []).append(measure_load(source, variant, args.dtype))
+
+    print(f"\n{'режим':<28}{'время, с':>10}{'пик RSS, МБ':>13}{'USS, МБ':>10}")
+    summary = {}
+    for label, runs in results.items():
+        seconds = statistics.median(run["seconds"] for run in runs)
+        peak = statistics.median(run["peak"] for run in runs)
+        private = [run["memory"]["private"] for run in runs if run["memory"]["private"] is not None]
+        uss = statistics.median(private) if private else None
+        summary[label] = {"seconds": seconds, "peak": peak, "private": uss, "runs": runs}
+        uss_text = f"{uss / MB:>10.0f}" if uss is not None else f"{'-':>10}"
+        print(f"{label:<28}{seconds:>10.2f}{peak / MB:>13.0f}{uss_text}")
+
+    baseline = summary[modes[0][0]]
+    for label, _, _ in modes[1:]:
+        result = summary[label]
+        print(f"🚀 {label}: загрузка {baseline['seconds'] / result['seconds']:.1f}x быстрее, "
+              f"пик памяти {baseline['peak'] / MB:.0f} -> {result['peak'] / MB:.0f} МБ")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"source": args.source, "package": args.package, "modes": summary},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
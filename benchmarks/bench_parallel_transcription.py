@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк параллельной транскрипции одного файла
+
+Сравнивает один процесс со всеми ядрами и пул из N процессов с равным
+бюджетом потоков: время, RTF, ускорение, эффективность и совпадение текста
+с последовательным прогоном (проверка склейки фрагментов).
+
+Пример: python benchmarks/bench_parallel_transcription.py meeting.wav --model base --workers 1,2,4,8
+"""
+
+import argparse
+import difflib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import load_audio
+from parallel import DEFAULT_CHUNK_OVERLAP, ParallelTranscriber, default_worker_threads
+
+
+def text_similarity(reference: str, candidate: str) -> float:
+    """Доля совпадающих слов (difflib) между двумя текстами"""
+    return difflib.SequenceMatcher(None, reference.split(), candidate.split()).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", help="Аудиофайл")
+    parser.add_argument("--model", default="base", help="Модель Whisper")
+    parser.add_argument("--models-dir", default="./models", help="Директория локальных моделей")
+    parser.add_argument("--workers", default="1,2,4", help="Количество процессов через запятую")
+    parser.add_argument("--worker-threads", type=int, default=None,
+                        help="Потоки torch на процесс (по умолчанию - ядра поровну)")
+    parser.add_argument("--chunk-duration", type=float, default=None, help="Длительность фрагмента, с")
+    parser.add_argument("--chunk-overlap", type=float, default=DEFAULT_CHUNK_OVERLAP, help="Перекрытие, с")
+    args = parser.parse_args()
+
+    import torch
+
+    from main import AudioProcessor
+
+    processor_kwargs = {
+        "whisper_model": args.model, "local_models_dir": args.models_dir,
+        "device": "cpu", "audio_cache": False, "stage_cache": False,
+    }
+
+    audio = load_audio(args.audio)
+    print(f"📊 {Path(args.audio).name}: {audio.duration:.1f}с, модель {args.model}")
+
+    # Последовательный прогон: один процесс со всеми ядрами
+    torch.set_num_threads(default_worker_threads(1))
+    processor = AudioProcessor(**processor_kwargs, load_diarization=False)
+    started = time.perf_counter()
+    reference = processor.transcribe(audio)
+    baseline = time.perf_counter() - started
+    del processor
+
+    print(f"{'процессы':>9}{'потоки':>8}{'время, с':>10}{'RTF':>8}{'ускорение':>11}"
+          f"{'эффект.':>9}{'сегменты':>10}  совпадение текста")
+    print(f"{'1*':>9}{default_worker_threads(1):>8}{baseline:>10.1f}{baseline / audio.duration:>8.3f}"
+          f"{1.0:>10.2f}x{100.0:>8.0f}%{len(reference['segments']):>10}  эталон")
+
+    for workers in (int(value) for value in args.workers.split(",")):
+        transcriber = ParallelTranscriber(
+            processor_kwargs, workers, threads_per_worker=args.worker_threads,
+            chunk_duration=args.chunk_duration, overlap=args.chunk_overlap
+        )
+        with transcriber:
+            started = time.perf_counter()
+            result = transcriber.transcribe(audio)
+            elapsed = time.perf_counter() - started
+
+        speedup = baseline / elapsed
+        print(f"{workers:>9}{transcriber.threads_per_worker:>8}{elapsed:>10.1f}{elapsed / audio.duration:>8.3f}"
+              f"{speedup:>10.2f}x{speedup / workers * 100:>8.0f}%{len(result['segments']):>10}  "
+              f"{text_similarity(reference['text'], result['text']) * 100:.1f}%")
+
+    print("\n* последовательный transcribe() без пула; время пула - без загрузки моделей")
+
+
+if __name__ == "__main__":
+    main()
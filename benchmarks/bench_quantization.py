@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк CPU-инференса Whisper: float32 против динамического int8-квантования (--quantize int8)
+
+Тестовый набор - JSONL-манифест со строками {"audio": "a.wav", "text": "эталон"}
+(пути относительно манифеста). Каждый режим запускается в отдельном процессе:
+показывает время загрузки, RTF (время транскрипции / длительность аудио),
+пиковую память (ru_maxrss), собственную память (USS) и WER; для int8 -
+изменение WER относительно float32. --output сохраняет результаты в JSON.
+
+Пример: python benchmarks/bench_quantization.py testset/manifest.jsonl --model large --threads 8
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MB = 1024 ** 2
+
+RUN_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import torch
+if {threads!r}:
+    torch.set_num_threads({threads!r})
+from main import AudioProcessor
+from parallel import process_memory
+
+processor = AudioProcessor(**{kwargs!r})
+results = []
+for path in {paths!r}:
+    audio = processor._prepare_audio(path)
+    started = time.perf_counter()
+    result = processor.transcribe(audio)
+    results.append({{"audio": path, "duration": audio.duration,
+                     "seconds": time.perf_counter() - started, "text": result.get("text", "")}})
+
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak = peak if sys.platform == "darwin" else peak * 1024
+print("@@" + json.dumps({{"load_time": processor.load_time, "files": results,
+                          "peak": peak, "memory": process_memory()}}, ensure_ascii=False))
+"""
+
+
+def normalize_words(text: str) -> list:
+    """Слова для WER: нижний регистр, ё -> е, без пунктуации"""
+    text = text.lower().replace("ё", "е")
+    return re.sub(r"[^\w\s]", " ", text).split()
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Расстояние Левенштейна по словам (замены, вставки, удаления)"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_test_set(manifest: Path) -> list:
+    """Строки манифеста: (путь к аудио, эталонный текст)"""
+    items = []
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            path = Path(entry["audio"])
+            if not path.is_absolute():
+                path = manifest.parent / path
+            items.append((str(path), entry["text"]))
+    return items
+
+
+def run_mode(processor_kwargs: dict, paths: list, threads) -> dict:
+    """Загрузка модели и транскрипция набора в новом процессе"""
+    script = RUN_SCRIPT.format(root=str(ROOT), kwargs=processor_kwargs, paths=paths, threads=threads)
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith("@@"):
+            return json.loads(line[2:])
+    raise RuntimeError(f"Режим завершился с ошибкой:\n{completed.stdout[-2000:]}{completed.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSONL-манифест тестового набора (audio, text)")
+    parser.add_argument("--model", default="base", help="Модель Whisper")
+    parser.add_argument("--custom-model", help="Кастомная модель Whisper (transformers или пакет model-converter.py)")
+    parser.add_argument("--models-dir", default="./models", help="Директория локальных моделей")
+    parser.add_argument("--threads", type=int, help="Потоков torch (по умолчанию все ядра)")
+    parser.add_argument("--output", help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    test_set = load_test_set(Path(args.manifest))
+    paths = [path for path, _ in test_set]
+    references = [normalize_words(text) for _, text in test_set]
+    reference_words = sum(len(words) for words in references)
+
+    base_kwargs = {
+        "whisper_model": args.model, "custom_whisper_model": args.custom_model,
+        "local_models_dir": args.models_dir, "device": "cpu", "cache_dir": None,
+        "load_diarization": False,
+    }
+
+    summary = {}
+    for label, quantize in (("fp32", None), ("int8", "int8")):
+        print(f"🧪 Режим {label}: {len(paths)} файлов")
+        run = run_mode(dict(base_kwargs, quantize=quantize), paths, args.threads)
+        duration = sum(item["duration"] for item in run["files"])
+        seconds = sum(item["seconds"] for item in run["files"])
+        errors = sum(word_errors(reference, normalize_words(item["text"]))
+                     for reference, item in zip(references, run["files"]))
+        summary[label] = dict(run, rtf=seconds / duration if duration else None,
+                              wer=errors / reference_words if reference_words else None)
+
+    print(f"\n{'режим':<8}{'загрузка, с':>13}{'RTF':>8}{'пик RSS, МБ':>13}{'USS, МБ':>10}{'WER, %':>9}")
+    for label, result in summary.items():
+        private = result["memory"]["private"]
+        uss_text = f"{private / MB:>10.0f}" if private is not None else f"{'-':>10}"
+        print(f"{label:<8}{result['load_time']:>13.1f}{result['rtf']:>8.3f}{result['peak'] / MB:>13.0f}"
+              f"{uss_text}{result['wer'] * 100:>9.2f}")
+
+    fp32, int8 = summary["fp32"], summary["int8"]
+    print(f"\n🚀 int8: RTF {fp32['rtf']:.3f} -> {int8['rtf']:.3f} ({fp32['rtf'] / int8['rtf']:.2f}x), "
+          f"пик памяти {fp32['peak'] / MB:.0f} -> {int8['peak'] / MB:.0f} МБ, "
+          f"WER {(int8['wer'] - fp32['wer']) * 100:+.2f} п.п.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"manifest": args.manifest, "model": args.custom_model or args.model,
+                       "threads": args.threads, "modes": summary}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти пула пакета: отдельные модели в каждом процессе (spawn)
+против общих весов (fork после загрузки моделей в основном процессе)
+
+Для каждого режима показывает собственную память (USS) каждого процесса после
+обработки - прирост памяти на еще один процесс - и суммарную память пула.
+
+Пример: python benchmarks/bench_shared_models.py input/calls/ --model large --workers 4
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch import WorkerPoolBatchRunner, collect_batch_items
+
+MB = 1024 ** 2
+
+
+def run_mode(items_spec: str, processor_kwargs: dict, workers: int, share_models: bool) -> dict:
+    with tempfile.TemporaryDirectory() as output:
+        items = collect_batch_items(items_spec, output)
+        runner = WorkerPoolBatchRunner(processor_kwargs, {}, skip_existing=False,
+                                       workers=workers, share_models=share_models)
+        started = time.perf_counter()
+        report = runner.run(items)
+        report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Каталог, glob или JSONL-манифест")
+    parser.add_argument("--model", default="base", help="Модель Whisper")
+    parser.add_argument("--custom-model", help="Кастомная модель Whisper (transformers)")
+    parser.add_argument("--models-dir", default="./models", help="Директория локальных моделей")
+    parser.add_argument("--workers", type=int, default=4, help="Количество процессов")
+    args = parser.parse_args()
+
+    processor_kwargs = {
+        "whisper_model": args.model, "custom_whisper_model": args.custom_model,
+        "local_models_dir": args.models_dir, "device": "cpu",
+        "audio_cache": False, "stage_cache": False,
+    }
+
+    reports = {}
+    for label, share_models in (("spawn", False), ("fork", True)):
+        print(f"\n🧪 Режим {label}")
+        reports[label] = run_mode(args.input, processor_kwargs, args.workers, share_models)
+
+    print(f"\n{'режим':<8}{'процесс':>9}{'RSS, МБ':>10}{'свое, МБ':>10}{'общее, МБ':>11}")
+    totals = {}
+    for label, report in reports.items():
+        total = 0
+        shared = report.get("shared_models")
+        if shared:
+            parent = shared["parent_memory"]
+            total += parent["private"] or 0
+            print(f"{label:<8}{'основной':>9}{parent['rss'] / MB:>10.0f}{(parent['private'] or 0) / MB:>10.0f}"
+                  f"{(parent['shared'] or 0) / MB:>11.0f}")
+        for worker in report["workers"]:
+            memory = worker["memory"] or {}
+            if memory.get("private") is None:
+                print(f"{label:<8}{worker['worker']:>9}{'-':>10}{'-':>10}{'-':>11}")
+                continue
+            total += memory["private"]
+            print(f"{label:<8}{worker['worker']:>9}{memory['rss'] / MB:>10.0f}{memory['private'] / MB:>10.0f}"
+                  f"{memory['shared'] / MB:>11.0f}")
+        if shared:
+            # Общие веса лежат в разделяемой памяти один раз на весь пул
+            total += shared["shared_weights"]
+        totals[label] = total
+        print(f"{label:<8}{'итого':>9}{'':>10}{total / MB:>10.0f}   время {report['elapsed']:.1f}с, "
+              f"{report['summary']['throughput']:.1f} ч аудио / ч")
+
+    if totals["fork"]:
+        print(f"\n📉 Память пула: {totals['spawn'] / MB:.0f} МБ -> {totals['fork'] / MB:.0f} МБ "
+              f"({totals['spawn'] / totals['fork']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
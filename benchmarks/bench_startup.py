@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк старта CLI: python -X importtime main.py --help
+
+Показывает суммарное время импортов, самые дорогие модули верхнего уровня и
+тяжелые библиотеки, которые не должны загружаться до начала обработки.
+
+Пример: python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Библиотеки, которые должны импортироваться только этапами обработки
+HEAVY_MODULES = {
+    "numpy", "torch", "whisper", "pyannote", "transformers",
+    "librosa", "soundfile", "soxr", "pandas", "scipy",
+}
+
+
+def measure_startup(args: List[str] = ("--help",)) -> Dict:
+    """
+    Один запуск main.py с -X importtime
+
+    Returns:
+        {"wall_ms", "import_ms", "modules": {имя: кумулятивное время мс}, "heavy": [...], "returncode"}
+    """
+    command = [sys.executable, "-X", "importtime", str(ROOT / "main.py"), *args]
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    top_level = {}
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        loaded.add(module.split(".")[0])
+        # Модули верхнего уровня - без отступа после разделителя
+        if not name[1:].startswith(" "):
+            top_level[module] = int(cumulative) / 1000
+
+    return {
+        "wall_ms": wall_ms,
+        "import_ms": sum(top_level.values()),
+        "modules": top_level,
+        "heavy": sorted(loaded & HEAVY_MODULES),
+        "returncode": completed.returncode,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Количество запусков")
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых дорогих импортов показать")
+    parser.add_argument("cli_args", nargs="*", default=["--help"], help="Аргументы main.py")
+    args = parser.parse_args()
+
+    runs = [measure_startup(args.cli_args) for _ in range(args.runs)]
+    wall = [run["wall_ms"] for run in runs]
+    imports = [run["import_ms"] for run in runs]
+
+    print(f"🚀 main.py {' '.join(args.cli_args)}: {args.runs} запусков")
+    print(f"⏱️  Время процесса: медиана {statistics.median(wall):.0f} мс, мин {min(wall):.0f} мс")
+    print(f"📦 Импорты: медиана {statistics.median(imports):.0f} мс")
+
+    print(f"\n🔝 Самые дорогие импорты верхнего уровня:")
+    last = runs[-1]["modules"]
+    for module, elapsed in sorted(last.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"   {elapsed:8.1f} мс  {module}")
+
+    heavy = runs[-1]["heavy"]
+    if heavy:
+        print(f"\n⚠️  Загружены тяжелые библиотеки: {', '.join(heavy)}")
+    else:
+        print("\n✅ Тяжелые библиотеки не загружаются")
+
+
+if __name__ == "__main__":
+    main()
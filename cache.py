@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Кеши пайплайна: декодированный PCM и результаты этапов по хешу содержимого файла
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+
+# numpy и audio_io импортируются в PCMCache: main.py импортирует этот модуль
+# при старте CLI, а --help не должен загружать numpy
+if TYPE_CHECKING:
+    from audio_io import AudioData
+
+# Размер блока для хеширования содержимого файла
+HASH_BLOCK_SIZE = 1 << 20
+
+# Лимит кеша PCM по умолчанию (байты)
+DEFAULT_PCM_CACHE_SIZE = 10 * 1024 ** 3
+
+
+def default_cache_dir() -> Path:
+    """
+    Директория кеша пользователя: $XDG_CACHE_HOME/whisper-diarization (~/.cache/...)
+
+    Кеш PCM занимает до DEFAULT_PCM_CACHE_SIZE, поэтому хранится вне рабочей
+    директории проекта; другое место задается --cache-dir или CACHE_DIR.
+    """
+    cache_root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(cache_root) / "whisper-diarization"
+
+
+def file_content_hash(path: Union[str, Path]) -> str:
+    """BLAKE2b хеш содержимого файла (читается блоками)"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write(directory: Path, target: Path, writer):
+    """Запись во временный файл в той же директории и атомарная подмена"""
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer(f)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class ContentHashIndex:
+    """
+    Запоминание хешей содержимого файлов по (путь, размер, mtime)
+
+    Позволяет не перечитывать многочасовые записи на каждом запуске.
+    Один индекс разделяется между всеми кешами процессора.
+    """
+
+    def __init__(self, index_path: Union[str, Path]):
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def content_hash(self, audio_path: Union[str, Path]) -> str:
+        """Хеш содержимого файла"""
+        audio_path = Path(audio_path).resolve()
+        stat = audio_path.stat()
+        fingerprint = f"{audio_path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+        with self._lock:
+            index = self._load()
+            if fingerprint in index:
+                return index[fingerprint]
+
+        content_hash = file_content_hash(audio_path)
+
+        with self._lock:
+            index = self._load()
+            # Убираем устаревшие отпечатки этого же пути
+            prefix = f"{audio_path}|"
+            index = {k: v for k, v in index.items() if not k.startswith(prefix)}
+            index[fingerprint] = content_hash
+            _atomic_write(self.index_path.parent, self.index_path,
+                          lambda f: f.write(json.dumps(index).encode("utf-8")))
+
+        return content_hash
+
+
+class PCMCache:
+    """
+    Кеш декодированного аудио в формате .npy (float32), открывается через mmap
+
+    Ключ - хеш содержимого файла + частота дискретизации.
+    При превышении лимита удаляются давно не использованные записи (LRU по mtime).
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = DEFAULT_PCM_CACHE_SIZE,
+                 hashes: Optional[ContentHashIndex] = None):
+        """
+        Args:
+            cache_dir: Директория кеша
+            max_size: Максимальный суммарный размер кеша в байтах
+            hashes: Общий индекс хешей файлов (по умолчанию - собственный)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.hashes = hashes or ContentHashIndex(self.cache_dir / "index.json")
+        self._lock = threading.Lock()
+
+    def content_hash(self, audio_path: Union[str, Path]) -> str:
+        return self.hashes.content_hash(audio_path)
+
+    def _entry_path(self, content_hash: str, sample_rate: int) -> Path:
+        return self.cache_dir / f"{content_hash}_{sample_rate}.npy"
+
+    def get(self, audio_path: Union[str, Path], sample_rate: int) -> Optional["AudioData"]:
+        """Открывает закешированный массив через mmap или возвращает None"""
+        import numpy as np
+        from audio_io import AudioData
+
+        entry = self._entry_path(self.content_hash(audio_path), sample_rate)
+        if not entry.exists():
+            return None
+
+        try:
+            waveform = np.load(entry, mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Поврежденная запись кеша аудио {entry.name}: {e}")
+            entry.unlink(missing_ok=True)
+            return None
+
+        # Обновляем время доступа для LRU
+        os.utime(entry)
+        return AudioData(waveform, sample_rate, str(audio_path),
+                         content_hash=entry.name.split("_")[0])
+
+    def put(self, audio_path: Union[str, Path], audio: "AudioData") -> "AudioData":
+        """
+        Сохраняет декодированное аудио и возвращает его mmap-версию
+
+        Возвращаемый массив не держит данные в памяти процесса.
+        """
+        import numpy as np
+        from audio_io import AudioData
+
+        content_hash = self.content_hash(audio_path)
+        entry = self._entry_path(content_hash, audio.sample_rate)
+        waveform = np.ascontiguousarray(audio.waveform, dtype=np.float32)
+
+        if waveform.nbytes > self.max_size:
+            return audio
+
+        _atomic_write(self.cache_dir, entry, lambda f: np.save(f, waveform))
+        self._evict()
+
+        try:
+            cached = np.load(entry, mmap_mode="r")
+        except FileNotFoundError:
+            # Запись сразу вытеснена: с заголовком .npy она не помещается в лимит
+            return audio
+        return AudioData(cached, audio.sample_rate, str(audio_path), content_hash=content_hash)
+
+    def _evict(self):
+        """Удаление самых давно использованных записей сверх лимита"""
+        with self._lock:
+            entries = []
+            for entry in self.cache_dir.glob("*.npy"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                entry.unlink(missing_ok=True)
+                total_size -= size
+
+
+class StageCache:
+    """
+    Персистентный кеш сырых результатов этапов (транскрипция, диаризация)
+
+    Хранит выход модели до фильтрации и объединения, поэтому перезапуск с другими
+    параметрами постобработки (стратегия совмещения, мин. сегмент, пороги)
+    не требует повторного инференса. Ключ - JSON-описание входа и модели.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path]):
+        """
+        Args:
+            cache_dir: Директория кеша этапов
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(**key_fields: Any) -> str:
+        """Стабильный ключ из описания входа (порядок полей не важен)"""
+        payload = json.dumps(key_fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, stage: str, key: str) -> Path:
+        return self.cache_dir / stage / f"{key}.json"
+
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """Результат этапа или None"""
+        entry = self._entry_path(stage, key)
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Поврежденная запись кеша этапа {stage}: {e}")
+            entry.unlink(missing_ok=True)
+            return None
+
+    def put(self, stage: str, key: str, result: Any, key_fields: Optional[Dict] = None):
+        """Сохранение результата этапа (с описанием ключа для отладки)"""
+        entry = self._entry_path(stage, key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"key": key_fields or {}, "result": result}
+        data = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        _atomic_write(entry.parent, entry, lambda f: f.write(data))
+
+
+def _json_default(value: Any) -> Any:
+    """Сериализация numpy/torch скаляров и массивов из результатов моделей"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Контрольные точки длинных задач: фрагменты транскрипции и промежуточные
+результаты диаризации (сегментация, эмбеддинги) в директории задачи
+"""
+
+import json
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from cache import _atomic_write, _json_default
+
+# numpy и pyannote импортируются внутри функций: main.py импортирует этот модуль
+# при старте CLI, а --help не должен загружать numpy
+if TYPE_CHECKING:
+    from audio_io import AudioData
+
+# Длительность фрагмента транскрипции по умолчанию (секунды)
+DEFAULT_CHECKPOINT_INTERVAL = 300.0
+
+# Граница фрагмента ищется в самом тихом месте +-BOUNDARY_SEARCH секунд от цели
+BOUNDARY_SEARCH = 5.0
+BOUNDARY_FRAME = 0.1
+
+# Ключи кеша pyannote (SpeakerDiarization в режиме training берет из них готовые шаги)
+PYANNOTE_CACHED_SEGMENTATION = "training_cache/segmentation"
+PYANNOTE_CACHED_EMBEDDINGS = "training_cache/embeddings"
+
+MANIFEST_NAME = "job.json"
+
+
+def plan_chunks(audio: "AudioData", chunk_duration: float = DEFAULT_CHECKPOINT_INTERVAL,
+                search: float = BOUNDARY_SEARCH) -> List[Tuple[float, float]]:
+    """
+    Разбиение аудио на фрагменты транскрипции
+
+    Граница ставится в самом тихом кадре рядом с целевой точкой, чтобы
+    не резать слова. Последний фрагмент может быть длиннее на search секунд.
+
+    Returns:
+        [(начало, конец)] в секундах относительно начала массива
+    """
+    import numpy as np
+
+    sample_rate = audio.sample_rate
+    total = len(audio.waveform)
+    chunk = max(1, int(chunk_duration * sample_rate))
+    reach = int(min(search, chunk_duration / 4) * sample_rate)
+    frame = max(1, int(BOUNDARY_FRAME * sample_rate))
+
+    bounds = [0]
+    while total - bounds[-1] > chunk + reach:
+        target = bounds[-1] + chunk
+        low = target - reach
+        region = audio.waveform[low:target + reach]
+        count = len(region) // frame
+        if count == 0:
+            bounds.append(target)
+            continue
+        frames = np.asarray(region[:count * frame], dtype=np.float64).reshape(count, frame)
+        quietest = int(np.argmin(np.mean(frames ** 2, axis=1)))
+        bounds.append(low + quietest * frame + frame // 2)
+    bounds.append(total)
+
+    return [(first / sample_rate, last / sample_rate) for first, last in zip(bounds, bounds[1:])]
+
+
+def merge_transcriptions(chunks: List[Tuple[float, Dict]]) -> Dict:
+    """
+    Объединение результатов фрагментов в один результат транскрипции
+
+    Args:
+        chunks: [(начало фрагмента относительно начала аудио, результат транскрипции)]
+    """
+    segments = []
+    texts = []
+    language = None
+    for offset, result in chunks:
+        for segment in result.get("segments", []):
+            shifted = dict(segment, id=len(segments),
+                           start=segment["start"] + offset, end=segment["end"] + offset)
+            if segment.get("words"):
+                shifted["words"] = [
+                    dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                    for word in segment["words"]
+                ]
+            segments.append(shifted)
+        text = result.get("text", "").strip()
+        if text:
+            texts.append(text)
+        if language is None:
+            language = result.get("language")
+
+    return {"text": " ".join(texts), "segments": segments, "language": language or "unknown"}
+
+
+def _normalized(value: Any) -> Any:
+    """Значение после сохранения в JSON (результат одинаков при возобновлении и без него)"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=_json_default))
+
+
+class JobCheckpoint:
+    """
+    Директория задачи с контрольными точками
+
+    Структура:
+        job.json                       - описание входа и план фрагментов
+        transcription/chunk_0000.json  - результат фрагмента транскрипции
+        diarization/segmentation.npz   - выход модели сегментации pyannote
+        diarization/embeddings.npy     - эмбеддинги локальных спикеров
+        diarization/turns.json         - сырые реплики (диаризация завершена)
+
+    Каждый файл пишется атомарно, поэтому прерывание в любой момент
+    оставляет только целые контрольные точки.
+    """
+
+    def __init__(self, job_dir: Union[str, Path], fingerprint: Dict, resume: bool = False,
+                 chunk_duration: float = DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Args:
+            job_dir: Директория задачи
+            fingerprint: Описание входа, моделей и параметров (должно совпасть при --resume)
+            resume: Продолжить по существующим контрольным точкам
+            chunk_duration: Длительность фрагмента транскрипции (секунды)
+
+        Raises:
+            ValueError: при --resume директория относится к другому входу или параметрам
+        """
+        self.job_dir = Path(job_dir)
+        self.chunk_duration = chunk_duration
+        self.fingerprint = _normalized(dict(fingerprint, chunk_duration=chunk_duration))
+        self.manifest_path = self.job_dir / MANIFEST_NAME
+
+        manifest = self._load_json(self.manifest_path)
+        if resume and manifest is not None:
+            if manifest.get("fingerprint") != self.fingerprint:
+                raise ValueError(
+                    f"Контрольные точки в {self.job_dir} относятся к другому файлу или параметрам "
+                    f"(запустите без --resume, чтобы начать заново)"
+                )
+            self.manifest = manifest
+            print(f"♻️  Продолжаем задачу из {self.job_dir}")
+            return
+
+        if resume:
+            print(f"ℹ️  Контрольных точек в {self.job_dir} нет - начинаем с начала")
+        elif manifest is not None:
+            print(f"🧹 Старые контрольные точки в {self.job_dir} удалены")
+        self._clear()
+        self.manifest = {"fingerprint": self.fingerprint, "completed": False}
+        self._save_manifest()
+
+    def _clear(self):
+        for name in ("transcription", "diarization"):
+            shutil.rmtree(self.job_dir / name, ignore_errors=True)
+        self.manifest_path.unlink(missing_ok=True)
+        self.job_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _load_json(path: Path) -> Optional[Any]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Поврежденная контрольная точка {path.name}: {e}")
+            return None
+
+    def _save_json(self, path: Path, value: Any):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8")
+        _atomic_write(path.parent, path, lambda f: f.write(data))
+
+    def _save_manifest(self):
+        self._save_json(self.manifest_path, self.manifest)
+
+    @property
+    def completed(self) -> bool:
+        return bool(self.manifest.get("completed"))
+
+    def mark_completed(self):
+        """Отметка о завершении задачи (повторный --resume только пересобирает результат)"""
+        self.manifest["completed"] = True
+        self._save_manifest()
+
+    # Транскрипция
+
+    def transcription_chunks(self, audio: "AudioData") -> List[Tuple[float, float]]:
+        """План фрагментов: сохраняется при первом запуске, при возобновлении берется из job.json"""
+        if "chunks" not in self.manifest:
+            self.manifest["chunks"] = [list(chunk) for chunk in plan_chunks(audio, self.chunk_duration)]
+            self._save_manifest()
+        return [tuple(chunk) for chunk in self.manifest["chunks"]]
+
+    def _chunk_path(self, index: int) -> Path:
+        return self.job_dir / "transcription" / f"chunk_{index:04d}.json"
+
+    def load_transcription_chunk(self, index: int) -> Optional[Dict]:
+        return self._load_json(self._chunk_path(index))
+
+    def save_transcription_chunk(self, index: int, result: Dict) -> Dict:
+        """Сохранение фрагмента; возвращает результат в том виде, в каком он будет прочитан"""
+        result = _normalized(result)
+        self._save_json(self._chunk_path(index), result)
+        return result
+
+    # Диаризация
+
+    @property
+    def _turns_path(self) -> Path:
+        return self.job_dir / "diarization" / "turns.json"
+
+    def load_diarization_turns(self) -> Optional[List[Dict]]:
+        return self._load_json(self._turns_path)
+
+    def save_diarization_turns(self, turns: List[Dict]) -> List[Dict]:
+        turns = _normalized(turns)
+        self._save_json(self._turns_path, turns)
+        return turns
+
+    def save_diarization_step(self, step_name: str, artifact: Any):
+        """
+        Hook для pyannote: сохранение выхода сегментации и эмбеддингов
+
+        Вызывается как hook(step_name, step_artifact, file=..., total=..., completed=...);
+        промежуточные вызовы прогресса (completed задан) пропускаются.
+        """
+        import numpy as np
+
+        directory = self.job_dir / "diarization"
+        directory.mkdir(parents=True, exist_ok=True)
+
+        if step_name == "segmentation" and hasattr(artifact, "sliding_window"):
+            target = directory / "segmentation.npz"
+            if target.exists():
+                return
+            window = artifact.sliding_window
+            _atomic_write(directory, target, lambda f: np.savez(
+                f, data=artifact.data,
+                sliding_window=np.array([window.start, window.duration, window.step])
+            ))
+            print("💾 Контрольная точка: сегментация pyannote")
+        elif step_name == "embeddings" and isinstance(artifact, np.ndarray):
+            target = directory / "embeddings.npy"
+            if target.exists():
+                return
+            _atomic_write(directory, target, lambda f: np.save(f, artifact))
+            print("💾 Контрольная точка: эмбеддинги pyannote")
+
+    def pyannote_hook(self):
+        """Hook для вызова pipeline(file, hook=...)"""
+        def hook(step_name, step_artifact, file=None, total=None, completed=None):
+            if step_artifact is not None and completed is None:
+                self.save_diarization_step(step_name, step_artifact)
+        return hook
+
+    def restore_diarization_steps(self, file: Dict, segmentation_threshold: Optional[float] = None) -> List[str]:
+        """
+        Подстановка сохраненных шагов в файл pyannote (ключи training_cache/*)
+
+        Returns:
+            Восстановленные шаги
+        """
+        directory = self.job_dir / "diarization"
+        restored = []
+
+        segmentation_path = directory / "segmentation.npz"
+        if segmentation_path.exists():
+            import numpy as np
+            from pyannote.core import SlidingWindow, SlidingWindowFeature
+
+            with np.load(segmentation_path) as saved:
+                start, duration, step = saved["sliding_window"].tolist()
+                file[PYANNOTE_CACHED_SEGMENTATION] = SlidingWindowFeature(
+                    saved["data"], SlidingWindow(start=start, duration=duration, step=step)
+                )
+            restored.append("segmentation")
+
+            # Эмбеддинги имеют смысл только вместе с той же сегментацией
+            embeddings_path = directory / "embeddings.npy"
+            if embeddings_path.exists():
+                file[PYANNOTE_CACHED_EMBEDDINGS] = {
+                    "segmentation.threshold": segmentation_threshold,
+                    "embeddings": np.load(embeddings_path)
+                }
+                restored.append("embeddings")
+
+        return restored
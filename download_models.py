@@ -15,6 +15,10 @@ import torch
 from pyannote.audio import Pipeline
 import whisper
 
+from model_registry import (FORMAT_PYANNOTE, FORMAT_TRANSFORMERS, FORMAT_WHISPER, ModelRegistry,
+                            hub_cached_file, pyannote_key, registry_path, transformers_key,
+                            transformers_weights_format, whisper_checkpoint_path, whisper_key)
+
 # Добавляем поддержку transformers для кастомных моделей
 try:
     from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
@@ -42,6 +46,9 @@ class ModelDownloader:
         
         # Определяем устройство
         self.device = torch.device("cpu")
+        
+        # Реестр разрешенных моделей: main.py загружает модели сразу по этим путям
+        self.registry = ModelRegistry(registry_path(self.models_dir))
     
     def download_whisper_models(self, models: list = None):
         """Скачивание моделей Whisper"""
@@ -88,6 +95,8 @@ class ModelDownloader:
             # Сохраняем модель и процессор
             model.save_pretrained(save_path)
             processor.save_pretrained(save_path)
+            self.registry.record(transformers_key(model_id), save_path, FORMAT_TRANSFORMERS,
+                                 weights=transformers_weights_format(save_path))
             
             print(f"✅ Кастомная модель сохранена: {save_path}")
             return True
@@ -162,8 +171,8 @@ class ModelDownloader:
             return False
         return True
     
-    def create_local_config(self):
-        """Создание конфигурации для локального использования"""
+    def create_local_config(self, pyannote_model: str = "pyannote/speaker-diarization-3.1"):
+        """Создание конфигурации для локального использования и реестра скачанных моделей"""
         config = {
             "whisper_cache": str(Path.home() / ".cache" / "whisper"),
             "pyannote_model": str(self.pyannote_dir / "speaker-diarization-3.1"),
@@ -177,7 +186,35 @@ class ModelDownloader:
             json.dump(config, f, indent=2)
         
         print(f"📝 Локальная конфигурация создана: {config_file}")
+        
+        self.update_registry(pyannote_model)
         return config_file
+    
+    def update_registry(self, pyannote_model: str = "pyannote/speaker-diarization-3.1"):
+        """Запись в реестр точных путей скачанных моделей (чекпоинты Whisper, config.yaml pyannote)"""
+        recorded = []
+        
+        for name in getattr(whisper, "_MODELS", {}):
+            checkpoint = whisper_checkpoint_path(name)
+            if checkpoint is not None and checkpoint.exists():
+                self.registry.record(whisper_key(name), checkpoint, FORMAT_WHISPER, model=name)
+                recorded.append(f"whisper {name}")
+        
+        local_pipeline = self.pyannote_dir / pyannote_model.split("/")[-1]
+        if (local_pipeline / "config.yaml").exists():
+            self.registry.record(pyannote_key(pyannote_model), local_pipeline, FORMAT_PYANNOTE,
+                                 source="local", use_token=False)
+            recorded.append(pyannote_model)
+        else:
+            cached_config = hub_cached_file(pyannote_model, "config.yaml")
+            if cached_config is not None:
+                # Скачано с токеном: при загрузке по сети без токена закрытые модели недоступны
+                self.registry.record(pyannote_key(pyannote_model), cached_config, FORMAT_PYANNOTE,
+                                     source="hub", use_token=True)
+                recorded.append(pyannote_model)
+        
+        print(f"📌 Реестр моделей: {self.registry.path} ({len(recorded)} записей)")
+        return recorded
 
 
 @click.command()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Живой режим: транскрипция и диаризация сырого PCM потока (16 кГц s16le)
+Энергетический VAD режет поток на реплики, частичный текст выдается по ходу речи,
+финальный - со спикером после паузы; задержка считается от прихода аудио
+"""
+
+import math
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from audio_io import TARGET_SAMPLE_RATE, AudioData, StreamingDecoder
+from streaming import (DEFAULT_MAX_UTTERANCE, DEFAULT_PARTIAL_INTERVAL, DEFAULT_SILENCE_DURATION,
+                       VAD_THRESHOLD_DB, SpeakerRegistry)
+
+# Параметры VAD по умолчанию
+VAD_FRAME_DURATION = 0.03   # секунды
+VAD_MIN_LEVEL_DB = -50.0    # абсолютный минимум речи (dBFS)
+
+# Запас аудио до начала и после конца речи (секунды)
+DEFAULT_PREROLL = 0.3
+
+# Длительность блока чтения источника (секунды)
+DEFAULT_CHUNK_DURATION = 0.1
+
+
+class EnergyVAD:
+    """
+    Детектор речи по энергии кадров
+
+    Уровень шума отслеживается адаптивно: сразу опускается к тихим кадрам,
+    поднимается на паузах и очень медленно - во время "речи" (так постоянный
+    шум громче минимума со временем перестает считаться речью). Кадр считается
+    речью, если его уровень выше шума на threshold_db и выше абсолютного минимума.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, frame_duration: float = VAD_FRAME_DURATION,
+                 threshold_db: float = VAD_THRESHOLD_DB, min_level_db: float = VAD_MIN_LEVEL_DB):
+        self.frame_size = max(1, int(sample_rate * frame_duration))
+        self.threshold_db = threshold_db
+        self.min_level_db = min_level_db
+        self.noise_floor = min_level_db - threshold_db
+        self.position = 0  # абсолютный номер первого отсчета в остатке
+        self._rest = np.empty(0, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> List[Tuple[int, bool]]:
+        """
+        Классификация полных кадров (неполный остаток ждет следующего блока)
+
+        Returns:
+            [(абсолютный конец кадра в отсчетах, речь ли это)]
+        """
+        if len(self._rest):
+            samples = np.concatenate((self._rest, samples))
+        count = len(samples) // self.frame_size
+        self._rest = samples[count * self.frame_size:].copy()
+        if count == 0:
+            return []
+
+        frames = samples[:count * self.frame_size].reshape(count, self.frame_size).astype(np.float64)
+        levels = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+        result = []
+        for level in levels.tolist():
+            speech = level >= max(self.noise_floor + self.threshold_db, self.min_level_db)
+            if level < self.noise_floor:
+                self.noise_floor = level
+            else:
+                self.noise_floor += (0.002 if speech else 0.05) * (level - self.noise_floor)
+
+            self.position += self.frame_size
+            result.append((self.position, speech))
+        return result
+
+
+class RollingBuffer:
+    """
+    Кольцевой по смыслу буфер отсчетов с абсолютной нумерацией
+
+    Старые отсчеты отбрасываются через discard_before, память
+    переиспользуется при следующем добавлении.
+    """
+
+    def __init__(self, capacity: int = TARGET_SAMPLE_RATE * 30):
+        self.data = np.empty(capacity, dtype=np.float32)
+        self.head = 0        # индекс первого хранимого отсчета в data
+        self.length = 0      # количество хранимых отсчетов
+        self.start = 0       # абсолютный номер первого хранимого отсчета
+
+    @property
+    def end(self) -> int:
+        """Абсолютный номер отсчета, следующего за последним"""
+        return self.start + self.length
+
+    def append(self, samples: np.ndarray):
+        needed = self.length + len(samples)
+        if self.head + needed > len(self.data):
+            if needed > len(self.data):
+                grown = np.empty(max(needed, len(self.data) * 2), dtype=np.float32)
+                grown[:self.length] = self.data[self.head:self.head + self.length]
+                self.data = grown
+            else:
+                self.data[:self.length] = self.data[self.head:self.head + self.length]
+            self.head = 0
+        self.data[self.head + self.length:self.head + needed] = samples
+        self.length = needed
+
+    def slice(self, abs_start: int, abs_end: int) -> np.ndarray:
+        """Копия отсчетов [abs_start, abs_end) (в пределах хранимых)"""
+        first = min(max(abs_start, self.start), self.end) - self.start
+        last = min(max(abs_end, self.start), self.end) - self.start
+        return self.data[self.head + first:self.head + max(first, last)].copy()
+
+    def discard_before(self, abs_position: int):
+        drop = min(max(abs_position - self.start, 0), self.length)
+        self.head += drop
+        self.length -= drop
+        self.start += drop
+
+
+class LiveSession:
+    """
+    Инкрементальная обработка живого потока
+
+    feed() добавляет блок и размечает его VAD, events() запускает модели для
+    накопившихся событий: финальные реплики (пауза или max_utterance) проходят
+    Whisper + pyannote с глобальными метками спикеров, текущая реплика
+    периодически транскрибируется для частичного результата.
+    """
+
+    def __init__(self, processor, sample_rate: int = TARGET_SAMPLE_RATE,
+                 min_speakers: int = 1, max_speakers: int = 10,
+                 min_segment_duration: float = 0.5, alignment_strategy: str = "smart",
+                 silence_duration: float = DEFAULT_SILENCE_DURATION,
+                 max_utterance: float = DEFAULT_MAX_UTTERANCE,
+                 partial_interval: float = DEFAULT_PARTIAL_INTERVAL,
+                 preroll: float = DEFAULT_PREROLL, vad_threshold: float = VAD_THRESHOLD_DB,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            processor: AudioProcessor с загруженными моделями
+            sample_rate: Частота дискретизации потока
+            min_speakers: Минимальное количество спикеров (в реплике)
+            max_speakers: Максимальное количество спикеров (в реплике)
+            min_segment_duration: Минимальная длительность сегмента
+            alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+            silence_duration: Пауза, завершающая реплику (секунды)
+            max_utterance: Максимальная длительность реплики - граница задержки (секунды)
+            partial_interval: Период частичных результатов (секунды, 0 - отключены)
+            preroll: Запас аудио до начала и после конца речи (секунды)
+            vad_threshold: Превышение уровня шума для речи (дБ)
+            clock: Источник времени для расчета задержки
+        """
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self.diarization_params = {"min_speakers": min_speakers, "max_speakers": max_speakers}
+        self.min_segment_duration = min_segment_duration
+        self.alignment_strategy = alignment_strategy
+        self.silence_samples = int(silence_duration * sample_rate)
+        self.max_utterance_samples = int(max_utterance * sample_rate)
+        self.partial_samples = int(partial_interval * sample_rate)
+        self.preroll_samples = int(preroll * sample_rate)
+        self.clock = clock
+
+        self.vad = EnergyVAD(sample_rate, threshold_db=vad_threshold)
+        self.buffer = RollingBuffer(max(self.max_utterance_samples * 2, sample_rate))
+        self.registry = SpeakerRegistry()
+
+        # Прибытие блоков: (абсолютный конец блока, время прихода)
+        self.arrivals = deque()
+        self.utterance_start = None   # начало текущей реплики (отсчеты)
+        self.last_speech = 0          # конец последнего кадра речи
+        self.partial_until = 0        # конец аудио последнего частичного результата
+        self.pending: List[Tuple[int, int]] = []
+        self.latencies: List[float] = []
+
+    def feed(self, samples: np.ndarray, arrival_time: Optional[float] = None):
+        """Добавление блока отсчетов (float32 в [-1, 1]) с временем его прихода"""
+        self.buffer.append(samples)
+        self.arrivals.append((self.buffer.end, self.clock() if arrival_time is None else arrival_time))
+
+        for frame_end, speech in self.vad.process(samples):
+            frame_start = frame_end - self.vad.frame_size
+            if speech:
+                if self.utterance_start is None:
+                    self.utterance_start = max(frame_start - self.preroll_samples, self.buffer.start)
+                    self.partial_until = self.utterance_start
+                self.last_speech = frame_end
+
+            if self.utterance_start is None:
+                continue
+
+            if not speech and frame_end - self.last_speech >= self.silence_samples:
+                self._close_utterance(min(self.last_speech + self.preroll_samples, frame_end))
+            elif frame_end - self.utterance_start >= self.max_utterance_samples:
+                # Длинная речь без пауз режется, чтобы задержка оставалась ограниченной
+                self._close_utterance(frame_end)
+                if speech:
+                    self.utterance_start = frame_end
+                    self.partial_until = frame_end
+
+        # Вне реплики хранится только запас перед возможным началом речи
+        if self.utterance_start is None and not self.pending:
+            self._discard_before(self.buffer.end - self.preroll_samples)
+
+    def _close_utterance(self, end: int):
+        self.pending.append((self.utterance_start, end))
+        self.utterance_start = None
+
+    def _discard_before(self, position: int):
+        self.buffer.discard_before(position)
+        # Нужна запись блока, содержащего первый хранимый отсчет
+        while len(self.arrivals) > 1 and self.arrivals[0][0] <= self.buffer.start:
+            self.arrivals.popleft()
+
+    def _audio(self, start: int, end: int) -> AudioData:
+        return AudioData(self.buffer.slice(start, end), self.sample_rate, offset=start / self.sample_rate)
+
+    def _arrival_of(self, sample: int) -> Optional[float]:
+        """Время прихода блока, содержащего отсчет sample"""
+        for block_end, arrival in self.arrivals:
+            if sample <= block_end:
+                return arrival
+        return self.arrivals[-1][1] if self.arrivals else None
+
+    def events(self) -> List[Dict]:
+        """
+        Обработка накопившихся событий
+
+        Returns:
+            [{"type": "final"|"partial", "start", "end", "text", "speaker", ["latency"]}]
+        """
+        events = []
+        while self.pending:
+            events.extend(self._final_events(*self.pending.pop(0)))
+
+        if self.utterance_start is None:
+            self._discard_before(self.buffer.end - self.preroll_samples)
+            return events
+
+        if self.partial_samples > 0 and self.buffer.end - self.partial_until >= self.partial_samples:
+            events.extend(self._partial_events(self.utterance_start, self.buffer.end))
+        self._discard_before(self.utterance_start)
+        return events
+
+    def flush(self) -> List[Dict]:
+        """Завершение потока: незакрытая реплика становится финальной"""
+        if self.utterance_start is not None:
+            self._close_utterance(self.buffer.end)
+        return self.events()
+
+    def _partial_events(self, start: int, end: int) -> List[Dict]:
+        self.partial_until = end
+        transcription = self.processor.transcribe(self._audio(start, end))
+        text = " ".join(s["text"].strip() for s in transcription.get("segments", []) if s["text"].strip())
+        if not text:
+            return []
+        return [{
+            "type": "partial",
+            "start": start / self.sample_rate,
+            "end": end / self.sample_rate,
+            "text": text,
+            "speaker": None
+        }]
+
+    def _final_events(self, start: int, end: int) -> List[Dict]:
+        segments = self.processor.analyze_window(
+            self._audio(start, end), self.registry, self.diarization_params,
+            min_segment_duration=self.min_segment_duration,
+            alignment_strategy=self.alignment_strategy
+        )
+        emitted_at = self.clock()
+
+        events = []
+        for segment in segments:
+            if not segment["text"]:
+                continue
+            # Задержка - от прихода последнего отсчета сегмента до выдачи
+            last_sample = min(int(math.ceil(segment["end"] * self.sample_rate)), end)
+            arrival = self._arrival_of(last_sample)
+            latency = None if arrival is None else max(0.0, emitted_at - arrival)
+            if latency is not None:
+                self.latencies.append(latency)
+            events.append({"type": "final", **segment, "latency": latency})
+        return events
+
+
+def latency_summary(latencies: Iterable[float]) -> Dict:
+    """Сводка задержек: количество, p50, p95, максимум (секунды)"""
+    values = np.asarray(list(latencies), dtype=np.float64)
+    if values.size == 0:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    return {
+        "count": int(values.size),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "max": float(values.max())
+    }
+
+
+def read_pcm(stream: BinaryIO, chunk_duration: float = DEFAULT_CHUNK_DURATION,
+             sample_rate: int = TARGET_SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Блоки float32 из потока s16le моно
+
+    Читается то, что уже пришло (read1), поэтому блоки выдаются без ожидания
+    полного размера; нечетный байт переносится в следующий блок.
+    """
+    chunk_bytes = max(2, int(chunk_duration * sample_rate) * 2)
+    read = getattr(stream, "read1", stream.read)
+    rest = b""
+    while True:
+        data = read(chunk_bytes)
+        if not data:
+            return
+        data = rest + data
+        usable = len(data) - len(data) % 2
+        rest = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def replay_file(audio_path: str, chunk_duration: float = DEFAULT_CHUNK_DURATION,
+                speed: float = 1.0, sample_rate: int = TARGET_SAMPLE_RATE) -> Iterator[np.ndarray]:
+    """
+    Воспроизведение файла как живого источника (для измерения задержки)
+
+    Блоки выдаются в темпе реального времени, умноженном на speed
+    (speed <= 0 - без пауз).
+    """
+    decoder = StreamingDecoder(audio_path, sample_rate=sample_rate, block_duration=chunk_duration)
+    started = time.monotonic()
+    played = 0
+    for block in decoder.blocks():
+        if speed > 0:
+            delay = started + played / sample_rate / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        played += len(block)
+        yield block
+
+
+def accept_connection(socket_path: Optional[str] = None, listen: Optional[str] = None) -> BinaryIO:
+    """
+    Ожидание одного подключения источника по Unix socket или TCP (HOST:PORT)
+
+    Returns:
+        Бинарный поток подключения
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(socket_path)
+        address = socket_path
+    else:
+        host, _, port = listen.rpartition(":")
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host or "127.0.0.1", int(port)))
+        address = listen
+
+    server.listen(1)
+    print(f"🔌 Ожидаем источник аудио: {address}")
+    try:
+        connection, _ = server.accept()
+    finally:
+        server.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+    print("🔌 Источник подключен")
+    return connection.makefile("rb")
+
+
+def run_live(session: LiveSession, chunks: Iterable[np.ndarray],
+             emit: Callable[[Dict], None]) -> Dict:
+    """
+    Обработка источника: чтение в отдельном потоке, модели - в текущем
+
+    Пока модели заняты, блоки копятся в очереди со своим временем прихода;
+    затем все накопленные блоки добавляются разом, и события считаются
+    по актуальному состоянию буфера.
+
+    Returns:
+        Сводка задержек финальных сегментов (latency_summary)
+    """
+    blocks = queue.Queue()
+    failure = []
+
+    def reader():
+        try:
+            for chunk in chunks:
+                blocks.put((chunk, session.clock()))
+        except Exception as e:
+            failure.append(e)
+        finally:
+            blocks.put(None)
+
+    thread = threading.Thread(target=reader, name="live-reader", daemon=True)
+    thread.start()
+
+    finished = False
+    while not finished:
+        items = [blocks.get()]
+        while True:
+            try:
+                items.append(blocks.get_nowait())
+            except queue.Empty:
+                break
+
+        for item in items:
+            if item is None:
+                finished = True
+                break
+            session.feed(*item)
+
+        for event in (session.flush() if finished else session.events()):
+            emit(event)
+
+    thread.join()
+    if failure:
+        raise failure[0]
+    return latency_summary(session.latencies)
@@ -4,45 +4,62 @@ Whisper + PyAnnote Audio Pipeline
 Транскрипция и диаризация аудиофайлов
 """
 
+from __future__ import annotations
+
 import os
 import sys
 import warnings
-import tempfile
 import json
+import importlib.util
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple, Optional, Union
 
 import click
-import torch
-import whisper
-import librosa
-import soundfile as sf
-from pyannote.audio import Pipeline
-from pyannote.core import Segment
-import pandas as pd
-from tqdm import tqdm
+import math
 import time
 
-# Импорты для работы с кастомными моделями HuggingFace
-try:
-    from transformers import WhisperForConditionalGeneration, WhisperProcessor, WhisperTokenizer
-    from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq, pipeline
-    HF_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    print("⚠️  transformers не установлен. Кастомные модели HF недоступны.")
-    print("💡 Для поддержки кастомных моделей установите: pip install transformers")
-    HF_TRANSFORMERS_AVAILABLE = False
+from cache import (PCMCache, StageCache, ContentHashIndex,
+                   DEFAULT_PCM_CACHE_SIZE, default_cache_dir, file_content_hash)
+from postprocessing import SegmentPostProcessor
+from streaming import (SpeakerRegistry, plan_windows,
+                       DEFAULT_STREAM_WINDOW, DEFAULT_STREAM_OVERLAP,
+                       DEFAULT_SILENCE_DURATION, DEFAULT_MAX_UTTERANCE,
+                       DEFAULT_PARTIAL_INTERVAL, VAD_THRESHOLD_DB)
+from checkpoint import DEFAULT_CHECKPOINT_INTERVAL, JobCheckpoint, merge_transcriptions
+from parallel import DEFAULT_CHUNK_OVERLAP
+from optimized_models import PRIMARY_WEIGHTS, VARIANT_DTYPES, is_optimized_package
+from model_registry import (FORMAT_PYANNOTE, FORMAT_TRANSFORMERS, FORMAT_WHISPER, ModelRegistry,
+                            enable_offline_mode, hub_cached_file, pyannote_key, registry_path,
+                            transformers_key, transformers_weights_format, whisper_checkpoint_path,
+                            whisper_key)
+from batch import (BatchRunner, PrefetchingBatchRunner, WorkerPoolBatchRunner,
+                   collect_batch_items, is_batch_input)
+
+# numpy, torch, whisper, pyannote и transformers импортируются внутри методов,
+# которым они нужны: --help, ошибки аргументов и офлайн-команды (realign)
+# не загружают ML-стек (бюджет проверяется tests/test_startup.py)
+if TYPE_CHECKING:
+    from audio_io import AudioData
+
+# Поддержка кастомных моделей HuggingFace (проверяется без импорта transformers)
+HF_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("transformers") is not None
 
 # Подавляем предупреждения
 warnings.filterwarnings("ignore")
 
 
-class AudioProcessor:
+class AudioProcessor(SegmentPostProcessor):
     """Класс для обработки аудио: транскрипция + диаризация"""
     
     def __init__(self, whisper_model: str = "base", hf_token: Optional[str] = None, 
                  local_models_dir: Optional[str] = None, device: Optional[str] = None,
-                 custom_whisper_model: Optional[str] = None):
+                 custom_whisper_model: Optional[str] = None, cache_dir: Optional[str] = None,
+                 audio_cache: bool = True, audio_cache_size: int = DEFAULT_PCM_CACHE_SIZE,
+                 stage_cache: bool = True, compact_json: bool = False,
+                 load_diarization: bool = True, parallel_load: bool = True,
+                 offline: bool = False, model_registry: bool = True,
+                 model_variant: Optional[str] = None, quantize: Optional[str] = None):
         """
         Инициализация процессора
         
@@ -52,19 +69,69 @@ class AudioProcessor:
             local_models_dir: Директория с локально сохраненными моделями
             device: Устройство для инференса (cpu, cuda, mps)
             custom_whisper_model: Путь к кастомной модели Whisper (HuggingFace format) или HF model ID
+            cache_dir: Корневая директория кешей (None - все кеши отключены)
+            audio_cache: Кешировать декодированное аудио (mmap .npy)
+            audio_cache_size: Максимальный размер кеша декодированного аудио в байтах
+            stage_cache: Кешировать сырые результаты транскрипции и диаризации
+            compact_json: Сохранять *_result.json без отступов
+            load_diarization: Загружать модель диаризации (False - только транскрипция,
+                для процессов пула параллельной транскрипции)
+            parallel_load: Загружать Whisper и модель диаризации одновременно
+            offline: Строгий офлайн-режим: модели только из локальных файлов и кеша,
+                без обращений к сети
+            model_registry: Использовать реестр разрешенных моделей
+                (<local_models_dir или models>/model_registry.json)
+            model_variant: Вариант весов оптимизированного пакета (fp32, fp16, bf16, int8;
+                None - по устройству), см. model-converter.py
+            quantize: Квантование Whisper: "int8" - динамическое int8-квантование слоев
+                Linear (только CPU), None - без квантования
         """
         self.whisper_model_name = whisper_model
         self.custom_whisper_model = custom_whisper_model
         self.hf_token = hf_token
         self.local_models_dir = Path(local_models_dir) if local_models_dir else None
+        self.compact_json = compact_json
+        self.load_diarization = load_diarization
+        self.parallel_load = parallel_load
+        self.model_variant = model_variant
+        self.quantize = quantize
+        
+        # Офлайн-режим включается до импорта huggingface_hub (загрузка моделей)
+        self.offline = offline
+        if offline:
+            enable_offline_mode()
+        
+        # Реестр: пути и форматы моделей, которые уже загружались успешно
+        self.model_registry = ModelRegistry(registry_path(local_models_dir)) if model_registry else None
+        
+        # Пул процессов для транскрипции фрагментов (enable_parallel_transcription)
+        self.parallel_transcriber = None
+        
+        # Кеши: декодированный PCM (mmap .npy) и сырые результаты этапов,
+        # оба адресуются хешем содержимого аудиофайла
+        self.content_hashes = None
+        self.pcm_cache = None
+        self.stage_cache = None
+        if cache_dir:
+            cache_root = Path(cache_dir)
+            self.content_hashes = ContentHashIndex(cache_root / "hashes.json")
+            if audio_cache:
+                self.pcm_cache = PCMCache(cache_root / "pcm", audio_cache_size, self.content_hashes)
+            if stage_cache:
+                self.stage_cache = StageCache(cache_root / "stages")
+        
+        # Модель диаризации (часть ключа кеша этапов)
+        self.diarization_model_name = "pyannote/speaker-diarization-3.1"
         
         # Тип модели Whisper (standard или custom)
         self.whisper_model_type = "custom" if custom_whisper_model else "standard"
         
-        # Выбор устройства
+        # Выбор устройства (torch импортируется только для автоопределения)
         if device is not None:
             self.device = device
         else:
+            import torch
+            
             if torch.cuda.is_available():
                 self.device = "cuda"
             elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
@@ -78,6 +145,7 @@ class AudioProcessor:
         self.whisper_model = None
         self.whisper_processor = None
         self.whisper_pipeline = None  # Для pipeline API
+        self.whisper_variant = None  # Вариант весов оптимизированного пакета
         
         if self.custom_whisper_model:
             print(f"🧠 Кастомная модель Whisper: {self.custom_whisper_model}")
@@ -103,8 +171,57 @@ class AudioProcessor:
             print(f"⚠️  Ошибка чтения локальной конфигурации: {e}")
             return None
     
+    @contextmanager
+    def _load_step(self, name: str):
+        """Замер шага загрузки моделей в self.load_timings (неудачные попытки тоже учитываются)"""
+        step = {"step": name, "status": "ok"}
+        started = time.time()
+        try:
+            yield
+        except Exception as e:
+            step["status"] = "failed"
+            step["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            step["seconds"] = time.time() - started
+            self.load_timings.append(step)
+    
     def _load_models(self):
-        """Загрузка моделей Whisper и PyAnnotate"""
+        """
+        Загрузка моделей Whisper и PyAnnotate
+        
+        Модели независимы, поэтому загружаются одновременно в двух потоках:
+        время загрузки определяется более медленной из них (чтение с диска и
+        десериализация весов отпускают GIL).
+        """
+        self.load_timings = []
+        self.diarization_pipeline = None
+        started = time.time()
+        
+        if not self.load_diarization:
+            self._load_whisper()
+        elif not self.parallel_load:
+            self._load_whisper()
+            self._load_diarization()
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="load") as executor:
+                whisper_future = executor.submit(self._load_whisper)
+                diarization_future = executor.submit(self._load_diarization)
+                # Ошибка Whisper прерывает работу, как и при последовательной загрузке
+                diarization_future.result()
+                whisper_future.result()
+        
+        self.load_time = time.time() - started
+        mode = "параллельно" if self.load_diarization and self.parallel_load else "последовательно"
+        print(f"⏱️  Загрузка моделей: {self.load_time:.1f}с ({mode})")
+        for step in self.load_timings:
+            mark = "" if step["status"] == "ok" else " ❌"
+            print(f"   • {step['step']}: {step['seconds']:.1f}с{mark}")
+    
+    def _load_whisper(self):
+        """Загрузка модели Whisper (стандартной или кастомной)"""
         print("📥 Загружаем модель Whisper...")
         
         # Загрузка Whisper модели
@@ -112,14 +229,52 @@ class AudioProcessor:
         
         if self.whisper_model_type == "custom" and self.custom_whisper_model:
             # Загружаем кастомную модель через transformers
-            self._load_custom_whisper_model(whisper_device)
+            with self._load_step(f"Whisper ({self.custom_whisper_model})"):
+                self._load_custom_whisper_model(whisper_device)
         else:
             # Загружаем стандартную модель через whisper
-            self._load_standard_whisper_model(whisper_device)
+            with self._load_step(f"Whisper ({self.whisper_model_name})"):
+                self._load_standard_whisper_model(whisper_device)
+        
+        if self.quantize == "int8":
+            self._quantize_whisper()
+    
+    def _quantize_whisper(self):
+        """Динамическое int8-квантование слоев Linear загруженной модели Whisper (только CPU)"""
+        from optimized_models import quantize_linear_int8
+        
+        device = next(self.whisper_model.parameters()).device.type
+        if device != "cpu":
+            print(f"⚠️  Квантование int8 доступно только на CPU (модель на {device}), пропущено")
+            self.quantize = None
+            return
+        
+        with self._load_step("Whisper: квантование int8"):
+            layers = quantize_linear_int8(self.whisper_model)
+            
+            # Pipeline приводит входные признаки к своему типу данных: после
+            # квантования модель работает в float32
+            if self.whisper_pipeline is not None:
+                try:
+                    self.whisper_pipeline.torch_dtype = self.whisper_model.dtype
+                except AttributeError:
+                    pass  # в новых transformers torch_dtype берется из модели
+        
+        print(f"🗜️  Whisper квантована в int8: {layers} слоев Linear")
+    
+    def _load_diarization(self):
+        """Загрузка модели диаризации: локальная -> кеш -> HuggingFace; при неудаче диаризация отключается"""
+        import torch
+        
+        with self._load_step("pyannote: импорт"):
+            from pyannote.audio import Pipeline
         
         # Загрузка модели диаризации (остается без изменений)
         print("📥 Загружаем модель диаризации...")
-        self.diarization_pipeline = None
+        
+        # Путь, который сработал в прошлый раз: остальные попытки не нужны
+        if self._load_diarization_from_registry(Pipeline):
+            return
         
         # Проверяем локальные модели
         local_config = self._load_local_config()
@@ -131,24 +286,28 @@ class AudioProcessor:
                 
                 if pyannote_model_path.exists():
                     print(f"🏠 Загружаем локальную модель диаризации из: {pyannote_model_path}")
-                    self.diarization_pipeline = Pipeline.from_pretrained(str(pyannote_model_path))
-                    
-                    if self.device != "cpu":
-                        self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
+                    with self._load_step("pyannote: локальная модель"):
+                        self.diarization_pipeline = Pipeline.from_pretrained(str(pyannote_model_path))
+                        
+                        if self.device != "cpu":
+                            self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
                     
                     print("✅ Локальная модель диаризации загружена")
+                    self._record_diarization_model(pyannote_model_path, "local")
                     return
                 else:
                     # Пытаемся загрузить из кеша без токена
                     print("🔄 Пытаемся загрузить модель из кеша...")
-                    self.diarization_pipeline = Pipeline.from_pretrained(
-                        "pyannote/speaker-diarization-3.1"
-                    )
-                    
-                    if self.device != "cpu":
-                        self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
+                    with self._load_step("pyannote: кеш (локальная конфигурация)"):
+                        self.diarization_pipeline = Pipeline.from_pretrained(
+                            "pyannote/speaker-diarization-3.1"
+                        )
+                        
+                        if self.device != "cpu":
+                            self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
                     
                     print("✅ Модель диаризации загружена из кеша")
+                    self._record_diarization_model(None, "cache")
                     return
                     
             except Exception as e:
@@ -158,14 +317,16 @@ class AudioProcessor:
         # Пытаемся загрузить из кеша без токена (если нет локальной конфигурации)
         try:
             print("🔄 Пытаемся загрузить модель из кеша...")
-            self.diarization_pipeline = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.1"
-            )
-            
-            if self.device != "cpu":
-                self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
+            with self._load_step("pyannote: кеш"):
+                self.diarization_pipeline = Pipeline.from_pretrained(
+                    "pyannote/speaker-diarization-3.1"
+                )
+                
+                if self.device != "cpu":
+                    self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
             
             print("✅ Модель диаризации загружена из кеша")
+            self._record_diarization_model(None, "cache")
             return
             
         except Exception as e:
@@ -173,21 +334,28 @@ class AudioProcessor:
         
         # Загружаем модель из HuggingFace
         try:
+            if self.offline:
+                print("⚠️  Офлайн-режим: модели диаризации нет в локальном кеше, загрузка из HuggingFace пропущена")
+                print("💡 Скачайте модели: python download_models.py")
+                return
+            
             if not self.hf_token:
                 print("⚠️  HuggingFace токен не найден")
                 print("💡 Для диаризации нужен токен или локальные модели")
                 print("💡 Скачайте модели: python download_models.py")
                 return
-                
-            self.diarization_pipeline = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.1",
-                use_auth_token=self.hf_token
-            )
             
-            if self.device != "cpu":
-                self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
+            with self._load_step("pyannote: HuggingFace"):
+                self.diarization_pipeline = Pipeline.from_pretrained(
+                    "pyannote/speaker-diarization-3.1",
+                    use_auth_token=self.hf_token
+                )
+                
+                if self.device != "cpu":
+                    self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
                 
             print("✅ Модель диаризации загружена из HuggingFace")
+            self._record_diarization_model(None, "hub", use_token=True)
             
         except Exception as e:
             print(f"⚠️  Ошибка загрузки модели диаризации: {e}")
@@ -195,13 +363,65 @@ class AudioProcessor:
             print("💡 Или скачайте модели локально: python download_models.py")
             self.diarization_pipeline = None
     
+    def _load_diarization_from_registry(self, Pipeline) -> bool:
+        """Загрузка пайплайна диаризации по записи реестра; False - записи нет или путь не сработал"""
+        import torch
+        
+        key = pyannote_key(self.diarization_model_name)
+        entry = self.model_registry.get(key) if self.model_registry else None
+        if entry is None:
+            return False
+        
+        print(f"📌 Модель диаризации из реестра: {entry['path']}")
+        options = {"use_auth_token": self.hf_token} if entry.get("use_token") and self.hf_token else {}
+        try:
+            with self._load_step(f"pyannote: реестр ({entry.get('source', '?')})"):
+                self.diarization_pipeline = Pipeline.from_pretrained(entry["path"], **options)
+                
+                if self.device != "cpu":
+                    self.diarization_pipeline = self.diarization_pipeline.to(torch.device(self.device))
+        except Exception as e:
+            print(f"⚠️  Путь из реестра не загрузился ({e}), ищем модель заново")
+            self.model_registry.forget(key)
+            self.diarization_pipeline = None
+            return False
+        
+        print("✅ Модель диаризации загружена")
+        return True
+    
+    def _record_diarization_model(self, path: Optional[Path], source: str, use_token: bool = False):
+        """Запись в реестр пути, с которого загрузился пайплайн (для hub ID - config.yaml в кеше)"""
+        if self.model_registry is None:
+            return
+        if path is None:
+            path = hub_cached_file(self.diarization_model_name, "config.yaml")
+            if path is None:
+                return
+        self.model_registry.record(pyannote_key(self.diarization_model_name), path, FORMAT_PYANNOTE,
+                                   source=source, use_token=use_token)
+    
     def _load_standard_whisper_model(self, whisper_device: str):
-        """Загрузка стандартной модели Whisper"""
+        """Загрузка стандартной модели Whisper (по пути из реестра, если он известен)"""
+        import whisper
+        
+        key = whisper_key(self.whisper_model_name)
+        entry = self.model_registry.get(key) if self.model_registry else None
+        checkpoint = entry["path"] if entry else None
+        if entry:
+            print(f"📌 Whisper из реестра: {checkpoint}")
+        elif self.offline:
+            # whisper.load_model(имя) скачивает отсутствующий или измененный файл - в офлайне только путь
+            expected = whisper_checkpoint_path(self.whisper_model_name)
+            if expected is None:
+                checkpoint = self.whisper_model_name
+            elif expected.exists():
+                checkpoint = str(expected)
+            else:
+                raise RuntimeError(f"Офлайн-режим: модель Whisper {self.whisper_model_name} не скачана "
+                                   f"({expected}); запустите python download_models.py")
+        
         try:
-            self.whisper_model = whisper.load_model(
-                self.whisper_model_name, 
-                device=whisper_device
-            )
+            self.whisper_model = self._load_whisper_checkpoint(whisper, checkpoint, whisper_device)
             self.whisper_processor = None  # Стандартная модель не использует processor
             print(f"✅ Стандартная модель Whisper загружена на {whisper_device}")
         except Exception as e:
@@ -209,19 +429,52 @@ class AudioProcessor:
                 print(f"⚠️  Ошибка загрузки Whisper на MPS: {e}")
                 print("🔄 Переключаемся на CPU для Whisper...")
                 whisper_device = "cpu"
-                self.whisper_model = whisper.load_model(
-                    self.whisper_model_name, 
-                    device=whisper_device
-                )
+                self.whisper_model = self._load_whisper_checkpoint(whisper, checkpoint, whisper_device)
                 print("✅ Стандартная модель Whisper загружена на CPU")
+            elif entry is not None and not self.offline:
+                print(f"⚠️  Путь из реестра не загрузился ({e}), загружаем модель по имени")
+                self.model_registry.forget(key)
+                entry = checkpoint = None
+                self.whisper_model = self._load_whisper_checkpoint(whisper, None, whisper_device)
+                print(f"✅ Стандартная модель Whisper загружена на {whisper_device}")
             else:
                 raise e
+        
+        if checkpoint is None and self.model_registry is not None:
+            resolved = whisper_checkpoint_path(self.whisper_model_name)
+            if resolved is not None and resolved.exists():
+                self.model_registry.record(key, resolved, FORMAT_WHISPER, model=self.whisper_model_name)
+    
+    def _load_whisper_checkpoint(self, whisper, checkpoint: Optional[str], whisper_device: str):
+        """whisper.load_model по имени или по пути к чекпоинту (путь - без проверки SHA256 и скачивания)"""
+        if checkpoint is None:
+            return whisper.load_model(self.whisper_model_name, device=whisper_device)
+        
+        model = whisper.load_model(checkpoint, device=whisper_device)
+        # Головы выравнивания (word_timestamps) при загрузке по пути не задаются
+        alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(self.whisper_model_name)
+        if alignment_heads:
+            model.set_alignment_heads(alignment_heads)
+        return model
     
     def _load_custom_whisper_model(self, whisper_device: str):
         """Загрузка кастомной модели Whisper через transformers с pipeline API"""
         if not HF_TRANSFORMERS_AVAILABLE:
             raise ImportError("transformers не доступен для загрузки кастомных моделей")
         
+        import torch
+        from transformers import WhisperForConditionalGeneration, WhisperProcessor, pipeline
+        
+        # Модель из HuggingFace Hub, которая уже загружалась, берется сразу из локального снапшота
+        source = self.custom_whisper_model
+        key = transformers_key(self.custom_whisper_model)
+        entry = None
+        if not Path(source).exists() and self.model_registry is not None:
+            entry = self.model_registry.get(key)
+            if entry:
+                source = entry["path"]
+                print(f"📌 Кастомная модель из реестра: {source}")
+        
         try:
             print(f"🔄 Загружаем кастомную модель Whisper: {self.custom_whisper_model}")
             
@@ -251,14 +504,21 @@ class AudioProcessor:
                 except Exception:
                     print("⚠️  flash_attention_2 недоступен, используем стандартное внимание")
             
-            if Path(self.custom_whisper_model).exists():
+            # Оптимизированный пакет (model-converter.py): веса отображаются из файла через mmap
+            optimized_dtype = None
+            if Path(source).exists() and is_optimized_package(source):
+                optimized_dtype = self._load_optimized_whisper_model(source, whisper_device)
+            
+            if optimized_dtype is not None:
+                torch_dtype = optimized_dtype
+            elif Path(source).exists():
                 # Локальная модель
                 print("🏠 Загружаем локальную кастомную модель...")
                 self.whisper_model = WhisperForConditionalGeneration.from_pretrained(
-                    self.custom_whisper_model,
+                    source,
                     **model_kwargs
                 )
-                self.whisper_processor = WhisperProcessor.from_pretrained(self.custom_whisper_model)
+                self.whisper_processor = WhisperProcessor.from_pretrained(source)
             else:
                 # Модель из HuggingFace Hub
                 print("🌐 Загружаем кастомную модель из HuggingFace Hub...")
@@ -267,6 +527,11 @@ class AudioProcessor:
                     **model_kwargs
                 )
                 self.whisper_processor = WhisperProcessor.from_pretrained(self.custom_whisper_model)
+                
+                snapshot = hub_cached_file(self.custom_whisper_model, "config.json")
+                if snapshot is not None and self.model_registry is not None:
+                    self.model_registry.record(key, snapshot.parent, FORMAT_TRANSFORMERS,
+                                               weights=transformers_weights_format(snapshot.parent))
             
             # Создаем pipeline как в официальной документации
             print("🔄 Создаем ASR pipeline...")
@@ -298,6 +563,10 @@ class AudioProcessor:
                 print("🔄 Переключаемся на CPU для кастомной модели...")
                 whisper_device = "cpu"
                 self._load_custom_whisper_model(whisper_device)
+            elif entry is not None:
+                print(f"⚠️  Путь из реестра не загрузился ({e}), ищем модель заново")
+                self.model_registry.forget(key)
+                self._load_custom_whisper_model(whisper_device)
             else:
                 print(f"❌ Ошибка загрузки кастомной модели: {e}")
                 print("🔄 Переключаемся на стандартную модель...")
@@ -306,75 +575,244 @@ class AudioProcessor:
                 self.whisper_pipeline = None
                 self._load_standard_whisper_model(whisper_device)
     
-    def _prepare_audio(self, audio_path: str) -> str:
+    def _load_optimized_whisper_model(self, source: str, whisper_device: str):
+        """
+        Загрузка оптимизированного пакета без from_pretrained
+        
+        Returns:
+            Тип данных весов; None - пакет не загрузился через mmap, но его основной
+            вариант (model.safetensors) загружается обычным from_pretrained
         """
-        Подготовка аудио для обработки (конвертация в нужный формат)
+        from optimized_models import load_optimized_whisper, read_manifest
+        
+        # Для квантования на CPU достаточно варианта int8: файл вчетверо меньше fp32
+        variant = self.model_variant
+        if variant is None and self.quantize == "int8" and whisper_device == "cpu" \
+                and "int8" in read_manifest(source)["variants"]:
+            variant = "int8"
+        
+        print("📦 Загружаем оптимизированный пакет модели (mmap)...")
+        try:
+            with self._load_step("Whisper: оптимизированный пакет"):
+                self.whisper_model, self.whisper_processor, torch_dtype, variant = load_optimized_whisper(
+                    source, device=whisper_device, variant=variant
+                )
+        except (RuntimeError, ValueError) as e:
+            if not (Path(source) / PRIMARY_WEIGHTS).exists():
+                raise
+            print(f"⚠️  Пакет не загрузился через mmap ({e}), загружаем {PRIMARY_WEIGHTS}")
+            return None
+        
+        self.whisper_variant = variant
+        mode = "восстановлен из int8" if variant == "int8" else "веса отображены из файла"
+        print(f"✅ Вариант {variant} ({VARIANT_DTYPES[variant]}): {mode}")
+        return torch_dtype
+    
+    def _prepare_audio(self, audio_path: str, start: float = 0.0,
+                       end: Optional[float] = None) -> AudioData:
+        """
+        Подготовка аудио для обработки: однократное декодирование в 16 кГц моно
         
         Args:
             audio_path: Путь к аудиофайлу
+            start: Начало окна обработки в секундах
+            end: Конец окна обработки в секундах (None - до конца файла)
             
         Returns:
-            Путь к подготовленному аудиофайлу
+            Декодированное аудио, общее для всех этапов
         """
+        from audio_io import load_audio, TARGET_SAMPLE_RATE
+        
         audio_path = Path(audio_path)
         
         if not audio_path.exists():
             raise FileNotFoundError(f"Аудиофайл не найден: {audio_path}")
         
-        # Если уже wav файл, возвращаем как есть
-        if audio_path.suffix.lower() == '.wav':
-            return str(audio_path)
+        if self.pcm_cache is not None:
+            cached = self.pcm_cache.get(audio_path, TARGET_SAMPLE_RATE)
+            if cached is not None:
+                print("⚡ Декодированное аудио взято из кеша")
+                return cached.window(start, end)
+        
+        if start > 0 or end is not None:
+            window_end = f"{end:.1f}с" if end is not None else "конец"
+            print(f"🔄 Декодируем окно аудио: {start:.1f}с - {window_end}...")
+        else:
+            print("🔄 Декодируем аудио...")
+        audio = load_audio(audio_path, sample_rate=TARGET_SAMPLE_RATE, start=start, end=end)
+        print(f"✅ Аудио загружено: {audio.duration:.1f}с")
+        
+        if self.content_hashes is not None:
+            audio.content_hash = self.content_hashes.content_hash(audio_path)
         
-        # Конвертируем в wav
-        print("🔄 Конвертация аудио в WAV формат...")
-        audio, sr = librosa.load(str(audio_path), sr=16000)
+        # В кеш кладем только полностью декодированный файл: частичное окно
+        # не должно превращаться в полное декодирование
+        if self.pcm_cache is not None and start == 0 and end is None:
+            audio = self.pcm_cache.put(audio_path, audio)
         
-        temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        sf.write(temp_wav.name, audio, sr)
+        return audio
+    
+    def _ensure_audio(self, audio: Union[str, AudioData], end: Optional[float] = None) -> AudioData:
+        """Принимает путь или уже декодированное аудио"""
+        from audio_io import AudioData
         
-        return temp_wav.name
+        if isinstance(audio, AudioData):
+            return audio
+        return self._prepare_audio(audio, end=end)
     
-    def transcribe(self, audio_path: str, time_limit: Optional[float] = None) -> Dict:
+    @staticmethod
+    def _resolve_time_window(start: Optional[float], end: Optional[float],
+                             time_limit: Optional[float]) -> Tuple[float, Optional[float]]:
+        """
+        Объединяет --start/--end и --time-limit в одно окно обработки
+        
+        time_limit отсчитывается от начала окна; если задан и end, берется более ранний конец.
+        """
+        start = start or 0.0
+        if start < 0:
+            raise ValueError(f"Начало окна не может быть отрицательным: {start}")
+        
+        if time_limit is not None:
+            limit_end = start + time_limit
+            end = limit_end if end is None else min(end, limit_end)
+        
+        if end is not None and end <= start:
+            raise ValueError(f"Конец окна ({end}с) должен быть больше начала ({start}с)")
+        
+        return start, end
+    
+    def transcribe(self, audio: Union[str, AudioData], time_limit: Optional[float] = None) -> Dict:
         """
         Транскрипция аудио с помощью Whisper
         
         Args:
-            audio_path: Путь к аудиофайлу
+            audio: Путь к аудиофайлу или декодированное аудио
             time_limit: Ограничение времени транскрипции в секундах
             
         Returns:
             Результат транскрипции
         """
         print("🎤 Начинаем транскрипцию...")
+        # Для пути к файлу декодируем только первые time_limit секунд
+        audio = self._ensure_audio(audio, end=time_limit)
         
         # Если указано ограничение по времени, обрезаем аудио
         if time_limit is not None:
             print(f"⏱️  Ограничение времени: {time_limit} секунд")
-            audio, sr = librosa.load(audio_path, sr=16000)
-            max_samples = int(time_limit * sr)
-            if len(audio) > max_samples:
-                audio = audio[:max_samples]
-                temp_wav = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-                sf.write(temp_wav.name, audio, sr)
-                audio_path = temp_wav.name
+            if audio.duration > time_limit:
+                audio = audio.trim(time_limit)
                 print(f"✂️  Аудио обрезано до {time_limit} секунд")
         
+        # Сырые сегменты Whisper могли остаться от прошлого запуска
+        cache_key_fields = self._transcription_cache_key(audio)
+        if cache_key_fields is not None:
+            cache_key = StageCache.make_key(**cache_key_fields)
+            cached = self.stage_cache.get("transcription", cache_key)
+            if cached is not None:
+                print("⚡ Транскрипция взята из кеша")
+                return cached
+        
         # Выбираем метод транскрипции в зависимости от типа модели
         if self.whisper_model_type == "custom" and self.whisper_pipeline is not None:
-            result = self._transcribe_with_pipeline(audio_path)
+            result = self._transcribe_with_pipeline(audio)
         elif self.whisper_model_type == "custom" and self.whisper_processor is not None:
-            result = self._transcribe_with_custom_model(audio_path)
+            result = self._transcribe_with_custom_model(audio)
         else:
-            result = self._transcribe_with_standard_model(audio_path)
+            result = self._transcribe_with_standard_model(audio)
         
-        # Если мы создали временный файл, удаляем его
-        if time_limit is not None and audio_path != audio_path:
-            os.unlink(audio_path)
+        if cache_key_fields is not None:
+            self.stage_cache.put("transcription", cache_key, result, cache_key_fields)
         
         return result
     
-    def _transcribe_with_standard_model(self, audio_path: str) -> Dict:
-        """Транскрипция со стандартной моделью Whisper"""
+    def _whisper_model_identity(self) -> Dict:
+        """Идентификатор модели Whisper для ключа кеша (без устройства)"""
+        if self.whisper_model_type == "custom" and self.custom_whisper_model:
+            model_path = Path(self.custom_whisper_model)
+            if model_path.exists():
+                # Локальная модель: путь + время последнего изменения файлов весов
+                revision = max((f.stat().st_mtime_ns for f in model_path.rglob("*") if f.is_file()),
+                               default=0)
+                identity = {"type": "custom", "model": str(model_path.resolve()), "revision": revision}
+                # Варианты пакета (fp32, fp16, int8) дают разные результаты
+                if self.whisper_variant:
+                    identity["variant"] = self.whisper_variant
+            else:
+                config = getattr(self.whisper_model, "config", None)
+                identity = {"type": "custom", "model": self.custom_whisper_model,
+                            "revision": getattr(config, "_commit_hash", None)}
+        else:
+            import whisper
+            
+            identity = {"type": "standard", "model": self.whisper_model_name,
+                        "whisper_version": getattr(whisper, "__version__", None)}
+        
+        # Квантованная модель дает другой результат; без квантования ключ прежний
+        if self.quantize:
+            identity["quantize"] = self.quantize
+        return identity
+    
+    def _transcription_cache_key(self, audio: AudioData) -> Optional[Dict]:
+        """Описание входа транскрипции для кеша этапов (None - кеш недоступен)"""
+        if self.stage_cache is None or not audio.content_hash:
+            return None
+        
+        return {
+            "stage": "transcription",
+            "audio": audio.content_hash,
+            "sample_rate": audio.sample_rate,
+            "offset": round(audio.offset, 3),
+            "duration": round(audio.duration, 3),
+            "model": self._whisper_model_identity(),
+            "options": self._transcription_options(),
+        }
+    
+    def _transcription_options(self) -> Dict:
+        """Параметры транскрипции, влияющие на результат (для ключей кеша и контрольных точек)"""
+        if self.whisper_model_type == "custom":
+            return {
+                "method": "pipeline" if self.whisper_pipeline is not None else "generate",
+                "language": "russian",
+                "max_new_tokens": 256,
+                "chunk_length_s": 30,
+            }
+        return self._standard_transcribe_options()
+    
+    def _transcribe_checkpointed(self, audio: AudioData, checkpoint: JobCheckpoint) -> Dict:
+        """
+        Транскрипция фрагментами с контрольной точкой после каждого фрагмента
+        
+        Готовые фрагменты читаются из директории задачи, поэтому после
+        прерывания работа продолжается с первого незавершенного фрагмента.
+        Генератор случайных чисел torch фиксируется для каждого фрагмента,
+        чтобы повторно выполненный фрагмент не отличался от прерванного.
+        """
+        import torch
+        
+        chunks = checkpoint.transcription_chunks(audio)
+        results = []
+        restored = 0
+        
+        for index, (chunk_start, chunk_end) in enumerate(chunks):
+            result = checkpoint.load_transcription_chunk(index)
+            if result is not None:
+                restored += 1
+            else:
+                print(f"🧩 Фрагмент {index + 1}/{len(chunks)}: "
+                      f"{audio.offset + chunk_start:.1f}с - {audio.offset + chunk_end:.1f}с")
+                torch.manual_seed(index)
+                result = checkpoint.save_transcription_chunk(
+                    index, self.transcribe(audio.window(chunk_start, chunk_end))
+                )
+            results.append((chunk_start, result))
+        
+        if restored:
+            print(f"♻️  Фрагментов транскрипции из контрольных точек: {restored}/{len(chunks)}")
+        
+        return merge_transcriptions(results)
+    
+    def _standard_transcribe_options(self) -> Dict:
+        """Параметры декодирования для стандартной модели Whisper"""
         # Дополнительные параметры для предотвращения пропуска начала аудио
         transcribe_options = {
             "language": "ru",
@@ -388,33 +826,39 @@ class AudioProcessor:
         
         # Для моделей small и medium добавляем дополнительные настройки
         if self.whisper_model_name in ['small', 'medium', 'large']:
-            print("🔧 Применяем дополнительные настройки для small/medium/large модели...")
             transcribe_options.update({
                 "temperature": 0.1,    # Немного увеличиваем температуру
                 "no_speech_threshold": 0.3,  # Еще ниже порог
                 "condition_on_previous_text": False,  # Отключаем условие предыдущего текста
             })
         
+        return transcribe_options
+    
+    def _transcribe_with_standard_model(self, audio: AudioData) -> Dict:
+        """Транскрипция со стандартной моделью Whisper"""
+        transcribe_options = self._standard_transcribe_options()
+        
+        if self.whisper_model_name in ['small', 'medium', 'large']:
+            print("🔧 Применяем дополнительные настройки для small/medium/large модели...")
+        
+        # Whisper принимает numpy массив 16 кГц напрямую, без повторного вызова ffmpeg
         result = self.whisper_model.transcribe(
-            audio_path,
+            audio.waveform,
             **transcribe_options
         )
         
         return result
     
-    def _transcribe_with_custom_model(self, audio_path: str) -> Dict:
+    def _transcribe_with_custom_model(self, audio: AudioData) -> Dict:
         """Транскрипция с кастомной моделью через transformers"""
-        import librosa
+        import torch
         
         print("🔧 Используем кастомную модель для транскрипции...")
         
-        # Загружаем аудио
-        audio, sr = librosa.load(audio_path, sr=16000)
-        
         # Подготавливаем входные данные
         inputs = self.whisper_processor(
-            audio, 
-            sampling_rate=16000, 
+            audio.waveform, 
+            sampling_rate=audio.sample_rate, 
             return_tensors="pt"
         )
         
@@ -464,21 +908,20 @@ class AudioProcessor:
         
         # Получаем детальную информацию с временными метками
         detailed_result = self._get_detailed_transcription_custom(
-            audio_path, inputs, predicted_ids, transcription
+            audio, inputs, predicted_ids, transcription
         )
         
         return detailed_result
     
-    def _get_detailed_transcription_custom(self, audio_path: str, inputs: Dict, 
-                                         predicted_ids: torch.Tensor, full_text: str) -> Dict:
+    def _get_detailed_transcription_custom(self, audio: AudioData, inputs: Dict, 
+                                         predicted_ids: "torch.Tensor", full_text: str) -> Dict:
         """Получение детальной транскрипции с временными метками для кастомной модели"""
         
         # Пока что возвращаем базовую структуру, совместимую со стандартной моделью
         # В будущем можно добавить более детальную обработку временных меток
         
         # Приблизительно разбиваем на сегменты по длине аудио
-        audio, sr = librosa.load(audio_path, sr=16000)
-        audio_duration = len(audio) / sr
+        audio_duration = audio.duration
         
         # Простое разбиение на сегменты по словам/предложениям
         sentences = full_text.split('. ')
@@ -511,17 +954,11 @@ class AudioProcessor:
             "language": "ru"
         }
     
-    def _transcribe_with_pipeline(self, audio_path: str) -> Dict:
+    def _transcribe_with_pipeline(self, audio: AudioData) -> Dict:
         """Транскрипция с использованием pipeline API (рекомендовано для кастомных моделей)"""
         print("🔧 Используем pipeline API для транскрипции...")
         
         try:
-            # Загружаем аудио как numpy array (правильный формат для pipeline)
-            import librosa
-            
-            print("🔄 Загружаем аудио файл...")
-            audio, sr = librosa.load(audio_path, sr=16000)
-            
             # Параметры генерации как в официальной документации
             generate_kwargs = {
                 "language": "russian",
@@ -531,13 +968,13 @@ class AudioProcessor:
             # Запускаем транскрипцию через pipeline
             print("🎤 Выполняем транскрипцию через pipeline...")
             pipeline_result = self.whisper_pipeline(
-                audio,  # Передаем numpy array вместо BytesIO
+                {"raw": audio.waveform, "sampling_rate": audio.sample_rate},
                 generate_kwargs=generate_kwargs,
                 return_timestamps=True
             )
             
             # Преобразуем результат pipeline в формат, совместимый со стандартной моделью
-            result = self._convert_pipeline_result_to_standard_format(pipeline_result, audio_path)
+            result = self._convert_pipeline_result_to_standard_format(pipeline_result, audio)
             
             return result
             
@@ -545,9 +982,9 @@ class AudioProcessor:
             print(f"⚠️  Ошибка транскрипции через pipeline: {e}")
             print("🔄 Переключаемся на альтернативный метод...")
             # Fallback на стандартный метод кастомной модели
-            return self._transcribe_with_custom_model(audio_path)
+            return self._transcribe_with_custom_model(audio)
     
-    def _convert_pipeline_result_to_standard_format(self, pipeline_result: Dict, audio_path: str) -> Dict:
+    def _convert_pipeline_result_to_standard_format(self, pipeline_result: Dict, audio: AudioData) -> Dict:
         """Конвертирует результат pipeline в стандартный формат"""
         # Pipeline возвращает результат в формате:
         # {"text": "...", "chunks": [{"timestamp": (start, end), "text": "..."}]}
@@ -575,17 +1012,9 @@ class AudioProcessor:
         
         # Если нет chunks, создаем один сегмент из всего текста
         if not segments and text:
-            # Получаем длительность аудио
-            try:
-                import librosa
-                audio, sr = librosa.load(audio_path, sr=16000)
-                audio_duration = len(audio) / sr
-            except Exception:
-                audio_duration = 30.0  # Fallback
-            
             segments = [{
                 "start": 0.0,
-                "end": audio_duration,
+                "end": audio.duration,
                 "text": text.strip()
             }]
         
@@ -595,16 +1024,17 @@ class AudioProcessor:
             "language": "ru"
         }
     
-    def diarize(self, audio_path: str, min_speakers: int = 1, max_speakers: int = 10, 
-                min_segment_duration: float = 0.5) -> Optional[Dict]:
+    def diarize(self, audio: Union[str, AudioData], min_speakers: int = 1, max_speakers: int = 10, 
+                min_segment_duration: float = 0.5, checkpoint: Optional[JobCheckpoint] = None) -> Optional[Dict]:
         """
         Улучшенная диаризация аудио с настройками качества
         
         Args:
-            audio_path: Путь к аудиофайлу
+            audio: Путь к аудиофайлу или декодированное аудио
             min_speakers: Минимальное количество спикеров
             max_speakers: Максимальное количество спикеров
             min_segment_duration: Минимальная длительность сегмента (сек)
+            checkpoint: Директория задачи для контрольных точек сегментации и эмбеддингов
             
         Returns:
             Результат диаризации или None если модель недоступна
@@ -623,435 +1053,567 @@ class AudioProcessor:
                 "max_speakers": max_speakers
             }
             
-            # Запускаем диаризацию с параметрами
-            print("🔄 Анализируем аудио...")
-            diarization = self.diarization_pipeline(audio_path, **diarization_params)
-            
-            # Конвертируем результат и применяем фильтры
-            speakers = []
-            segment_count_before = 0
-            
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                segment_count_before += 1
-                duration = turn.end - turn.start
-                
-                # Фильтруем слишком короткие сегменты
-                if duration >= min_segment_duration:
-                    speakers.append({
-                        "start": turn.start,
-                        "end": turn.end,
-                        "speaker": speaker,
-                        "duration": duration
-                    })
-            
-            # Постобработка: объединяем соседние сегменты одного спикера
-            speakers = self._merge_consecutive_same_speaker(speakers)
+            audio = self._ensure_audio(audio)
+            raw_turns = self._diarization_turns(audio, diarization_params, checkpoint=checkpoint)
             
-            # Переименовываем спикеров в понятные имена
-            speakers = self._rename_speakers(speakers)
-            
-            print(f"📊 Диаризация завершена: {segment_count_before} → {len(speakers)} сегментов")
-            print(f"👥 Найдено спикеров: {len(set(s['speaker'] for s in speakers))}")
-            
-            return {
-                "speakers": speakers,
-                "stats": {
-                    "segments_before_filter": segment_count_before,
-                    "segments_after_filter": len(speakers),
-                    "unique_speakers": len(set(s['speaker'] for s in speakers))
-                }
-            }
+            # Фильтрация, объединение и переименование - общие с офлайн realign
+            return self._postprocess_diarization(raw_turns, min_segment_duration=min_segment_duration)
             
         except Exception as e:
             print(f"⚠️  Ошибка диаризации: {e}")
             return None
     
-    def _merge_consecutive_same_speaker(self, speakers: List[Dict], gap_threshold: float = 0.3) -> List[Dict]:
-        """
-        Объединяет соседние сегменты одного спикера, разделенные короткими паузами
-        
-        Args:
-            speakers: Список сегментов спикеров
-            gap_threshold: Максимальный промежуток для объединения (сек)
-        """
-        if not speakers:
-            return speakers
+    def _diarization_cache_key(self, stage: str, audio: AudioData,
+                               diarization_params: Dict) -> Optional[Dict]:
+        """Описание входа диаризации для кеша этапов (None - кеш недоступен)"""
+        if self.stage_cache is None or not audio.content_hash:
+            return None
         
-        # Сортируем по времени начала
-        speakers = sorted(speakers, key=lambda x: x['start'])
-        merged = [speakers[0]]
+        try:
+            import pyannote.audio
+            pyannote_version = pyannote.audio.__version__
+        except (ImportError, AttributeError):
+            pyannote_version = None
         
-        for current in speakers[1:]:
-            last = merged[-1]
+        return {
+            "stage": stage,
+            "audio": audio.content_hash,
+            "sample_rate": audio.sample_rate,
+            "offset": round(audio.offset, 3),
+            "duration": round(audio.duration, 3),
+            "pipeline": self.diarization_model_name,
+            "pyannote_version": pyannote_version,
+            "params": diarization_params,
+        }
+    
+    def _diarization_turns(self, audio: AudioData, diarization_params: Dict,
+                           checkpoint: Optional[JobCheckpoint] = None) -> List[Dict]:
+        """
+        Сырые реплики pyannote (до фильтрации и объединения), с кешированием
+        """
+        cache_key_fields = self._diarization_cache_key("diarization", audio, diarization_params)
+        if cache_key_fields is not None:
+            cache_key = StageCache.make_key(**cache_key_fields)
+            cached = self.stage_cache.get("diarization", cache_key)
+            if cached is not None:
+                print("⚡ Диаризация взята из кеша")
+                return cached
+        
+        if checkpoint is not None:
+            turns = self._diarization_turns_checkpointed(audio, diarization_params, checkpoint)
+        else:
+            # Запускаем диаризацию с параметрами на уже декодированном сигнале
+            print("🔄 Анализируем аудио...")
+            diarization = self.diarization_pipeline(audio.to_pyannote(), **diarization_params)
             
-            # Если тот же спикер и промежуток небольшой - объединяем
-            if (current['speaker'] == last['speaker'] and 
-                current['start'] - last['end'] <= gap_threshold):
-                
-                # Расширяем последний сегмент
-                merged[-1] = {
-                    "start": last['start'],
-                    "end": current['end'],
-                    "speaker": last['speaker'],
-                    "duration": current['end'] - last['start']
-                }
-            else:
-                merged.append(current)
+            turns = [
+                {"start": turn.start, "end": turn.end, "speaker": speaker}
+                for turn, _, speaker in diarization.itertracks(yield_label=True)
+            ]
         
-        return merged
+        if cache_key_fields is not None:
+            self.stage_cache.put("diarization", cache_key, turns, cache_key_fields)
+        
+        return turns
     
-    def _rename_speakers(self, speakers: List[Dict]) -> List[Dict]:
+    def _diarization_turns_checkpointed(self, audio: AudioData, diarization_params: Dict,
+                                        checkpoint: JobCheckpoint) -> List[Dict]:
         """
-        Переименовывает спикеров в понятные имена (Спикер 1, Спикер 2, etc.)
+        Диаризация с контрольными точками после сегментации и эмбеддингов
+        
+        Выходы шагов сохраняются через hook pyannote. При возобновлении они
+        подставляются в кеш шагов pipeline (ключи training_cache/*, которые
+        SpeakerDiarization читает в режиме training), и pyannote выполняет
+        только оставшиеся шаги.
         """
-        if not speakers:
-            return speakers
+        turns = checkpoint.load_diarization_turns()
+        if turns is not None:
+            print("♻️  Диаризация восстановлена из контрольной точки")
+            return turns
+        
+        pipeline = self.diarization_pipeline
+        file = audio.to_pyannote()
+        threshold = getattr(getattr(pipeline, "segmentation", None), "threshold", None)
+        restored = checkpoint.restore_diarization_steps(file, segmentation_threshold=threshold)
+        
+        print("🔄 Анализируем аудио...")
+        if restored:
+            print(f"♻️  Шаги диаризации из контрольных точек: {', '.join(restored)}")
+            training = pipeline.training
+            pipeline.training = True
+            try:
+                diarization = pipeline(file, hook=checkpoint.pyannote_hook(), **diarization_params)
+            finally:
+                pipeline.training = training
+        else:
+            diarization = pipeline(file, hook=checkpoint.pyannote_hook(), **diarization_params)
         
-        # Собираем уникальных спикеров в порядке появления
-        unique_speakers = []
-        for speaker_data in speakers:
-            speaker = speaker_data['speaker']
-            if speaker not in unique_speakers:
-                unique_speakers.append(speaker)
+        return checkpoint.save_diarization_turns([
+            {"start": turn.start, "end": turn.end, "speaker": speaker}
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ])
+    
+    def _diarization_turns_with_embeddings(self, audio: AudioData, diarization_params: Dict) -> Dict:
+        """
+        Сырые реплики и эмбеддинги спикеров окна (для стабильных меток между окнами)
         
-        # Создаем маппинг старых имен на новые
-        speaker_mapping = {}
-        for i, old_name in enumerate(unique_speakers):
-            speaker_mapping[old_name] = f"Спикер {i + 1}"
+        Returns:
+            {"turns": [...], "embeddings": {метка: вектор} или None, если pipeline
+            не умеет возвращать эмбеддинги}
+        """
+        cache_key_fields = self._diarization_cache_key("diarization_embeddings", audio, diarization_params)
+        if cache_key_fields is not None:
+            cache_key = StageCache.make_key(**cache_key_fields)
+            cached = self.stage_cache.get("diarization_embeddings", cache_key)
+            if cached is not None:
+                return cached
         
-        # Применяем новые имена
-        for speaker_data in speakers:
-            speaker_data['speaker'] = speaker_mapping[speaker_data['speaker']]
+        try:
+            diarization, embeddings = self.diarization_pipeline(
+                audio.to_pyannote(), return_embeddings=True, **diarization_params
+            )
+            embeddings = {
+                label: vector for label, vector in zip(diarization.labels(), embeddings.tolist())
+            }
+        except TypeError:
+            # Старые версии pyannote: метки сопоставляются по перекрытию окон
+            diarization = self.diarization_pipeline(audio.to_pyannote(), **diarization_params)
+            embeddings = None
+        
+        result = {
+            "turns": [
+                {"start": turn.start, "end": turn.end, "speaker": speaker}
+                for turn, _, speaker in diarization.itertracks(yield_label=True)
+            ],
+            "embeddings": embeddings
+        }
         
-        return speakers
+        if cache_key_fields is not None:
+            self.stage_cache.put("diarization_embeddings", cache_key, result, cache_key_fields)
+        
+        return result
     
-    def _align_transcription_with_speakers(self, transcription: Dict, diarization: Dict, 
-                                          alignment_strategy: str = "smart") -> List[Dict]:
+    def process(self, audio_path: Union[str, AudioData], output_dir: str = "output", 
+                min_speakers: int = 1, max_speakers: int = 10, 
+                min_segment_duration: float = 0.5, alignment_strategy: str = "smart",
+                time_limit: Optional[float] = None, start: Optional[float] = None,
+                end: Optional[float] = None, parallel_stages: bool = False,
+                job_dir: Optional[str] = None, resume: bool = False,
+                checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+                decode_time: float = 0.0) -> Dict:
         """
-        Интеллектуальное совмещение транскрипции с информацией о спикерах
+        Полная обработка аудио: транскрипция + диаризация
         
         Args:
-            transcription: Результат транскрипции
-            diarization: Результат диаризации
+            audio_path: Путь к аудиофайлу или окно, уже декодированное через decode()
+                        (тогда time_limit, start и end не применяются)
+            output_dir: Директория для сохранения результатов
+            min_speakers: Минимальное количество спикеров
+            max_speakers: Максимальное количество спикеров  
+            min_segment_duration: Минимальная длительность сегмента
             alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+            time_limit: Ограничение длительности обработки в секундах (от начала окна)
+            start: Начало окна обработки в секундах
+            end: Конец окна обработки в секундах
+            parallel_stages: Выполнять транскрипцию и диаризацию одновременно
+            job_dir: Директория задачи для контрольных точек (None - без контрольных точек)
+            resume: Продолжить задачу по контрольным точкам из job_dir
+            checkpoint_interval: Длительность фрагмента транскрипции между контрольными точками
+            decode_time: Время заранее выполненного декодирования (входит в total_time)
             
         Returns:
-            Список сегментов с текстом и спикерами
+            Результаты обработки
         """
-        if not diarization or "speakers" not in diarization:
-            # Если диаризации нет, возвращаем только транскрипцию
-            segments = []
-            for segment in transcription.get("segments", []):
-                segments.append({
-                    "start": segment["start"],
-                    "end": segment["end"],
-                    "text": segment["text"].strip(),
-                    "speaker": "Unknown"
-                })
-            return segments
+        from audio_io import AudioData
         
-        # Совмещаем транскрипцию и диаризацию
-        aligned_segments = []
-        speaker_segments = diarization["speakers"]
-        transcription_segments = transcription.get("segments", [])
+        total_start_time = time.time() - decode_time
         
-        print(f"🔄 Совмещение с стратегией '{alignment_strategy}'...")
+        if isinstance(audio_path, AudioData):
+            # Пакетный режим декодирует следующие файлы заранее, в фоновых потоках
+            prepared_audio = audio_path
+            audio_path = prepared_audio.source_path
+        else:
+            # Декодируем один раз только нужное окно - оно общее для транскрипции и диаризации
+            prepared_audio = self.decode(audio_path, time_limit=time_limit, start=start, end=end)
         
-        for t_segment in transcription_segments:
-            t_start, t_end = t_segment["start"], t_segment["end"]
-            t_mid = (t_start + t_end) / 2
-            
-            best_speaker = self._find_best_speaker(
-                t_start, t_end, t_mid, speaker_segments, alignment_strategy
+        checkpoint = None
+        if job_dir is not None:
+            fingerprint = self._job_fingerprint(
+                audio_path, prepared_audio, {"min_speakers": min_speakers, "max_speakers": max_speakers}
             )
-            
-            aligned_segments.append({
-                "start": t_start,
-                "end": t_end,
-                "text": t_segment["text"].strip(),
-                "speaker": best_speaker
-            })
+            checkpoint = JobCheckpoint(job_dir, fingerprint, resume=resume,
+                                       chunk_duration=checkpoint_interval)
+        
+        result, stage_outputs = self.analyze(
+            prepared_audio,
+            audio_name=Path(audio_path).name,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers,
+            min_segment_duration=min_segment_duration,
+            alignment_strategy=alignment_strategy,
+            parallel_stages=parallel_stages,
+            checkpoint=checkpoint
+        )
+        result["total_time"] = time.time() - total_start_time
         
-        # Постобработка: устраняем оставшиеся Unknown сегменты
-        aligned_segments = self._resolve_unknown_speakers(aligned_segments, speaker_segments)
+        self.write_outputs(result, stage_outputs, output_dir, Path(audio_path).stem)
         
-        return aligned_segments
+        if checkpoint is not None:
+            checkpoint.mark_completed()
+        
+        return result
+    
+    def _job_fingerprint(self, audio_path: str, audio: AudioData, diarization_params: Dict) -> Dict:
+        """Описание входа, моделей и параметров задачи (контрольные точки действительны только для него)"""
+        return {
+            "audio": audio.content_hash or file_content_hash(audio_path),
+            "sample_rate": audio.sample_rate,
+            "offset": round(audio.offset, 3),
+            "duration": round(audio.duration, 3),
+            "whisper": self._whisper_model_identity(),
+            "transcription_options": self._transcription_options(),
+            "diarization": {
+                "pipeline": self.diarization_model_name if self.diarization_pipeline is not None else None,
+                "params": diarization_params
+            }
+        }
     
-    def _find_best_speaker(self, t_start: float, t_end: float, t_mid: float, 
-                          speaker_segments: List[Dict], strategy: str) -> str:
+    def process_stream(self, audio_path: str, min_speakers: int = 1, max_speakers: int = 10,
+                       min_segment_duration: float = 0.5, alignment_strategy: str = "smart",
+                       time_limit: Optional[float] = None, start: Optional[float] = None,
+                       end: Optional[float] = None, window_duration: float = DEFAULT_STREAM_WINDOW,
+                       overlap: float = DEFAULT_STREAM_OVERLAP) -> Iterator[Dict]:
         """
-        Находит лучшего спикера для транскрипционного сегмента
+        Потоковая обработка: сегменты со спикерами выдаются по мере готовности окон
+        
+        Запись обрабатывается окнами с перекрытием. Каждое окно декодируется,
+        транскрибируется и диаризуется отдельно; метки спикеров окна сопоставляются
+        с глобальными по эмбеддингам pyannote (или по перекрытию окон), поэтому
+        "Спикер 1" остается тем же человеком во всех окнах. Сегмент выдается один
+        раз - окном, в зоне фиксации которого лежит его начало.
+        
+        Args:
+            audio_path: Путь к аудиофайлу
+            min_speakers: Минимальное количество спикеров (в окне)
+            max_speakers: Максимальное количество спикеров (в окне)
+            min_segment_duration: Минимальная длительность сегмента
+            alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+            time_limit: Ограничение длительности обработки в секундах (от начала окна)
+            start: Начало обработки в секундах
+            end: Конец обработки в секундах
+            window_duration: Длительность окна в секундах
+            overlap: Перекрытие соседних окон в секундах
+            
+        Yields:
+            Финальные сегменты {"start", "end", "text", "speaker"} в координатах файла
         """
-        best_speaker = "Unknown"
-        best_score = 0
+        from audio_io import StreamingDecoder, TARGET_SAMPLE_RATE
         
-        for s_segment in speaker_segments:
-            s_start, s_end = s_segment["start"], s_segment["end"]
-            score = 0
-            
-            if strategy == "strict":
-                # Только строгое пересечение
-                overlap_start = max(t_start, s_start)
-                overlap_end = min(t_end, s_end)
-                overlap = max(0, overlap_end - overlap_start)
-                score = overlap
-                
-            elif strategy == "smart":
-                # Комбинированная стратегия
-                # 1. Пересечение (приоритет)
-                overlap_start = max(t_start, s_start)
-                overlap_end = min(t_end, s_end)
-                overlap = max(0, overlap_end - overlap_start)
-                
-                if overlap > 0:
-                    score = overlap * 10  # Высокий приоритет пересечениям
-                else:
-                    # 2. Близость по времени
-                    gap_to_start = abs(t_mid - s_start)
-                    gap_to_end = abs(t_mid - s_end)
-                    min_gap = min(gap_to_start, gap_to_end)
-                    
-                    # 3. Средняя точка сегмента диаризации
-                    s_mid = (s_start + s_end) / 2
-                    gap_to_mid = abs(t_mid - s_mid)
-                    
-                    # Чем ближе, тем выше счет (но меньше чем пересечение)
-                    if min_gap < 2.0:  # Максимум 2 секунды разрыва
-                        score = max(0, 2.0 - min_gap)
-                    elif gap_to_mid < 3.0:  # Альтернатива по средней точке
-                        score = max(0, 1.0 - gap_to_mid / 3.0)
-                        
-            elif strategy == "aggressive":
-                # Очень агрессивное совмещение
-                # Любое пересечение или близость
-                overlap_start = max(t_start, s_start)
-                overlap_end = min(t_end, s_end)
-                overlap = max(0, overlap_end - overlap_start)
-                
-                if overlap > 0:
-                    score = overlap * 10
-                else:
-                    # Расстояние до ближайшей точки
-                    distances = [
-                        abs(t_start - s_start), abs(t_start - s_end),
-                        abs(t_end - s_start), abs(t_end - s_end),
-                        abs(t_mid - s_start), abs(t_mid - s_end)
-                    ]
-                    min_distance = min(distances)
-                    
-                    if min_distance < 5.0:  # До 5 секунд разрыва
-                        score = max(0, 5.0 - min_distance)
-            
-            if score > best_score:
-                best_score = score
-                best_speaker = s_segment["speaker"]
+        audio_path = Path(audio_path)
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Аудиофайл не найден: {audio_path}")
+        
+        first, last = self._resolve_time_window(start, end, time_limit)
         
-        return best_speaker
+        # Полностью декодированный файл из кеша нарезается без копирования,
+        # иначе каждое окно декодируется потоково
+        cached = self.pcm_cache.get(audio_path, TARGET_SAMPLE_RATE) if self.pcm_cache is not None else None
+        if cached is not None:
+            duration = cached.duration
+            read_window = cached.window
+        else:
+            decoder = StreamingDecoder(audio_path, sample_rate=TARGET_SAMPLE_RATE)
+            duration = decoder.duration
+            read_window = decoder.read
+        
+        content_hash = self.content_hashes.content_hash(audio_path) if self.content_hashes is not None else None
+        stop = duration if last is None else min(last, duration)
+        diarization_params = {"min_speakers": min_speakers, "max_speakers": max_speakers}
+        
+        registry = SpeakerRegistry()
+        emitted_until = -math.inf
+        
+        for window_start, window_end, commit in plan_windows(first, stop, window_duration, overlap):
+            window_label = f"{window_start:.1f}с - {window_end:.1f}с"
+            print(f"🪟 Окно {window_label}")
+            audio = read_window(window_start, window_end)
+            audio.content_hash = content_hash
+            
+            segments = self.analyze_window(
+                audio, registry, diarization_params,
+                min_segment_duration=min_segment_duration,
+                alignment_strategy=alignment_strategy
+            )
+            
+            for segment in segments:
+                if emitted_until <= segment["start"] < commit:
+                    yield segment
+            emitted_until = commit
     
-    def _resolve_unknown_speakers(self, segments: List[Dict], speaker_segments: List[Dict]) -> List[Dict]:
+    def analyze_window(self, audio: AudioData, registry: SpeakerRegistry, diarization_params: Dict,
+                       min_segment_duration: float = 0.5, alignment_strategy: str = "smart") -> List[Dict]:
         """
-        Постобработка для устранения Unknown спикеров
-        """
-        if not speaker_segments:
-            return segments
-            
-        # Собираем известных спикеров
-        known_speakers = [s["speaker"] for s in speaker_segments]
-        unknown_segments = [i for i, seg in enumerate(segments) if seg["speaker"] == "Unknown"]
+        Транскрипция, диаризация и совмещение одного окна с глобальными метками спикеров
         
-        if not unknown_segments:
-            return segments
-            
-        print(f"🔧 Исправляем {len(unknown_segments)} Unknown сегментов...")
+        Общий шаг потокового (process_stream) и живого (live) режимов.
         
-        for idx in unknown_segments:
-            segment = segments[idx]
-            t_start, t_end = segment["start"], segment["end"]
-            t_mid = (t_start + t_end) / 2
-            
-            # Стратегия 1: Ближайший по времени известный спикер из диаризации
-            best_speaker = self._find_nearest_speaker(t_mid, speaker_segments)
-            
-            # Стратегия 2: Если не нашли, используем контекст соседних сегментов
-            if best_speaker == "Unknown":
-                best_speaker = self._find_contextual_speaker(idx, segments, known_speakers)
-            
-            # Стратегия 3: Самый частый спикер в аудио
-            if best_speaker == "Unknown" and known_speakers:
-                speaker_counts = {}
-                for s in segments:
-                    if s["speaker"] != "Unknown":
-                        speaker_counts[s["speaker"]] = speaker_counts.get(s["speaker"], 0) + 1
-                
-                if speaker_counts:
-                    best_speaker = max(speaker_counts, key=speaker_counts.get)
-                else:
-                    best_speaker = known_speakers[0] if known_speakers else "Спикер 1"
-            
-            segments[idx]["speaker"] = best_speaker
+        Returns:
+            Сегменты окна {"start", "end", "text", "speaker"} в координатах файла/потока
+        """
+        transcription = self.transcribe(audio)
+        
+        diarization = None
+        if self.diarization_pipeline is not None:
+            try:
+                raw = self._diarization_turns_with_embeddings(audio, diarization_params)
+                absolute_turns = [
+                    dict(turn, start=turn["start"] + audio.offset, end=turn["end"] + audio.offset)
+                    for turn in raw["turns"]
+                ]
+                labels = registry.assign(absolute_turns, raw["embeddings"])
+                turns = [dict(turn, speaker=labels[turn["speaker"]]) for turn in raw["turns"]]
+                diarization = self._postprocess_diarization(
+                    turns, min_segment_duration=min_segment_duration, rename=False
+                )
+            except Exception as e:
+                print(f"⚠️  Ошибка диаризации окна {audio.offset:.1f}с: {e}")
         
-        return segments
+        return self._align_transcription_with_speakers(
+            transcription, diarization, alignment_strategy=alignment_strategy
+        ).shifted(audio.offset).to_records()
     
-    def _find_nearest_speaker(self, t_mid: float, speaker_segments: List[Dict]) -> str:
-        """Находит ближайшего по времени спикера"""
-        min_distance = float('inf')
-        nearest_speaker = "Unknown"
+    def decode(self, audio_path: str, time_limit: Optional[float] = None,
+               start: Optional[float] = None, end: Optional[float] = None) -> AudioData:
+        """
+        Этап декодирования: окно обработки файла в 16 кГц моно
         
-        for s_segment in speaker_segments:
-            s_start, s_end = s_segment["start"], s_segment["end"]
-            s_mid = (s_start + s_end) / 2
-            
-            # Расстояние до средней точки сегмента диаризации
-            distance = abs(t_mid - s_mid)
-            
-            if distance < min_distance:
-                min_distance = distance
-                nearest_speaker = s_segment["speaker"]
-        
-        # Возвращаем только если расстояние разумное (< 10 секунд)
-        return nearest_speaker if min_distance < 10.0 else "Unknown"
-    
-    def _find_contextual_speaker(self, idx: int, segments: List[Dict], known_speakers: List[str]) -> str:
-        """Находит спикера на основе контекста соседних сегментов"""
-        # Смотрим на соседние сегменты
-        before_speaker = None
-        after_speaker = None
-        
-        # Предыдущий известный спикер
-        for i in range(idx - 1, -1, -1):
-            if segments[i]["speaker"] != "Unknown":
-                before_speaker = segments[i]["speaker"]
-                break
-        
-        # Следующий известный спикер  
-        for i in range(idx + 1, len(segments)):
-            if segments[i]["speaker"] != "Unknown":
-                after_speaker = segments[i]["speaker"]
-                break
-        
-        # Если окружен одним спикером, используем его
-        if before_speaker and before_speaker == after_speaker:
-            return before_speaker
-        
-        # Иначе используем ближайшего по времени
-        if before_speaker:
-            return before_speaker
-        elif after_speaker:
-            return after_speaker
-        
-        return "Unknown"
-    
-    def process(self, audio_path: str, output_dir: str = "output", 
-                min_speakers: int = 1, max_speakers: int = 10, 
+        Не использует модели, поэтому может выполняться в фоновых потоках
+        (пакетный режим декодирует следующие файлы во время инференса).
+        """
+        window_start, window_end = self._resolve_time_window(start, end, time_limit)
+        return self._prepare_audio(audio_path, start=window_start, end=window_end)
+    
+    def analyze(self, prepared_audio: AudioData, audio_name: str,
+                min_speakers: int = 1, max_speakers: int = 10,
                 min_segment_duration: float = 0.5, alignment_strategy: str = "smart",
-                time_limit: Optional[float] = None) -> Dict:
+                parallel_stages: bool = False,
+                checkpoint: Optional[JobCheckpoint] = None) -> Tuple[Dict, Dict]:
         """
-        Полная обработка аудио: транскрипция + диаризация
+        Этап инференса: транскрипция, диаризация и совмещение декодированного аудио
+        
+        С checkpoint транскрипция идет фрагментами, а фрагменты и шаги
+        диаризации сохраняются в директорию задачи (и берутся из нее).
         
-        Args:
-            audio_path: Путь к аудиофайлу
-            output_dir: Директория для сохранения результатов
-            min_speakers: Минимальное количество спикеров
-            max_speakers: Максимальное количество спикеров  
-            min_segment_duration: Минимальная длительность сегмента
-            alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
-            time_limit: Ограничение времени транскрипции в секундах
-            
         Returns:
-            Результаты обработки
+            (итоговый результат, сырые выходы этапов для *_stages.json)
         """
-        # Создаем директорию вывода
-        output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
+        total_start_time = time.time()
         
-        # Подготавливаем аудио
-        prepared_audio = self._prepare_audio(audio_path)
+        diarization_kwargs = {
+            "min_speakers": min_speakers,
+            "max_speakers": max_speakers,
+            "min_segment_duration": min_segment_duration,
+            "checkpoint": checkpoint
+        }
         
-        try:
+        if parallel_stages:
+            (transcription_result, transcription_time,
+             diarization_result, diarization_time) = self._run_stages_parallel(
+                prepared_audio, diarization_kwargs, checkpoint=checkpoint
+            )
+        else:
             # Транскрипция
             start_time = time.time()
-            transcription_result = self.transcribe(prepared_audio, time_limit=time_limit)
+            transcription_result = self._transcribe_stage(prepared_audio, checkpoint)
             transcription_time = time.time() - start_time
             
             # Диаризация с улучшенными параметрами
             start_time = time.time()
-            diarization_result = self.diarize(
-                prepared_audio, 
-                min_speakers=min_speakers,
-                max_speakers=max_speakers,
-                min_segment_duration=min_segment_duration
-            )
+            diarization_result = self.diarize(prepared_audio, **diarization_kwargs)
             diarization_time = time.time() - start_time
-            
-            # Совмещаем результаты с выбранной стратегией
-            aligned_segments = self._align_transcription_with_speakers(
-                transcription_result, 
-                diarization_result,
-                alignment_strategy=alignment_strategy
-            )
-            
-            # Подготавливаем итоговый результат
-            result = {
-                "audio_file": str(Path(audio_path).name),
-                "transcription": transcription_result.get("text", ""),
-                "segments": aligned_segments,
-                "language": transcription_result.get("language", "unknown"),
-                "has_speaker_diarization": diarization_result is not None,
-                "transcription_time": transcription_time,
-                "diarization_time": diarization_time,
-                "diarization_stats": diarization_result.get("stats", {}) if diarization_result else {},
-                "alignment_strategy": alignment_strategy
+        
+        # Совмещаем результаты с выбранной стратегией
+        aligned_segments = self._align_transcription_with_speakers(
+            transcription_result, 
+            diarization_result,
+            alignment_strategy=alignment_strategy
+        )
+        
+        # Подготавливаем итоговый результат (время - в координатах исходного файла,
+        # сегменты переводятся в словари только здесь, на границе JSON)
+        result = {
+            "audio_file": audio_name,
+            "transcription": transcription_result.get("text", ""),
+            "segments": aligned_segments.shifted(prepared_audio.offset).to_records(),
+            "language": transcription_result.get("language", "unknown"),
+            "has_speaker_diarization": diarization_result is not None,
+            "transcription_time": transcription_time,
+            "diarization_time": diarization_time,
+            "total_time": time.time() - total_start_time,
+            "parallel_stages": parallel_stages,
+            "diarization_stats": diarization_result.get("stats", {}) if diarization_result else {},
+            "alignment_strategy": alignment_strategy,
+            "time_window": {
+                "start": prepared_audio.offset,
+                "end": prepared_audio.offset + prepared_audio.duration
             }
-            
-            # Сохраняем результаты
-            self._save_results(result, output_path, Path(audio_path).stem)
-            
-            return result
-            
+        }
+        
+        stage_outputs = {
+            "transcription": transcription_result,
+            "diarization": diarization_result,
+            "diarization_params": {"min_speakers": min_speakers, "max_speakers": max_speakers},
+            "offset": prepared_audio.offset
+        }
+        
+        return result, stage_outputs
+    
+    def write_outputs(self, result: Dict, stage_outputs: Dict, output_dir: str, base_name: str):
+        """Этап записи: результаты (JSON/CSV/TXT) и сырые выходы этапов"""
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        # Сохраняем результаты
+        self._save_results(result, output_path, base_name)
+        
+        # Сырые выходы этапов - для повторного совмещения без моделей (команда realign)
+        self._save_stage_outputs(
+            stage_outputs["transcription"], stage_outputs["diarization"],
+            stage_outputs["diarization_params"], stage_outputs["offset"],
+            output_path, base_name
+        )
+    
+    def _transcribe_stage(self, audio: AudioData, checkpoint: Optional[JobCheckpoint] = None) -> Dict:
+        """Транскрипция целиком, фрагментами с контрольными точками или в пуле процессов"""
+        if checkpoint is not None:
+            return self._transcribe_checkpointed(audio, checkpoint)
+        if self.parallel_transcriber is not None:
+            return self.parallel_transcriber.transcribe(audio)
+        return self.transcribe(audio)
+    
+    def enable_parallel_transcription(self, processor_kwargs: Dict, workers: int,
+                                      threads_per_worker: Optional[int] = None,
+                                      chunk_duration: Optional[float] = None,
+                                      overlap: float = DEFAULT_CHUNK_OVERLAP):
+        """
+        Транскрипция этапа analyze() фрагментами в пуле процессов
+        
+        Args:
+            processor_kwargs: Параметры AudioProcessor для процессов пула (модель, устройство, кеши)
+            workers: Количество процессов
+            threads_per_worker: Потоки torch на процесс (по умолчанию - ядра поровну)
+            chunk_duration: Длительность фрагмента в секундах (None - автоматически)
+            overlap: Перекрытие соседних фрагментов в секундах
+        """
+        from parallel import ParallelTranscriber
+        
+        self.parallel_transcriber = ParallelTranscriber(
+            processor_kwargs, workers, threads_per_worker=threads_per_worker,
+            chunk_duration=chunk_duration, overlap=overlap
+        )
+        self.parallel_transcriber.start()
+    
+    def close(self):
+        """Остановка пула процессов транскрипции (если запущен)"""
+        if self.parallel_transcriber is not None:
+            self.parallel_transcriber.close()
+            self.parallel_transcriber = None
+    
+    def share_memory(self) -> int:
+        """
+        Перенос весов загруженных моделей в разделяемую память (share_memory_)
+        
+        Процессы, созданные после этого через fork, используют одну копию весов
+        вместо собственной. Только для CPU: CUDA не переживает fork.
+        
+        Returns:
+            Размер весов в разделяемой памяти (байты)
+        """
+        import types
+        import torch
+        
+        if self.device != "cpu":
+            raise RuntimeError(f"Общие веса между процессами доступны только на CPU (устройство: {self.device})")
+        
+        # Модули torch внутри Whisper, pipeline transformers и pipeline pyannote
+        modules = []
+        seen = set()
+        
+        def collect(value, depth: int):
+            if depth > 4 or id(value) in seen or isinstance(value, (type, types.ModuleType)):
+                return
+            seen.add(id(value))
+            if isinstance(value, torch.nn.Module):
+                modules.append(value)
+            elif isinstance(value, dict):
+                for item in value.values():
+                    collect(item, depth + 1)
+            elif isinstance(value, (list, tuple)):
+                for item in value:
+                    collect(item, depth + 1)
+            elif hasattr(value, "__dict__"):
+                for item in vars(value).values():
+                    collect(item, depth + 1)
+        
+        for model in (self.whisper_model, self.whisper_pipeline, self.diarization_pipeline):
+            if model is not None:
+                collect(model, 0)
+        
+        shared = 0
+        storages = set()
+        for module in modules:
+            for tensor in list(module.parameters()) + list(module.buffers()):
+                # Разреженные тензоры (alignment_heads в Whisper) не имеют storage
+                if tensor.is_sparse or tensor.device.type != "cpu":
+                    continue
+                tensor.share_memory_()
+                pointer = tensor.untyped_storage().data_ptr()
+                if pointer not in storages:
+                    storages.add(pointer)
+                    shared += tensor.untyped_storage().nbytes()
+        return shared
+    
+    def _run_stages_parallel(self, audio: AudioData, diarization_kwargs: Dict,
+                             checkpoint: Optional[JobCheckpoint] = None) -> Tuple[Dict, float, Optional[Dict], float]:
+        """
+        Одновременный запуск транскрипции и диаризации на общем декодированном аудио
+        
+        Бюджет intra-op потоков torch делится между этапами, чтобы они не
+        конкурировали за одни и те же ядра. После завершения бюджет восстанавливается.
+        
+        Returns:
+            (транскрипция, время транскрипции, диаризация, время диаризации)
+        """
+        import torch
+        from concurrent.futures import ThreadPoolExecutor
+        
+        total_threads = torch.get_num_threads()
+        # Whisper обычно тяжелее pyannote - отдаем ему большую половину
+        whisper_threads = max(1, (total_threads + 1) // 2)
+        diarization_threads = max(1, total_threads - whisper_threads)
+        print(f"⚡ Параллельные этапы: Whisper {whisper_threads} потоков, "
+              f"диаризация {diarization_threads} потоков")
+        
+        def timed_stage(stage, num_threads, *args, **kwargs):
+            # Число потоков torch задается в потоке, который выполняет этап
+            torch.set_num_threads(num_threads)
+            stage_start = time.time()
+            stage_result = stage(*args, **kwargs)
+            return stage_result, time.time() - stage_start
+        
+        try:
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="stage") as executor:
+                transcription_future = executor.submit(timed_stage, self._transcribe_stage,
+                                                       whisper_threads, audio, checkpoint)
+                diarization_future = executor.submit(timed_stage, self.diarize,
+                                                     diarization_threads, audio, **diarization_kwargs)
+                transcription_result, transcription_time = transcription_future.result()
+                diarization_result, diarization_time = diarization_future.result()
         finally:
-            # Удаляем временный файл если он был создан
-            if prepared_audio != audio_path and os.path.exists(prepared_audio):
-                os.unlink(prepared_audio)
-    
-    def _save_results(self, result: Dict, output_path: Path, base_name: str):
-        """Сохранение результатов в различных форматах"""
-        
-        # JSON
-        json_path = output_path / f"{base_name}_result.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
-        print(f"💾 Результат сохранен: {json_path}")
-        
-        # CSV
-        if result["segments"]:
-            df = pd.DataFrame(result["segments"])
-            csv_path = output_path / f"{base_name}_segments.csv"
-            df.to_csv(csv_path, index=False, encoding='utf-8')
-            print(f"💾 Сегменты сохранены: {csv_path}")
-        
-        # TXT (читаемый формат)
-        txt_path = output_path / f"{base_name}_transcript.txt"
-        with open(txt_path, 'w', encoding='utf-8') as f:
-            f.write(f"Транскрипция: {result['audio_file']}\n")
-            f.write(f"Язык: {result['language']}\n")
-            f.write(f"Диаризация: {'Да' if result['has_speaker_diarization'] else 'Нет'}\n\n")
-            
-            if result["has_speaker_diarization"]:
-                f.write("=== ТРАНСКРИПЦИЯ ПО СПИКЕРАМ ===\n\n")
-                current_speaker = None
-                for segment in result["segments"]:
-                    if segment["speaker"] != current_speaker:
-                        current_speaker = segment["speaker"]
-                        f.write(f"\n[{current_speaker}]:\n")
-                    
-                    start_time = f"{int(segment['start']//60):02d}:{int(segment['start']%60):02d}"
-                    f.write(f"{start_time} - {segment['text']}\n")
-            else:
-                f.write("=== ТРАНСКРИПЦИЯ ===\n\n")
-                f.write(result["transcription"])
+            torch.set_num_threads(total_threads)
         
-        print(f"💾 Транскрипт сохранен: {txt_path}")
-
+        return transcription_result, transcription_time, diarization_result, diarization_time
+    
     def test_transcription_with_different_settings(self, audio_path: str) -> Dict:
         """
         Тестирование транскрипции с разными настройками для диагностики проблем
@@ -1064,6 +1626,9 @@ class AudioProcessor:
         """
         print("🧪 Тестируем разные настройки транскрипции...")
         
+        # Декодируем один раз для всех прогонов
+        audio = self._prepare_audio(audio_path)
+        
         settings_to_test = [
             {
                 "name": "Стандартные настройки",
@@ -1109,7 +1674,7 @@ class AudioProcessor:
         for setting in settings_to_test:
             print(f"📝 Тестируем: {setting['name']}")
             try:
-                result = self.whisper_model.transcribe(audio_path, **setting['options'])
+                result = self.whisper_model.transcribe(audio.waveform, **setting['options'])
                 
                 # Анализируем результат
                 segments = result.get('segments', [])
@@ -1134,7 +1699,32 @@ class AudioProcessor:
         return results
 
 
-@click.command()
+class DefaultCommandGroup(click.Group):
+    """
+    Группа команд с командой по умолчанию
+    
+    Если первый аргумент не является именем команды, вызывается process -
+    так сохраняется привычный вызов `python main.py audio.wav`.
+    """
+    
+    default_command = "process"
+    
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def cli():
+    """
+    Whisper + PyAnnote Audio Pipeline
+    
+    По умолчанию выполняется команда process: python main.py AUDIO_FILE [OPTIONS]
+    """
+
+
+@cli.command("process")
 @click.argument('audio_file')
 @click.option('--model', '-m', default='large', 
               type=click.Choice(['tiny', 'base', 'small', 'medium', 'large']),
@@ -1147,6 +1737,12 @@ class AudioProcessor:
               help='HuggingFace токен (можно задать в переменной HUGGINGFACE_TOKEN)')
 @click.option('--local-models', envvar='LOCAL_MODELS_DIR',
               help='Директория с локальными моделями (можно задать в переменной LOCAL_MODELS_DIR)')
+@click.option('--offline', is_flag=True, envvar='HF_HUB_OFFLINE',
+              help='Строгий офлайн-режим: модели только из локальных файлов и кеша, без обращений к сети')
+@click.option('--model-variant', type=click.Choice(list(VARIANT_DTYPES)),
+              help='Вариант весов оптимизированного пакета --custom-model (по умолчанию: по устройству)')
+@click.option('--quantize', type=click.Choice(['int8']),
+              help='Динамическое int8-квантование слоев Linear модели Whisper (только CPU)')
 @click.option('--device', default=None, type=click.Choice(['cpu', 'cuda', 'mps']), 
               help='Устройство для инференса (cpu, cuda, mps)')
 @click.option('--min-speakers', default=1, type=int,
@@ -1160,20 +1756,145 @@ class AudioProcessor:
 @click.option('--test-transcription', is_flag=True,
               help='Протестировать разные настройки транскрипции для диагностики проблем')
 @click.option('--time-limit', type=float,
-              help='Ограничение времени транскрипции в секундах (например, 3500 для транскрипции первых 3500 секунд)')
+              help='Ограничение времени обработки в секундах (например, 3500 для обработки первых 3500 секунд)')
+@click.option('--start', 'start', type=float,
+              help='Начало окна обработки в секундах (декодируется только окно)')
+@click.option('--end', 'end', type=float,
+              help='Конец окна обработки в секундах')
+@click.option('--cache-dir', envvar='CACHE_DIR',
+              help='Директория кешей (по умолчанию: $XDG_CACHE_HOME/whisper-diarization или ~/.cache/whisper-diarization)')
+@click.option('--audio-cache/--no-audio-cache', default=True,
+              help='Кешировать декодированное аудио между запусками (по умолчанию: включено)')
+@click.option('--audio-cache-size', default=10.0, type=float,
+              help='Максимальный размер кеша декодированного аудио в ГБ (по умолчанию: 10)')
+@click.option('--stage-cache/--no-stage-cache', default=True,
+              help='Кешировать сырые результаты транскрипции и диаризации (по умолчанию: включено)')
+@click.option('--parallel-stages', is_flag=True,
+              help='Выполнять транскрипцию и диаризацию одновременно (потоки CPU делятся между этапами)')
+@click.option('--skip-existing/--overwrite', default=True,
+              help='Пакетный режим: пропускать файлы, для которых уже есть результат (по умолчанию: пропускать)')
+@click.option('--prefetch', default=2, type=int,
+              help='Пакетный режим: сколько файлов декодировать заранее во время инференса (0 - последовательно)')
+@click.option('--workers', default=1, type=int,
+              help='Пакетный режим: процессов, каждый со своими моделями (по умолчанию: 1; файлы - от длинных к коротким)')
+@click.option('--share-models', is_flag=True,
+              help='Пакетный режим (--workers): модели загружаются один раз, процессы создаются через fork и разделяют веса (только CPU)')
+@click.option('--pin-cpus', is_flag=True,
+              help='Пакетный режим: привязать каждый процесс к своему набору ядер (--worker-threads ядер)')
+@click.option('--compact-json', is_flag=True,
+              help='Сохранять *_result.json без отступов (меньше размер, быстрее запись)')
+@click.option('--stream', is_flag=True,
+              help='Потоковый режим: сегменты со спикерами выводятся в stdout (NDJSON) по мере готовности')
+@click.option('--stream-window', default=DEFAULT_STREAM_WINDOW, type=float,
+              help=f'Потоковый режим: длительность окна в секундах (по умолчанию: {DEFAULT_STREAM_WINDOW:.0f})')
+@click.option('--stream-overlap', default=DEFAULT_STREAM_OVERLAP, type=float,
+              help=f'Потоковый режим: перекрытие окон в секундах (по умолчанию: {DEFAULT_STREAM_OVERLAP:.0f})')
+@click.option('--transcribe-workers', default=1, type=int,
+              help='Процессов для параллельной транскрипции фрагментов одного файла (по умолчанию: 1 - без пула)')
+@click.option('--worker-threads', type=int,
+              help='Потоков torch на процесс пула (--workers/--transcribe-workers; по умолчанию: ядра поровну)')
+@click.option('--chunk-duration', type=float,
+              help='Длительность фрагмента параллельной транскрипции в секундах (по умолчанию: автоматически)')
+@click.option('--chunk-overlap', default=DEFAULT_CHUNK_OVERLAP, type=float,
+              help=f'Перекрытие фрагментов параллельной транскрипции в секундах (по умолчанию: {DEFAULT_CHUNK_OVERLAP:g})')
+@click.option('--job-dir',
+              help='Директория задачи для контрольных точек (по умолчанию с --resume: <output>/<имя>.job)')
+@click.option('--resume', is_flag=True,
+              help='Продолжить прерванную задачу по контрольным точкам из --job-dir')
+@click.option('--checkpoint-interval', default=DEFAULT_CHECKPOINT_INTERVAL, type=float,
+              help=f'Длительность фрагмента транскрипции между контрольными точками в секундах (по умолчанию: {DEFAULT_CHECKPOINT_INTERVAL:g})')
 def main(audio_file: str, model: str, custom_model: Optional[str], output: str, hf_token: Optional[str], 
-         local_models: Optional[str], device: Optional[str], min_speakers: int, 
+         local_models: Optional[str], offline: bool, model_variant: Optional[str],
+         quantize: Optional[str], device: Optional[str], min_speakers: int, 
          max_speakers: int, min_segment: float, alignment_strategy: str, test_transcription: bool,
-         time_limit: Optional[float]):
+         time_limit: Optional[float], start: Optional[float], end: Optional[float],
+         cache_dir: Optional[str], audio_cache: bool, audio_cache_size: float, stage_cache: bool,
+         parallel_stages: bool, skip_existing: bool, prefetch: int, workers: int, share_models: bool,
+         pin_cpus: bool,
+         compact_json: bool,
+         stream: bool, stream_window: float, stream_overlap: float,
+         transcribe_workers: int, worker_threads: Optional[int], chunk_duration: Optional[float],
+         chunk_overlap: float, job_dir: Optional[str], resume: bool, checkpoint_interval: float):
     """
     Пайплайн транскрипции и диаризации аудио с улучшенными настройками
     
-    AUDIO_FILE: Путь к аудиофайлу для обработки
+    AUDIO_FILE: Путь к аудиофайлу, каталогу, glob-шаблону ("calls/*.mp3")
+    или JSONL-манифесту для пакетной обработки
     """
     
+    # В потоковом режиме stdout занят NDJSON, поэтому все сообщения идут в stderr
+    ndjson_out = None
+    if stream:
+        ndjson_out = sys.stdout
+        sys.stdout = sys.stderr
+    
+    # Пакетный режим: каталог, glob или манифест - модели загружаются один раз
+    batch_items = None
+    if is_batch_input(audio_file):
+        try:
+            batch_items = collect_batch_items(audio_file, output)
+        except (OSError, ValueError) as e:
+            print(f"❌ Ошибка чтения списка файлов: {e}")
+            sys.exit(1)
+        
+        if not batch_items:
+            print(f"❌ Не найдено аудиофайлов: {audio_file}")
+            sys.exit(1)
+        
+        if test_transcription:
+            print("❌ --test-transcription недоступен в пакетном режиме")
+            sys.exit(1)
+        
+        if stream:
+            print("❌ --stream недоступен в пакетном режиме")
+            sys.exit(1)
+        
+        if job_dir or resume:
+            print("❌ --job-dir и --resume недоступны в пакетном режиме (используйте --skip-existing)")
+            sys.exit(1)
+    
+    if stream and (job_dir or resume):
+        print("❌ --job-dir и --resume недоступны в потоковом режиме")
+        sys.exit(1)
+    
+    if checkpoint_interval <= 0:
+        print("❌ --checkpoint-interval должен быть положительным")
+        sys.exit(1)
+    
+    if transcribe_workers < 1:
+        print("❌ --transcribe-workers должен быть не меньше 1")
+        sys.exit(1)
+    
+    if transcribe_workers > 1 and (stream or job_dir or resume):
+        print("❌ --transcribe-workers недоступен с --stream и --job-dir/--resume")
+        sys.exit(1)
+    
+    if workers < 1:
+        print("❌ --workers должен быть не меньше 1")
+        sys.exit(1)
+    
+    if workers > 1 and batch_items is None:
+        print("❌ --workers работает только в пакетном режиме (каталог, glob или манифест); "
+              "для одного файла используйте --transcribe-workers")
+        sys.exit(1)
+    
+    if workers > 1 and transcribe_workers > 1:
+        print("❌ --workers и --transcribe-workers нельзя использовать вместе")
+        sys.exit(1)
+    
+    if share_models and workers < 2:
+        print("❌ --share-models работает только с --workers 2 и больше")
+        sys.exit(1)
+    
+    if share_models and device not in (None, "cpu"):
+        print("❌ --share-models доступен только на CPU (--device cpu)")
+        sys.exit(1)
+    
     # Проверяем и корректируем путь к аудиофайлу
     input_dir = Path("input")
-    if input_dir.exists() and not Path(audio_file).exists():
+    if batch_items is not None:
+        pass
+    elif input_dir.exists() and not Path(audio_file).exists():
         # Ищем файл в input/ директории
         input_file_path = input_dir / audio_file
         if input_file_path.exists():
@@ -1199,7 +1920,10 @@ def main(audio_file: str, model: str, custom_model: Optional[str], output: str,
         sys.exit(1)
     
     print("🎵 Whisper + PyAnnote Audio Pipeline (Улучшенная диаризация + Кастомные модели)")
-    print(f"📁 Обрабатываем: {audio_file}")
+    if batch_items is not None:
+        print(f"📦 Пакетная обработка: {len(batch_items)} файлов из {audio_file}")
+    else:
+        print(f"📁 Обрабатываем: {audio_file}")
     
     if custom_model:
         print(f"🧠 Кастомная модель Whisper: {custom_model}")
@@ -1212,6 +1936,15 @@ def main(audio_file: str, model: str, custom_model: Optional[str], output: str,
     if time_limit:
         print(f"⏱️  Ограничение времени: {time_limit} секунд")
     
+    if start is not None or end is not None:
+        print(f"🪟 Окно обработки: {start or 0.0}с - {end if end is not None else 'конец'}")
+        if end is not None and end <= (start or 0.0):
+            print("❌ --end должен быть больше --start")
+            sys.exit(1)
+    
+    if offline:
+        print("📴 Офлайн-режим: модели только из локальных файлов и кеша")
+    
     if local_models:
         print(f"🏠 Используем локальные модели из: {local_models}")
     elif not hf_token:
@@ -1220,20 +1953,72 @@ def main(audio_file: str, model: str, custom_model: Optional[str], output: str,
         print("💡 Или скачайте модели локально: python download_models.py")
     
     # Проверяем совместимость опций
+    if quantize and device in ("cuda", "mps"):
+        print("❌ --quantize int8 работает только на CPU (--device cpu)")
+        sys.exit(1)
+    
     if custom_model and not HF_TRANSFORMERS_AVAILABLE:
         print("❌ Для использования кастомных моделей нужна библиотека transformers")
         print("💡 Установите: pip install transformers")
         sys.exit(1)
     
+    cache_root = Path(cache_dir) if cache_dir else default_cache_dir()
+    
+    processor_kwargs = {
+        "whisper_model": model,
+        "hf_token": hf_token,
+        "local_models_dir": local_models,
+        "device": device,
+        "custom_whisper_model": custom_model,
+        "cache_dir": str(cache_root),
+        "audio_cache": audio_cache,
+        "audio_cache_size": int(audio_cache_size * 1024 ** 3),
+        "stage_cache": stage_cache,
+        "compact_json": compact_json,
+        "offline": offline,
+        "model_variant": model_variant,
+        "quantize": quantize
+    }
+    
+    process_options = {
+        "min_speakers": min_speakers,
+        "max_speakers": max_speakers,
+        "min_segment_duration": min_segment,
+        "alignment_strategy": alignment_strategy,
+        "time_limit": time_limit,
+        "start": start,
+        "end": end,
+        "parallel_stages": parallel_stages
+    }
+    
+    # Пакет в нескольких процессах: модели загружаются в каждом процессе пула, а не здесь
+    if workers > 1:
+        runner = WorkerPoolBatchRunner(processor_kwargs, process_options, skip_existing=skip_existing,
+                                       workers=workers, threads_per_worker=worker_threads,
+                                       pin_cpus=pin_cpus, share_models=share_models)
+        try:
+            report = runner.run(batch_items, report_path=Path(output) / "batch_report.json")
+        except Exception as e:
+            print(f"❌ Ошибка: {e}")
+            sys.exit(1)
+        if report["summary"]["failed"]:
+            sys.exit(1)
+        return
+    
+    processor = None
     try:
         # Создаем процессор
-        processor = AudioProcessor(
-            whisper_model=model, 
-            hf_token=hf_token,
-            local_models_dir=local_models,
-            device=device,
-            custom_whisper_model=custom_model
-        )
+        processor = AudioProcessor(**processor_kwargs)
+        
+        # Пул процессов транскрипции: у каждого своя модель Whisper и свой бюджет потоков
+        if transcribe_workers > 1 and not test_transcription:
+            processor.enable_parallel_transcription(
+                dict(processor_kwargs, audio_cache=False),
+                workers=transcribe_workers,
+                threads_per_worker=worker_threads,
+                chunk_duration=chunk_duration,
+                overlap=chunk_overlap
+            )
         
         # Если включено тестирование, запускаем диагностику
         if test_transcription:
@@ -1278,16 +2063,48 @@ def main(audio_file: str, model: str, custom_model: Optional[str], output: str,
             
             return
         
+        if stream:
+            # NDJSON: одна строка на финальный сегмент, сразу после готовности окна
+            segment_count = 0
+            for segment in processor.process_stream(
+                audio_file,
+                min_speakers=min_speakers,
+                max_speakers=max_speakers,
+                min_segment_duration=min_segment,
+                alignment_strategy=alignment_strategy,
+                time_limit=time_limit,
+                start=start,
+                end=end,
+                window_duration=stream_window,
+                overlap=stream_overlap
+            ):
+                ndjson_out.write(json.dumps(segment, ensure_ascii=False) + "\n")
+                ndjson_out.flush()
+                segment_count += 1
+            
+            print(f"\n✅ Потоковая обработка завершена: {segment_count} сегментов")
+            return
+        
+        if batch_items is not None:
+            if prefetch > 0:
+                # Декодирование следующих файлов и запись результатов идут параллельно с инференсом
+                runner = PrefetchingBatchRunner(processor, process_options,
+                                                skip_existing=skip_existing, prefetch=prefetch)
+            else:
+                runner = BatchRunner(processor, process_options, skip_existing=skip_existing)
+            report = runner.run(batch_items, report_path=Path(output) / "batch_report.json")
+            if report["summary"]["failed"]:
+                sys.exit(1)
+            return
+        
+        # Контрольные точки: фрагменты транскрипции и шаги диаризации в директории задачи
+        if job_dir or resume:
+            job_dir = job_dir or str(Path(output) / f"{Path(audio_file).stem}.job")
+            print(f"💾 Контрольные точки: {job_dir} (фрагменты по {checkpoint_interval:g}с)")
+            process_options.update(job_dir=job_dir, resume=resume, checkpoint_interval=checkpoint_interval)
+        
         # Обрабатываем аудио с улучшенными настройками
-        result = processor.process(
-            audio_file, 
-            output,
-            min_speakers=min_speakers,
-            max_speakers=max_speakers,
-            min_segment_duration=min_segment,
-            alignment_strategy=alignment_strategy,
-            time_limit=time_limit
-        )
+        result = processor.process(audio_file, output, **process_options)
         
         print("\n✅ Обработка завершена!")
         print(f"📊 Найдено сегментов: {len(result['segments'])}")
@@ -1316,11 +2133,278 @@ def main(audio_file: str, model: str, custom_model: Optional[str], output: str,
         print(f"📝 Полный текст: {len(result['transcription'])} символов")
         print(f"⏱️  Время транскрипции: {result['transcription_time']:.1f}с")
         print(f"⏱️  Время диаризации: {result['diarization_time']:.1f}с")
+        print(f"⏱️  Общее время: {result['total_time']:.1f}с")
+        if result['parallel_stages']:
+            overlap_gain = result['transcription_time'] + result['diarization_time'] - result['total_time']
+            print(f"⚡ Выигрыш от параллельных этапов: {max(0.0, overlap_gain):.1f}с")
+        
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    finally:
+        if processor is not None:
+            processor.close()
+
+
+@cli.command("realign")
+@click.argument('result_json', type=click.Path(exists=True, dir_okay=False))
+@click.option('--stages', 'stages_path', type=click.Path(exists=True, dir_okay=False),
+              help='Файл *_stages.json с сырыми результатами (по умолчанию: рядом с RESULT_JSON)')
+@click.option('--output', '-o', default=None,
+              help='Директория для новых результатов (по умолчанию: рядом с RESULT_JSON)')
+@click.option('--min-segment', default=0.5, type=float,
+              help='Минимальная длительность сегмента в секундах (по умолчанию: 0.5)')
+@click.option('--merge-gap', default=SegmentPostProcessor.DEFAULT_MERGE_GAP, type=float,
+              help='Максимальная пауза для объединения реплик одного спикера (по умолчанию: 0.3)')
+@click.option('--alignment-strategy', default='smart', type=click.Choice(['strict', 'smart', 'aggressive']),
+              help='Стратегия совмещения (strict, smart, aggressive)')
+@click.option('--compact-json', is_flag=True,
+              help='Сохранять *_result.json без отступов')
+def realign(result_json: str, stages_path: Optional[str], output: Optional[str],
+            min_segment: float, merge_gap: float, alignment_strategy: str, compact_json: bool):
+    """
+    Повторное совмещение и экспорт без загрузки моделей
+    
+    RESULT_JSON: Файл *_result.json от предыдущего запуска. Если рядом нет
+    *_stages.json, результат только экспортируется заново.
+    """
+    try:
+        postprocessor = SegmentPostProcessor()
+        postprocessor.compact_json = compact_json
+        result = postprocessor.realign(
+            result_json,
+            stages_path=stages_path,
+            output_dir=output,
+            alignment_strategy=alignment_strategy,
+            min_segment_duration=min_segment,
+            merge_gap=merge_gap
+        )
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+        sys.exit(1)
+    
+    print("\n✅ Пересовмещение завершено!")
+    print(f"📊 Сегментов: {len(result['segments'])}")
+    print(f"🎯 Стратегия совмещения: {result['alignment_strategy']}")
+    unknown_count = sum(1 for seg in result['segments'] if seg['speaker'] == 'Unknown')
+    if unknown_count > 0:
+        print(f"⚠️  Unknown сегментов: {unknown_count}")
+
+
+@cli.command("serve")
+@click.option('--host', default='127.0.0.1', help='Адрес HTTP сервера (по умолчанию: 127.0.0.1)')
+@click.option('--port', default=8765, type=int, help='Порт HTTP сервера (по умолчанию: 8765)')
+@click.option('--socket', 'socket_path', help='Слушать Unix socket вместо TCP')
+@click.option('--instances', default=1, type=int,
+              help='Количество резидентных экземпляров моделей (по умолчанию: 1)')
+@click.option('--model', '-m', default='large', 
+              type=click.Choice(['tiny', 'base', 'small', 'medium', 'large']),
+              help='Модель Whisper для использования (только для стандартных моделей)')
+@click.option('--custom-model', '--custom-whisper-model', 
+              help='Путь к кастомной модели Whisper (HuggingFace format) или HF model ID')
+@click.option('--output', '-o', default='output/server', 
+              help='Директория для результатов задач и загруженных файлов')
+@click.option('--input-root',
+              help='Каталог, файлы из которого можно указывать в задачах по пути (audio_path); '
+                   'без него - только загрузка файлов')
+@click.option('--keep-jobs', default=1000, type=int,
+              help='Сколько завершенных задач помнить для /jobs/<id> (по умолчанию: 1000; файлы результатов остаются)')
+@click.option('--hf-token', envvar='HUGGINGFACE_TOKEN', 
+              help='HuggingFace токен (можно задать в переменной HUGGINGFACE_TOKEN)')
+@click.option('--local-models', envvar='LOCAL_MODELS_DIR',
+              help='Директория с локальными моделями (можно задать в переменной LOCAL_MODELS_DIR)')
+@click.option('--offline', is_flag=True, envvar='HF_HUB_OFFLINE',
+              help='Строгий офлайн-режим: модели только из локальных файлов и кеша, без обращений к сети')
+@click.option('--model-variant', type=click.Choice(list(VARIANT_DTYPES)),
+              help='Вариант весов оптимизированного пакета --custom-model (по умолчанию: по устройству)')
+@click.option('--quantize', type=click.Choice(['int8']),
+              help='Динамическое int8-квантование слоев Linear модели Whisper (только CPU)')
+@click.option('--device', default=None, type=click.Choice(['cpu', 'cuda', 'mps']), 
+              help='Устройство для инференса (cpu, cuda, mps)')
+@click.option('--cache-dir', envvar='CACHE_DIR',
+              help='Директория кешей (по умолчанию: $XDG_CACHE_HOME/whisper-diarization или ~/.cache/whisper-diarization)')
+@click.option('--min-speakers', default=1, type=int,
+              help='Минимальное количество спикеров по умолчанию для задач')
+@click.option('--max-speakers', default=10, type=int,
+              help='Максимальное количество спикеров по умолчанию для задач')
+@click.option('--alignment-strategy', default='smart', type=click.Choice(['strict', 'smart', 'aggressive']),
+              help='Стратегия совмещения по умолчанию для задач')
+def serve(host: str, port: int, socket_path: Optional[str], instances: int, model: str,
+          custom_model: Optional[str], output: str, input_root: Optional[str], keep_jobs: int,
+          hf_token: Optional[str], local_models: Optional[str], offline: bool, model_variant: Optional[str],
+          quantize: Optional[str], device: Optional[str], cache_dir: Optional[str],
+          min_speakers: int, max_speakers: int, alignment_strategy: str):
+    """
+    Сервер инференса с постоянно загруженными моделями
+    
+    Модели загружаются и прогреваются один раз; /health отвечает 200 только
+    после прогрева. Задачи принимаются через POST /jobs (путь или загрузка файла).
+    """
+    from server import InferenceService, serve as run_server
+    
+    if custom_model and not HF_TRANSFORMERS_AVAILABLE:
+        print("❌ Для использования кастомных моделей нужна библиотека transformers")
+        print("💡 Установите: pip install transformers")
+        sys.exit(1)
+    
+    cache_root = Path(cache_dir) if cache_dir else default_cache_dir()
+    
+    def create_processor():
+        return AudioProcessor(
+            whisper_model=model,
+            hf_token=hf_token,
+            local_models_dir=local_models,
+            device=device,
+            custom_whisper_model=custom_model,
+            cache_dir=str(cache_root),
+            offline=offline,
+            model_variant=model_variant,
+            quantize=quantize
+        )
+    
+    service = InferenceService(
+        create_processor,
+        instances=instances,
+        output_dir=output,
+        max_finished_jobs=keep_jobs,
+        input_root=input_root,
+        default_options={
+            "min_speakers": min_speakers,
+            "max_speakers": max_speakers,
+            "alignment_strategy": alignment_strategy
+        }
+    )
+    run_server(service, host=host, port=port, socket_path=socket_path)
+
+
+@cli.command("live")
+@click.option('--socket', 'socket_path', help='Принять PCM через Unix socket (одно подключение)')
+@click.option('--listen', help='Принять PCM по TCP (HOST:PORT, одно подключение)')
+@click.option('--replay', 'replay_path', type=click.Path(exists=True, dir_okay=False),
+              help='Воспроизвести аудиофайл как живой источник (измерение задержки)')
+@click.option('--speed', default=1.0, type=float,
+              help='Скорость воспроизведения --replay (1.0 - реальное время, 0 - без пауз)')
+@click.option('--model', '-m', default='large', 
+              type=click.Choice(['tiny', 'base', 'small', 'medium', 'large']),
+              help='Модель Whisper для использования (только для стандартных моделей)')
+@click.option('--custom-model', '--custom-whisper-model', 
+              help='Путь к кастомной модели Whisper (HuggingFace format) или HF model ID')
+@click.option('--hf-token', envvar='HUGGINGFACE_TOKEN', 
+              help='HuggingFace токен (можно задать в переменной HUGGINGFACE_TOKEN)')
+@click.option('--local-models', envvar='LOCAL_MODELS_DIR',
+              help='Директория с локальными моделями (можно задать в переменной LOCAL_MODELS_DIR)')
+@click.option('--offline', is_flag=True, envvar='HF_HUB_OFFLINE',
+              help='Строгий офлайн-режим: модели только из локальных файлов и кеша, без обращений к сети')
+@click.option('--model-variant', type=click.Choice(list(VARIANT_DTYPES)),
+              help='Вариант весов оптимизированного пакета --custom-model (по умолчанию: по устройству)')
+@click.option('--quantize', type=click.Choice(['int8']),
+              help='Динамическое int8-квантование слоев Linear модели Whisper (только CPU)')
+@click.option('--device', default=None, type=click.Choice(['cpu', 'cuda', 'mps']), 
+              help='Устройство для инференса (cpu, cuda, mps)')
+@click.option('--min-speakers', default=1, type=int,
+              help='Минимальное количество спикеров в реплике (по умолчанию: 1)')
+@click.option('--max-speakers', default=10, type=int,
+              help='Максимальное количество спикеров в реплике (по умолчанию: 10)')
+@click.option('--min-segment', default=0.5, type=float,
+              help='Минимальная длительность сегмента в секундах (по умолчанию: 0.5)')
+@click.option('--alignment-strategy', default='smart', type=click.Choice(['strict', 'smart', 'aggressive']),
+              help='Стратегия совмещения: strict, smart, aggressive')
+@click.option('--silence', default=DEFAULT_SILENCE_DURATION, type=float,
+              help=f'Пауза, завершающая реплику, в секундах (по умолчанию: {DEFAULT_SILENCE_DURATION})')
+@click.option('--max-utterance', default=DEFAULT_MAX_UTTERANCE, type=float,
+              help=f'Максимальная длительность реплики в секундах (по умолчанию: {DEFAULT_MAX_UTTERANCE})')
+@click.option('--partial-interval', default=DEFAULT_PARTIAL_INTERVAL, type=float,
+              help=f'Период частичных результатов в секундах, 0 - отключить (по умолчанию: {DEFAULT_PARTIAL_INTERVAL})')
+@click.option('--vad-threshold', default=VAD_THRESHOLD_DB, type=float,
+              help=f'Превышение уровня шума для речи в дБ (по умолчанию: {VAD_THRESHOLD_DB})')
+@click.option('--latency-report', type=click.Path(dir_okay=False),
+              help='Сохранить сводку задержек (p50/p95) в JSON')
+def live(socket_path: Optional[str], listen: Optional[str], replay_path: Optional[str], speed: float,
+         model: str, custom_model: Optional[str], hf_token: Optional[str], local_models: Optional[str],
+         offline: bool, model_variant: Optional[str], quantize: Optional[str],
+         device: Optional[str], min_speakers: int,
+         max_speakers: int, min_segment: float,
+         alignment_strategy: str, silence: float, max_utterance: float, partial_interval: float,
+         vad_threshold: float, latency_report: Optional[str]):
+    """
+    Живая транскрипция потока PCM 16 кГц s16le моно (stdin, socket или --replay)
+    
+    В stdout пишется NDJSON: частичные результаты ("partial") по ходу речи и
+    финальные сегменты ("final") со спикером и задержкой после паузы.
+    """
+    from live import LiveSession, accept_connection, latency_summary, read_pcm, replay_file, run_live
+    
+    # stdout занят NDJSON, поэтому все сообщения идут в stderr
+    ndjson_out = sys.stdout
+    sys.stdout = sys.stderr
+    
+    if sum(bool(source) for source in (socket_path, listen, replay_path)) > 1:
+        print("❌ Укажите только один источник: --socket, --listen или --replay")
+        sys.exit(1)
+    
+    if custom_model and not HF_TRANSFORMERS_AVAILABLE:
+        print("❌ Для использования кастомных моделей нужна библиотека transformers")
+        print("💡 Установите: pip install transformers")
+        sys.exit(1)
+    
+    session = None
+    try:
+        processor = AudioProcessor(
+            whisper_model=model,
+            hf_token=hf_token,
+            local_models_dir=local_models,
+            device=device,
+            custom_whisper_model=custom_model,
+            offline=offline,
+            model_variant=model_variant,
+            quantize=quantize
+        )
+        
+        session = LiveSession(
+            processor,
+            min_speakers=min_speakers,
+            max_speakers=max_speakers,
+            min_segment_duration=min_segment,
+            alignment_strategy=alignment_strategy,
+            silence_duration=silence,
+            max_utterance=max_utterance,
+            partial_interval=partial_interval,
+            vad_threshold=vad_threshold
+        )
         
+        if replay_path:
+            print(f"⏯️  Воспроизведение {replay_path} (скорость {speed:g})")
+            chunks = replay_file(replay_path, speed=speed)
+        elif socket_path or listen:
+            chunks = read_pcm(accept_connection(socket_path=socket_path, listen=listen))
+        else:
+            print("🎙️  Читаем PCM 16 кГц s16le из stdin")
+            chunks = read_pcm(sys.stdin.buffer)
+        
+        def emit(event: Dict):
+            ndjson_out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            ndjson_out.flush()
+        
+        summary = run_live(session, chunks, emit)
+        
+    except KeyboardInterrupt:
+        print("\n⏹️  Остановлено пользователем")
+        summary = latency_summary(session.latencies) if session is not None else None
     except Exception as e:
         print(f"❌ Ошибка: {e}")
         sys.exit(1)
+    
+    if summary and summary["count"]:
+        print(f"\n⏱️  Задержка финальных сегментов ({summary['count']}): "
+              f"p50 {summary['p50']:.2f}с, p95 {summary['p95']:.2f}с, макс. {summary['max']:.2f}с")
+    else:
+        print("\n⏱️  Финальных сегментов нет")
+    
+    if latency_report and summary is not None:
+        with open(latency_report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"💾 Сводка задержек сохранена: {latency_report}")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    cli() 
\ No newline at end of file
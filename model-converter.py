@@ -1,22 +1,56 @@
-import torch
-from transformers import WhisperForConditionalGeneration, WhisperProcessor
+#!/usr/bin/env python3
+"""
+Оптимизация кастомной модели Whisper: сборка пакета для быстрой загрузки
 
-# Используем рекомендованные параметры из официальной документации
-torch_dtype = torch.bfloat16
+Пакет содержит варианты весов (fp32, fp16, bf16, int8) - каждый одним
+safetensors-файлом, который AudioProcessor отображает через mmap без
+копирования, - готовый быстрый токенизатор и manifest.json. Первый вариант
+с плавающей точкой пишется в model.safetensors, поэтому пакет остается
+обычной директорией transformers.
 
-print("🔄 Загружаем модель antony66/whisper-large-v3-russian с оптимальными параметрами...")
+Примеры:
+    python model-converter.py                     # antony66/whisper-large-v3-russian, bf16
+    python model-converter.py openai/whisper-large-v3 -o models/custom_whisper/large-v3 --variants fp16,fp32,int8
+    python main.py input.wav --custom-model models/custom_whisper/large-v3 --model-variant fp32
+"""
 
-model = WhisperForConditionalGeneration.from_pretrained(
-    "antony66/whisper-large-v3-russian", 
-    torch_dtype=torch_dtype, 
-    low_cpu_mem_usage=True, 
-    use_safetensors=True
-)
+import sys
 
-processor = WhisperProcessor.from_pretrained("antony66/whisper-large-v3-russian")
+import click
 
-print("💾 Сохраняем модель локально...")
-model.save_pretrained("./whisper-large-v3-russian-pt")
-processor.save_pretrained("./whisper-large-v3-russian-pt")
+from optimized_models import VARIANT_DTYPES, optimize_model, parse_variants
 
-print("✅ Модель и процессор сохранены в ./whisper-large-v3-russian-pt")
\ No newline at end of file
+
+@click.command("optimize")
+@click.argument("source", default="antony66/whisper-large-v3-russian")
+@click.option("--output", "-o", default="./whisper-large-v3-russian-pt",
+              help="Директория пакета (по умолчанию: ./whisper-large-v3-russian-pt)")
+@click.option("--variants", default="bf16",
+              help=f"Варианты весов через запятую: {', '.join(VARIANT_DTYPES)} (по умолчанию: bf16)")
+@click.option("--hf-token", envvar="HUGGINGFACE_TOKEN",
+              help="HuggingFace токен для закрытых моделей (можно задать в переменной HUGGINGFACE_TOKEN)")
+def optimize(source: str, output: str, variants: str, hf_token: str):
+    """
+    Собрать оптимизированный пакет модели SOURCE (HF model ID или директория save_pretrained)
+    """
+    try:
+        variants = parse_variants(variants)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"🔄 Оптимизируем {source}: варианты {', '.join(variants)}")
+    try:
+        manifest = optimize_model(source, output, variants, token=hf_token)
+    except Exception as e:
+        print(f"❌ Ошибка оптимизации модели: {e}")
+        sys.exit(1)
+
+    for variant, entry in manifest["variants"].items():
+        print(f"   • {variant}: {entry['file']} ({entry['size'] / 1024 ** 2:.0f} МБ)")
+    print(f"✅ Пакет сохранен в {output}")
+    print(f"💡 Использование: python main.py input.wav --custom-model {output}")
+
+
+if __name__ == "__main__":
+    optimize()
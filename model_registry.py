@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Реестр разрешенных моделей: точный путь и формат каждой модели, которая
+уже загружалась успешно. Следующий старт идет сразу по рабочему пути,
+не перебирая варианты загрузки (локальная директория, кеш, HuggingFace)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from cache import _atomic_write
+
+REGISTRY_NAME = "model_registry.json"
+REGISTRY_VERSION = 1
+
+# Форматы моделей
+FORMAT_WHISPER = "openai-whisper"       # чекпоинт .pt пакета whisper
+FORMAT_TRANSFORMERS = "transformers"    # директория save_pretrained / снапшот HuggingFace
+FORMAT_PYANNOTE = "pyannote-pipeline"   # config.yaml пайплайна или директория с ним
+
+# Переменные окружения, отключающие сетевые запросы huggingface_hub и transformers
+OFFLINE_VARIABLES = ("HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE", "HF_DATASETS_OFFLINE")
+
+
+def registry_path(models_dir: Optional[Union[str, Path]] = None) -> Path:
+    """Файл реестра: <models>/model_registry.json (рядом с local_config.json)"""
+    return Path(models_dir or "models") / REGISTRY_NAME
+
+
+def whisper_key(name: str) -> str:
+    return f"whisper/{name}"
+
+
+def transformers_key(model_id: str) -> str:
+    return f"transformers/{model_id}"
+
+
+def pyannote_key(model_id: str) -> str:
+    return f"pyannote/{model_id}"
+
+
+def enable_offline_mode():
+    """
+    Строгий офлайн-режим: huggingface_hub и transformers работают только с локальным кешем
+
+    Переменные читаются при импорте huggingface_hub, поэтому задаются до загрузки
+    моделей; если библиотека уже импортирована, флаг меняется и в ней.
+    """
+    for variable in OFFLINE_VARIABLES:
+        os.environ[variable] = "1"
+
+    hub = sys.modules.get("huggingface_hub")
+    if hub is not None and hasattr(hub, "constants"):
+        hub.constants.HF_HUB_OFFLINE = True
+
+
+def whisper_checkpoint_path(name: str) -> Optional[Path]:
+    """Путь, по которому whisper.load_model(name) хранит чекпоинт (None - имя не из списка whisper)"""
+    import whisper
+
+    url = getattr(whisper, "_MODELS", {}).get(name)
+    if url is None:
+        return None
+    cache_root = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return Path(cache_root) / "whisper" / os.path.basename(url)
+
+
+def hub_cached_file(repo_id: str, filename: str) -> Optional[Path]:
+    """Файл репозитория HuggingFace в локальном кеше (без сетевых запросов)"""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return None
+    cached = try_to_load_from_cache(repo_id, filename)
+    return Path(cached) if isinstance(cached, str) else None
+
+
+def transformers_weights_format(model_dir: Union[str, Path]) -> Optional[str]:
+    """Формат весов директории transformers: safetensors или bin"""
+    model_dir = Path(model_dir)
+    if any(model_dir.glob("*.safetensors")):
+        return "safetensors"
+    if any(model_dir.glob("*.bin")):
+        return "bin"
+    return None
+
+
+class ModelRegistry:
+    """
+    Реестр разрешенных моделей (JSON)
+
+    Структура:
+        {"version": 1, "models": {"whisper/large": {"path": ..., "format": ..., ...}}}
+
+    Запись для файла хранит размер и время изменения: подмененный или
+    удаленный файл делает запись недействительной, и модель ищется заново.
+    Запись атомарна; одновременные процессы пула перечитывают файл перед
+    обновлением.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Реестр моделей поврежден ({self.path}): {e}")
+            return {}
+        if data.get("version") != REGISTRY_VERSION:
+            return {}
+        return data.get("models", {})
+
+    def _write(self, models: Dict[str, Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"version": REGISTRY_VERSION, "models": models},
+                          ensure_ascii=False, indent=2).encode("utf-8")
+        _atomic_write(self.path.parent, self.path, lambda f: f.write(data))
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Действующая запись: путь существует, файл не изменился"""
+        entry = self._read().get(key)
+        if entry is None:
+            return None
+
+        path = Path(entry["path"])
+        if not path.exists():
+            return None
+        if path.is_file() and "size" in entry:
+            stat = path.stat()
+            if stat.st_size != entry["size"] or int(stat.st_mtime) != entry.get("mtime"):
+                return None
+        return entry
+
+    def record(self, key: str, path: Union[str, Path], model_format: str, **details) -> Dict:
+        """Запись разрешенного пути модели"""
+        path = Path(path).resolve()
+        entry = {"path": str(path), "format": model_format, "resolved_at": time.time(), **details}
+        if path.is_file():
+            stat = path.stat()
+            entry.update(size=stat.st_size, mtime=int(stat.st_mtime))
+
+        with self._lock:
+            try:
+                models = self._read()
+                models[key] = entry
+                self._write(models)
+            except OSError as e:
+                print(f"⚠️  Не удалось обновить реестр моделей: {e}")
+        return entry
+
+    def forget(self, key: str):
+        """Удаление записи, путь которой перестал загружаться"""
+        with self._lock:
+            models = self._read()
+            if models.pop(key, None) is not None:
+                try:
+                    self._write(models)
+                except OSError as e:
+                    print(f"⚠️  Не удалось обновить реестр моделей: {e}")
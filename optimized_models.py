@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Оптимизированные пакеты кастомных моделей Whisper (transformers)
+
+Пакет - директория save_pretrained, дополненная вариантами точности весов
+(fp32/fp16/bf16/int8), каждый в одном safetensors-файле, готовым быстрым
+токенизатором (tokenizer.json) и манифестом manifest.json. Пакет загружается
+без from_pretrained: модель создается на meta-устройстве, а тензоры весов
+отображаются из файла через mmap без копирования в память процесса.
+"""
+
+import json
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from cache import _atomic_write
+
+MANIFEST_NAME = "manifest.json"
+PACKAGE_FORMAT = "whisper-optimized"
+PACKAGE_VERSION = 1
+
+# Варианты весов и их типы данных torch
+VARIANT_DTYPES = {"fp32": "float32", "fp16": "float16", "bf16": "bfloat16", "int8": "int8"}
+
+# Основной вариант пишется в model.safetensors: пакет остается обычной
+# директорией transformers (from_pretrained, download_models.py --copy-local-model)
+PRIMARY_WEIGHTS = "model.safetensors"
+
+# int8: веса nn.Linear по строкам (симметрично), масштабы - в тензоре <имя>.scale,
+# остальные тензоры (эмбеддинги, нормализация, свертки) - в float16
+INT8_SCALE_SUFFIX = ".scale"
+INT8_STORAGE_DTYPE = "float16"
+
+# Порядок выбора варианта для устройства, если вариант не задан явно
+DEVICE_PREFERENCES = {
+    "cpu": ("fp32", "bf16", "int8", "fp16"),
+    "cuda": ("fp16", "bf16", "fp32", "int8"),
+    "mps": ("fp16", "fp32", "int8", "bf16"),
+}
+
+# Типы данных заголовка safetensors
+SAFETENSORS_DTYPES = {"F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+                      "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8",
+                      "BOOL": "bool"}
+
+
+def read_manifest(model_dir: Union[str, Path]) -> Dict:
+    """Манифест пакета; ValueError - файл не является манифестом оптимизированного пакета"""
+    path = Path(model_dir) / MANIFEST_NAME
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != PACKAGE_FORMAT:
+        raise ValueError(f"{path}: не манифест оптимизированного пакета")
+    if manifest.get("version") != PACKAGE_VERSION:
+        raise ValueError(f"{path}: неподдерживаемая версия пакета {manifest.get('version')}")
+    if not manifest.get("variants"):
+        raise ValueError(f"{path}: в пакете нет вариантов весов")
+    return manifest
+
+
+def is_optimized_package(model_dir: Union[str, Path]) -> bool:
+    """Директория содержит манифест оптимизированного пакета"""
+    try:
+        read_manifest(model_dir)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def choose_variant(manifest: Dict, device: str, preferred: Optional[str] = None) -> str:
+    """
+    Вариант весов для устройства
+
+    Явно заданный вариант должен быть в пакете; иначе берется первый
+    доступный по DEVICE_PREFERENCES (на CPU - fp32, на GPU - fp16).
+    """
+    available = manifest["variants"]
+    if preferred:
+        if preferred not in available:
+            raise ValueError(f"Варианта {preferred} нет в пакете (есть: {', '.join(available)})")
+        return preferred
+    for variant in DEVICE_PREFERENCES.get(device, DEVICE_PREFERENCES["cpu"]):
+        if variant in available:
+            return variant
+    return next(iter(available))
+
+
+def parse_variants(spec: Union[str, Iterable[str]]) -> Tuple[str, ...]:
+    """Список вариантов из строки "fp16,bf16,int8" (порядок сохраняется, повторы убираются)"""
+    names = spec.split(",") if isinstance(spec, str) else spec
+    variants = []
+    for name in names:
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in VARIANT_DTYPES:
+            raise ValueError(f"Неизвестный вариант весов: {name} (доступны: {', '.join(VARIANT_DTYPES)})")
+        if name not in variants:
+            variants.append(name)
+    if not variants:
+        raise ValueError("Не задано ни одного варианта весов")
+    return tuple(variants)
+
+
+def variant_files(variants: Iterable[str]) -> Dict[str, str]:
+    """
+    Имена файлов весов: первый вариант с плавающей точкой - model.safetensors,
+    остальные - model.<вариант>.safetensors
+    """
+    files = {}
+    primary = None
+    for variant in variants:
+        if primary is None and variant != "int8":
+            primary = variant
+            files[variant] = PRIMARY_WEIGHTS
+        else:
+            files[variant] = f"model.{variant}.safetensors"
+    return files
+
+
+def safetensors_layout(path: Union[str, Path]) -> Tuple[int, Dict[str, Tuple[str, Tuple[int, ...], int, int]]]:
+    """
+    Раскладка safetensors-файла без чтения данных
+
+    Returns:
+        (смещение начала данных, {имя: (тип данных, форма, начало, конец)}),
+        начало и конец - байтовые смещения от начала данных
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"{path}: файл короче заголовка safetensors")
+        (header_size,) = struct.unpack("<Q", prefix)
+        header = json.loads(f.read(header_size))
+
+    layout = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"{path}: неподдерживаемый тип данных {info['dtype']} ({name})")
+        begin, end = info["data_offsets"]
+        layout[name] = (dtype, tuple(info["shape"]), begin, end)
+    return 8 + header_size, layout
+
+
+def mmap_state_dict(path: Union[str, Path]) -> Dict:
+    """
+    Тензоры safetensors-файла, отображенные из файла без копирования
+
+    Файл отображается целиком (MAP_PRIVATE, копирование при записи):
+    страницы читаются с диска по мере обращения и разделяются через
+    файловый кеш ОС между всеми процессами, загрузившими тот же пакет.
+    """
+    import torch
+
+    data_start, layout = safetensors_layout(path)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state = {}
+    for name, (dtype_name, shape, begin, _end) in layout.items():
+        dtype = getattr(torch, dtype_name)
+        count = 1
+        for size in shape:
+            count *= size
+        if count == 0:
+            state[name] = torch.empty(shape, dtype=dtype)
+            continue
+        state[name] = torch.frombuffer(mapped, dtype=dtype, count=count,
+                                       offset=data_start + begin).view(shape)
+    return state
+
+
+def quantize_int8(weight) -> Tuple:
+    """Симметричное квантование матрицы по строкам: (int8, масштабы float32)"""
+    import torch
+
+    weight = weight.detach().float()
+    scale = weight.abs().amax(dim=1).clamp(min=1e-8) / 127.0
+    quantized = torch.round(weight / scale[:, None]).clamp(-127, 127).to(torch.int8)
+    return quantized.contiguous(), scale.contiguous()
+
+
+def dequantize_int8(state: Dict, dtype) -> Dict:
+    """Восстановление весов варианта int8 в тип данных вычислений (копия)"""
+    restored = {}
+    for name, tensor in state.items():
+        if name.endswith(INT8_SCALE_SUFFIX):
+            continue
+        scale = state.get(name + INT8_SCALE_SUFFIX)
+        if scale is not None:
+            restored[name] = (tensor.float() * scale[:, None]).to(dtype)
+        else:
+            restored[name] = tensor.to(dtype)
+    return restored
+
+
+def quantize_linear_int8(model) -> int:
+    """
+    Динамическое int8-квантование слоев Linear модели на CPU (на месте)
+
+    Веса квантуются один раз по строкам, активации - на лету при каждом вызове.
+    Подходит и для openai-whisper, и для WhisperForConditionalGeneration:
+    подкласс whisper.model.Linear (приводит веса к типу входа) заменяется на
+    nn.Linear - в float32 на CPU поведение то же, а quantize_dynamic
+    принимает только точный тип.
+
+    Returns:
+        Количество квантованных слоев
+    """
+    import torch
+    from torch.ao.quantization import per_channel_dynamic_qconfig, quantize_dynamic
+
+    engines = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine not in engines or torch.backends.quantized.engine == "none":
+        torch.backends.quantized.engine = next(engine for engine in ("x86", "fbgemm", "qnnpack")
+                                               if engine in engines)
+
+    # Квантуются только веса float32 (вариант bf16/fp16 переводится в float32)
+    if any(parameter.dtype != torch.float32 for parameter in model.parameters()):
+        model.float()
+
+    layers = 0
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            if type(module) is not torch.nn.Linear:
+                module.__class__ = torch.nn.Linear
+            layers += 1
+
+    quantize_dynamic(model, {torch.nn.Linear: per_channel_dynamic_qconfig}, dtype=torch.qint8, inplace=True)
+    return layers
+
+
+def _untied_state_dict(model) -> Tuple[Dict, Dict[str, str]]:
+    """Состояние модели без повторов связанных весов (safetensors не хранит общие тензоры)"""
+    state = {}
+    tied = {}
+    seen = {}
+    for name, tensor in model.state_dict().items():
+        pointer = (tensor.data_ptr(), tuple(tensor.shape))
+        if pointer in seen:
+            tied[name] = seen[pointer]
+            continue
+        seen[pointer] = name
+        state[name] = tensor
+    return state, tied
+
+
+def _variant_tensors(state: Dict, linear_weights: set, variant: str) -> Dict:
+    """Тензоры одного варианта для записи в safetensors"""
+    import torch
+
+    if variant != "int8":
+        dtype = getattr(torch, VARIANT_DTYPES[variant])
+        return {name: tensor.detach().to(dtype).contiguous() for name, tensor in state.items()}
+
+    storage_dtype = getattr(torch, INT8_STORAGE_DTYPE)
+    tensors = {}
+    for name, tensor in state.items():
+        if name in linear_weights:
+            tensors[name], tensors[name + INT8_SCALE_SUFFIX] = quantize_int8(tensor)
+        else:
+            tensors[name] = tensor.detach().to(storage_dtype).contiguous()
+    return tensors
+
+
+def optimize_model(source: str, output_dir: Union[str, Path], variants: Iterable[str] = ("bf16",),
+                   token: Optional[str] = None) -> Dict:
+    """
+    Сборка оптимизированного пакета из модели HuggingFace (ID или локальная директория)
+
+    Args:
+        source: HF model ID или директория save_pretrained
+        output_dir: Директория пакета
+        variants: Варианты весов (fp32, fp16, bf16, int8)
+        token: HuggingFace токен для закрытых моделей
+
+    Returns:
+        Манифест пакета
+    """
+    import safetensors
+    import torch
+    import transformers
+    from safetensors.torch import save_file
+    from transformers import (WhisperFeatureExtractor, WhisperForConditionalGeneration,
+                              WhisperProcessor, WhisperTokenizerFast)
+
+    variants = parse_variants(variants)
+    files = variant_files(variants)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = {"token": token} if token else {}
+
+    print(f"🔄 Загружаем модель {source}...")
+    # Исходные веса в float32: все варианты получаются из одной точной копии
+    model = WhisperForConditionalGeneration.from_pretrained(
+        source, torch_dtype=torch.float32, low_cpu_mem_usage=True, **options
+    )
+    state, tied = _untied_state_dict(model)
+    linear_weights = {f"{name}.weight" for name, module in model.named_modules()
+                      if isinstance(module, torch.nn.Linear)} & set(state)
+
+    manifest_variants = {}
+    for variant in variants:
+        target = output_dir / files[variant]
+        print(f"💾 Вариант {variant}: {target.name}")
+        tensors = _variant_tensors(state, linear_weights, variant)
+        save_file(tensors, str(target), metadata={"format": "pt"})
+        entry = {"file": files[variant], "dtype": VARIANT_DTYPES[variant],
+                 "size": target.stat().st_size, "tensors": len(tensors)}
+        if variant == "int8":
+            entry.update(scheme="per-channel-symmetric", scale_suffix=INT8_SCALE_SUFFIX,
+                         quantized=sum(1 for name in tensors if name.endswith(INT8_SCALE_SUFFIX)),
+                         storage_dtype=INT8_STORAGE_DTYPE)
+        manifest_variants[variant] = entry
+        del tensors
+
+    # Конфигурация: torch_dtype основного варианта (его читает from_pretrained)
+    primary = next((variant for variant, name in files.items() if name == PRIMARY_WEIGHTS), None)
+    if primary is not None:
+        model.config.torch_dtype = VARIANT_DTYPES[primary]
+    model.config.save_pretrained(output_dir)
+    model.generation_config.save_pretrained(output_dir)
+
+    # Быстрый токенизатор сохраняется готовым tokenizer.json: при загрузке
+    # не нужно заново собирать BPE из vocab.json/merges.txt
+    print("💾 Процессор и токенизатор...")
+    processor = WhisperProcessor(
+        feature_extractor=WhisperFeatureExtractor.from_pretrained(source, **options),
+        tokenizer=WhisperTokenizerFast.from_pretrained(source, **options),
+    )
+    processor.save_pretrained(output_dir)
+
+    manifest = {
+        "format": PACKAGE_FORMAT,
+        "version": PACKAGE_VERSION,
+        "source": source,
+        "architecture": type(model).__name__,
+        "created_at": time.time(),
+        "libraries": {"torch": torch.__version__, "transformers": transformers.__version__,
+                      "safetensors": safetensors.__version__},
+        "variants": manifest_variants,
+        "tied": tied,
+        "processor": {"tokenizer": "tokenizer.json", "feature_extractor": "preprocessor_config.json"},
+    }
+    data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    _atomic_write(output_dir, output_dir / MANIFEST_NAME, lambda f: f.write(data))
+    return manifest
+
+
+def load_optimized_whisper(model_dir: Union[str, Path], device: str = "cpu",
+                           variant: Optional[str] = None) -> Tuple:
+    """
+    Загрузка оптимизированного пакета без from_pretrained
+
+    Модель создается на meta-устройстве (память под веса не выделяется),
+    затем параметры подменяются тензорами, отображенными из safetensors
+    (load_state_dict(assign=True)). Вариант int8 восстанавливается в тип
+    данных вычислений и поэтому копируется в память.
+
+    Returns:
+        (модель, процессор, тип данных torch, вариант)
+    """
+    import torch
+    from transformers import (GenerationConfig, WhisperConfig, WhisperFeatureExtractor,
+                              WhisperForConditionalGeneration, WhisperProcessor,
+                              WhisperTokenizerFast)
+
+    model_dir = Path(model_dir)
+    manifest = read_manifest(model_dir)
+    variant = choose_variant(manifest, device, variant)
+    entry = manifest["variants"][variant]
+
+    state = mmap_state_dict(model_dir / entry["file"])
+    if variant == "int8":
+        dtype = torch.float32 if device == "cpu" else torch.float16
+        state = dequantize_int8(state, dtype)
+    else:
+        dtype = getattr(torch, entry["dtype"])
+
+    config = WhisperConfig.from_pretrained(model_dir)
+    config.torch_dtype = dtype
+    with torch.device("meta"):
+        model = WhisperForConditionalGeneration(config)
+    missing, unexpected = model.load_state_dict(state, strict=False, assign=True)
+    missing = set(missing) - set(manifest.get("tied", {}))
+    if missing or unexpected:
+        raise RuntimeError(f"Веса пакета не совпадают с моделью: нет {sorted(missing)[:5]}, "
+                           f"лишние {sorted(unexpected)[:5]}")
+    model.tie_weights()
+
+    leftover = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+                if tensor.is_meta]
+    if leftover:
+        raise RuntimeError(f"Тензоры модели не загружены из пакета: {leftover[:5]}")
+
+    if (model_dir / "generation_config.json").exists():
+        model.generation_config = GenerationConfig.from_pretrained(model_dir)
+    model.eval()
+    if device != "cpu":
+        model = model.to(device)
+
+    processor = WhisperProcessor(
+        feature_extractor=WhisperFeatureExtractor.from_pretrained(model_dir),
+        tokenizer=WhisperTokenizerFast.from_pretrained(model_dir),
+    )
+    return model, processor, dtype, variant
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Параллельная транскрипция одного файла: фрагменты с перекрытием по паузам
+обрабатываются пулом процессов, в каждом - своя модель Whisper и фиксированное
+число потоков torch
+"""
+
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from checkpoint import plan_chunks
+
+# multiprocessing и concurrent.futures импортируются при запуске пула:
+# main.py импортирует этот модуль при старте CLI
+if TYPE_CHECKING:
+    from audio_io import AudioData
+
+# Перекрытие соседних фрагментов по умолчанию (секунды)
+DEFAULT_CHUNK_OVERLAP = 1.0
+
+# Границы автоматической длительности фрагмента (секунды)
+MIN_AUTO_CHUNK = 30.0
+MAX_AUTO_CHUNK = 300.0
+
+# Доля длительности сегмента, перекрытой предыдущим фрагментом, при которой сегмент - дубликат
+DUPLICATE_OVERLAP = 0.5
+
+# Ожидание загрузки моделей во всех процессах пула (секунды)
+WARMUP_TIMEOUT = 1800.0
+
+# Состояние процесса пула
+_worker_processor = None
+_worker_barrier = None
+
+
+def available_cpus() -> List[int]:
+    """Ядра, доступные процессу (с учетом taskset/cgroup cpuset)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_worker_threads(workers: int) -> int:
+    """Потоки torch на процесс: ядра делятся поровну между процессами"""
+    return max(1, len(available_cpus()) // max(1, workers))
+
+
+def worker_cpu_sets(workers: int, threads_per_worker: int) -> Optional[List[List[int]]]:
+    """
+    Непересекающиеся наборы ядер для привязки процессов пула
+
+    Returns:
+        По набору из threads_per_worker ядер на процесс; None, если ядер не хватает
+        или привязка не поддерживается платформой
+    """
+    cpus = available_cpus()
+    if not hasattr(os, "sched_setaffinity") or workers * threads_per_worker > len(cpus):
+        return None
+    return [cpus[index * threads_per_worker:(index + 1) * threads_per_worker] for index in range(workers)]
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """
+    Память текущего процесса в байтах
+
+    Returns:
+        {"rss", "private", "shared"}: private (USS) - страницы только этого процесса,
+        то есть цена еще одного процесса пула; без /proc известен только пиковый rss
+    """
+    try:
+        fields = {}
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1]) * 1024
+        return {
+            "rss": fields["Rss"],
+            "private": fields["Private_Clean"] + fields["Private_Dirty"],
+            "shared": fields["Shared_Clean"] + fields["Shared_Dirty"],
+        }
+    except (OSError, ValueError, KeyError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return {"rss": None, "private": None, "shared": None}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    return {"rss": peak if sys.platform == "darwin" else peak * 1024, "private": None, "shared": None}
+
+
+def set_thread_budget(num_threads: int, cpus: Optional[List[int]] = None):
+    """
+    Бюджет потоков процесса пула: переменные OpenMP/MKL, потоки torch и привязка к ядрам
+
+    Вызывается в процессе до загрузки моделей: переменные окружения
+    действуют, только если заданы до импорта torch.
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(num_threads)
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # уже задано (пул потоков interop создается один раз)
+
+
+def plan_parallel_chunks(audio: "AudioData", workers: int, chunk_duration: Optional[float] = None,
+                         overlap: float = DEFAULT_CHUNK_OVERLAP) -> List[Tuple[float, float, float, float]]:
+    """
+    Фрагменты для пула: границы в паузах, окна расширены на overlap в обе стороны
+
+    Без chunk_duration длительность подбирается так, чтобы на процесс приходилось
+    около двух фрагментов (балансировка), в пределах [MIN_AUTO_CHUNK, MAX_AUTO_CHUNK].
+
+    Returns:
+        [(начало окна, конец окна, начало зоны, конец зоны)] в секундах от начала массива;
+        зоны идут встык и покрывают все аудио
+    """
+    if chunk_duration is None:
+        chunk_duration = min(max(audio.duration / (2 * max(1, workers)), MIN_AUTO_CHUNK), MAX_AUTO_CHUNK)
+
+    chunks = []
+    for core_start, core_end in plan_chunks(audio, chunk_duration):
+        window_start = max(0.0, core_start - overlap)
+        window_end = min(audio.duration, core_end + overlap)
+        chunks.append((window_start, window_end, core_start, core_end))
+    return chunks
+
+
+def stitch_chunks(chunks: List[Tuple[float, Tuple[float, float], Dict]]) -> Dict:
+    """
+    Склейка результатов фрагментов с удалением дублей на стыках
+
+    Сегмент принадлежит фрагменту, если его середина лежит в зоне фрагмента.
+    Сегмент, который больше чем наполовину перекрыт последним сегментом
+    предыдущего фрагмента, считается повтором той же речи и отбрасывается.
+
+    Args:
+        chunks: [(смещение окна, (начало зоны, конец зоны), результат транскрипции)]
+                по порядку; времена результата - относительно начала окна
+
+    Returns:
+        Результат транскрипции со временем относительно начала аудио
+    """
+    segments = []
+    language = None
+    for window_start, (core_start, core_end), result in chunks:
+        if language is None:
+            language = result.get("language")
+
+        previous_end = segments[-1]["end"] if segments else None
+        for segment in result.get("segments", []):
+            start = segment["start"] + window_start
+            end = segment["end"] + window_start
+            if not core_start <= (start + end) / 2 < core_end:
+                continue
+            if previous_end is not None and start < previous_end:
+                duration = end - start
+                covered = min(end, previous_end) - start
+                if duration <= 0 or covered > DUPLICATE_OVERLAP * duration:
+                    continue
+
+            shifted = dict(segment, id=len(segments), start=start, end=end)
+            if segment.get("words"):
+                shifted["words"] = [
+                    dict(word, start=word["start"] + window_start, end=word["end"] + window_start)
+                    for word in segment["words"]
+                ]
+            segments.append(shifted)
+
+    text = " ".join(s["text"].strip() for s in segments if s["text"].strip())
+    return {"text": text, "segments": segments, "language": language or "unknown"}
+
+
+def _init_worker(processor_kwargs: Dict, num_threads: int, barrier):
+    """Инициализация процесса пула: потоки torch и собственный AudioProcessor без диаризации"""
+    global _worker_processor, _worker_barrier
+
+    set_thread_budget(num_threads)
+
+    from main import AudioProcessor
+
+    _worker_processor = AudioProcessor(**processor_kwargs, load_diarization=False)
+    _worker_barrier = barrier
+
+
+def _wait_ready(timeout: float) -> int:
+    """Задача прогрева: занимает процесс, пока все процессы пула не загрузят модели"""
+    _worker_barrier.wait(timeout)
+    return os.getpid()
+
+
+def _transcribe_chunk(index: int, waveform, sample_rate: int, offset: float,
+                      content_hash: Optional[str]) -> Tuple[int, Dict, float]:
+    from audio_io import AudioData
+
+    started = time.time()
+    audio = AudioData(waveform, sample_rate, offset=offset, content_hash=content_hash)
+    return index, _worker_processor.transcribe(audio), time.time() - started
+
+
+class ParallelTranscriber:
+    """
+    Пул процессов для транскрипции фрагментов одного файла
+
+    Процессы запускаются через spawn (fork после инициализации torch
+    небезопасен) и остаются загруженными между файлами.
+
+    Пример:
+        with ParallelTranscriber(processor_kwargs, workers=8) as transcriber:
+            result = transcriber.transcribe(audio)
+    """
+
+    def __init__(self, processor_kwargs: Dict, workers: int, threads_per_worker: Optional[int] = None,
+                 chunk_duration: Optional[float] = None, overlap: float = DEFAULT_CHUNK_OVERLAP):
+        """
+        Args:
+            processor_kwargs: Параметры AudioProcessor для процессов пула
+            workers: Количество процессов
+            threads_per_worker: Потоки torch на процесс (по умолчанию - ядра поровну)
+            chunk_duration: Длительность фрагмента в секундах (None - автоматически)
+            overlap: Перекрытие соседних фрагментов в секундах
+        """
+        if workers < 1:
+            raise ValueError("Количество процессов должно быть положительным")
+        self.processor_kwargs = processor_kwargs
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or default_worker_threads(workers)
+        self.chunk_duration = chunk_duration
+        self.overlap = overlap
+        self.executor = None
+
+    def start(self):
+        """Запуск процессов и ожидание загрузки моделей во всех"""
+        if self.executor is not None:
+            return
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        print(f"🚀 Пул транскрипции: {self.workers} процессов × {self.threads_per_worker} потоков torch")
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(self.workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.processor_kwargs, self.threads_per_worker, barrier)
+        )
+
+        started = time.time()
+        ready = [self.executor.submit(_wait_ready, WARMUP_TIMEOUT) for _ in range(self.workers)]
+        pids = {future.result() for future in ready}
+        print(f"✅ Модели загружены в {len(pids)} процессах за {time.time() - started:.1f}с")
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self) -> "ParallelTranscriber":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def transcribe(self, audio: "AudioData") -> Dict:
+        """
+        Транскрипция аудио фрагментами в пуле
+
+        Returns:
+            Результат в формате transcribe() (время относительно начала аудио)
+        """
+        from concurrent.futures import as_completed
+
+        self.start()
+
+        chunks = plan_parallel_chunks(audio, self.workers, self.chunk_duration, self.overlap)
+        print(f"🧩 Параллельная транскрипция: {len(chunks)} фрагментов на {self.workers} процессах")
+
+        started = time.time()
+        futures = []
+        for index, (window_start, window_end, _, _) in enumerate(chunks):
+            window = audio.window(window_start, window_end)
+            futures.append(self.executor.submit(
+                _transcribe_chunk, index, window.waveform, window.sample_rate,
+                window.offset, window.content_hash
+            ))
+
+        results = [None] * len(chunks)
+        busy_time = 0.0
+        for future in as_completed(futures):
+            index, result, chunk_time = future.result()
+            results[index] = result
+            busy_time += chunk_time
+
+        wall_time = time.time() - started
+        print(f"⏱️  Фрагменты: {wall_time:.1f}с wall, загрузка пула "
+              f"{busy_time / (wall_time * self.workers) * 100 if wall_time else 0.0:.0f}%")
+
+        return stitch_chunks([
+            (window_start, (core_start, core_end), result)
+            for (window_start, _, core_start, core_end), result in zip(chunks, results)
+        ])
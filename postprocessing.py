@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Постобработка результатов: фильтрация реплик, совмещение транскрипции со спикерами, экспорт
+Модуль не зависит от torch/whisper/pyannote и используется офлайн-командой realign
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from writers import ResultWriter
+
+# Модули на numpy импортируются в методах: main.py наследует SegmentPostProcessor,
+# и старт CLI (--help) не должен загружать numpy
+if TYPE_CHECKING:
+    from segments import SegmentTable
+
+
+class SegmentPostProcessor:
+    """Постобработка сырых результатов транскрипции и диаризации (без моделей)"""
+    
+    # Максимальный промежуток между репликами одного спикера для объединения (сек)
+    DEFAULT_MERGE_GAP = 0.3
+    
+    # Компактный *_result.json (без отступов)
+    compact_json = False
+    
+    def _postprocess_diarization(self, raw_turns: List[Dict], min_segment_duration: float = 0.5,
+                                 merge_gap: float = DEFAULT_MERGE_GAP, rename: bool = True) -> Dict:
+        """
+        Фильтрация, объединение и переименование сырых реплик pyannote
+        
+        Args:
+            raw_turns: Сырые реплики [{"start", "end", "speaker"}]
+            min_segment_duration: Минимальная длительность сегмента (сек)
+            merge_gap: Максимальный промежуток для объединения реплик одного спикера (сек)
+            rename: Переименовать спикеров по порядку появления (False - метки уже глобальные)
+            
+        Returns:
+            Результат диаризации: спикеры (SegmentTable), статистика и исходные реплики
+        """
+        from segments import SegmentTable
+        
+        turns = SegmentTable.from_records(raw_turns)
+        segment_count_before = len(turns)
+        
+        # Фильтруем слишком короткие сегменты
+        speakers = turns.take(turns.duration >= min_segment_duration)
+        
+        # Постобработка: объединяем соседние сегменты одного спикера
+        speakers = self._merge_consecutive_same_speaker(speakers, gap_threshold=merge_gap)
+        
+        # Переименовываем спикеров в понятные имена
+        if rename:
+            speakers = self._rename_speakers(speakers)
+        
+        unique_speakers = speakers.unique_speakers()
+        print(f"📊 Диаризация завершена: {segment_count_before} → {len(speakers)} сегментов")
+        print(f"👥 Найдено спикеров: {unique_speakers}")
+        
+        return {
+            "speakers": speakers,
+            "turns": raw_turns,
+            "stats": {
+                "segments_before_filter": segment_count_before,
+                "segments_after_filter": len(speakers),
+                "unique_speakers": unique_speakers
+            }
+        }
+    
+    def _merge_consecutive_same_speaker(self, speakers: SegmentTable, gap_threshold: float = 0.3) -> SegmentTable:
+        """
+        Объединяет соседние сегменты одного спикера, разделенные короткими паузами
+        
+        Args:
+            speakers: Сегменты спикеров
+            gap_threshold: Максимальный промежуток для объединения (сек)
+        """
+        if not len(speakers):
+            return speakers
+        
+        # Сортируем по времени начала и объединяем за один векторный проход
+        return speakers.sorted_by_start().merge_consecutive(gap_threshold)
+    
+    def _rename_speakers(self, speakers: SegmentTable) -> SegmentTable:
+        """
+        Переименовывает спикеров в понятные имена (Спикер 1, Спикер 2, etc.)
+        по порядку первого появления
+        """
+        if not len(speakers):
+            return speakers
+        
+        return speakers.renamed("Спикер {}")
+    
+    def _align_transcription_with_speakers(self, transcription: Dict, diarization: Optional[Dict], 
+                                          alignment_strategy: str = "smart") -> SegmentTable:
+        """
+        Интеллектуальное совмещение транскрипции с информацией о спикерах
+        
+        Args:
+            transcription: Результат транскрипции
+            diarization: Результат диаризации
+            alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+            
+        Returns:
+            Таблица сегментов с текстом и спикерами (в словари - через to_records)
+        """
+        from alignment import AlignmentEngine
+        from segments import SegmentTable
+        
+        transcription_segments = transcription.get("segments", [])
+        
+        if not diarization or "speakers" not in diarization:
+            # Если диаризации нет, возвращаем только транскрипцию
+            return SegmentTable.from_records(
+                [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in transcription_segments],
+                with_text=True
+            )
+        
+        # Совмещаем транскрипцию и диаризацию
+        speaker_segments = SegmentTable.coerce(diarization["speakers"])
+        aligned_segments = SegmentTable.from_records(
+            [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in transcription_segments],
+            speakers=speaker_segments.speakers, with_text=True
+        )
+        
+        print(f"🔄 Совмещение с стратегией '{alignment_strategy}'...")
+        
+        # Векторизованный поиск лучших спикеров для всех сегментов сразу
+        engine = AlignmentEngine(speaker_segments)
+        aligned_segments.speaker = engine.assign_ids(
+            aligned_segments.start, aligned_segments.end, alignment_strategy
+        )
+        
+        # Постобработка: устраняем оставшиеся Unknown сегменты
+        aligned_segments = self._resolve_unknown_speakers(aligned_segments, speaker_segments)
+        
+        return aligned_segments
+    
+    def _resolve_unknown_speakers(self, segments: SegmentTable, speaker_segments: SegmentTable) -> SegmentTable:
+        """
+        Постобработка для устранения Unknown спикеров
+        
+        Соседние известные спикеры, индекс средних точек реплик и частоты
+        спикеров считаются один раз и обновляются по мере исправления
+        сегментов: O(n log n) вместо O(n²) при том же результате.
+        Таблицы должны разделять один SpeakerIndex.
+        """
+        import numpy as np
+        from alignment import MidpointIndex
+        from segments import UNKNOWN_ID
+        
+        if not len(speaker_segments):
+            return segments
+            
+        # Собираем известных спикеров
+        speaker_ids = segments.speaker.tolist()
+        unknown_segments = [i for i, speaker_id in enumerate(speaker_ids) if speaker_id == UNKNOWN_ID]
+        
+        if not unknown_segments:
+            return segments
+            
+        print(f"🔧 Исправляем {len(unknown_segments)} Unknown сегментов...")
+        
+        names = segments.speakers
+        midpoints = MidpointIndex(speaker_segments)
+        t_mids = ((segments.start + segments.end) / 2).tolist()
+        
+        # Предыдущий и следующий известный спикер для каждой позиции по исходной
+        # разметке: (позиция, спикер). Сегменты после текущего еще не исправлены.
+        prev_known = [None] * len(speaker_ids)
+        preceding = None
+        for i, speaker_id in enumerate(speaker_ids):
+            prev_known[i] = preceding
+            if speaker_id != UNKNOWN_ID:
+                preceding = (i, speaker_id)
+        
+        next_known = [None] * len(speaker_ids)
+        following = None
+        for i in range(len(speaker_ids) - 1, -1, -1):
+            next_known[i] = following
+            if speaker_ids[i] != UNKNOWN_ID:
+                following = (i, speaker_ids[i])
+        
+        # Последний сегмент, исправленный на известного спикера
+        last_resolved = None
+        
+        # Частоты известных спикеров и позиция первого появления (порядок ключей dict)
+        speaker_counts = {}
+        first_seen = {}
+        for i, speaker_id in enumerate(speaker_ids):
+            if speaker_id != UNKNOWN_ID:
+                speaker_counts[speaker_id] = speaker_counts.get(speaker_id, 0) + 1
+                first_seen.setdefault(speaker_id, i)
+        
+        for idx in unknown_segments:
+            # Стратегия 1: Ближайший по времени известный спикер из диаризации
+            nearest, distance = midpoints.nearest_id(t_mids[idx])
+            best_speaker = nearest if distance < 10.0 else UNKNOWN_ID
+            
+            # Стратегия 2: Если не нашли, используем контекст соседних сегментов
+            if best_speaker == UNKNOWN_ID:
+                before = max(filter(None, (prev_known[idx], last_resolved)), default=None,
+                             key=lambda known: known[0])
+                # Пустые имена спикеров не считаются контекстом
+                if before and names.name(before[1]):
+                    best_speaker = before[1]
+                elif next_known[idx] and names.name(next_known[idx][1]):
+                    best_speaker = next_known[idx][1]
+            
+            # Стратегия 3: Самый частый спикер в аудио
+            if best_speaker == UNKNOWN_ID:
+                if speaker_counts:
+                    best_speaker = max(speaker_counts,
+                                       key=lambda s: (speaker_counts[s], -first_seen[s]))
+                else:
+                    best_speaker = int(speaker_segments.speaker[0])
+            
+            speaker_ids[idx] = best_speaker
+            
+            # Исправленный сегмент учитывается в частотах следующих сегментов
+            if best_speaker != UNKNOWN_ID:
+                speaker_counts[best_speaker] = speaker_counts.get(best_speaker, 0) + 1
+                first_seen[best_speaker] = min(first_seen.get(best_speaker, idx), idx)
+                last_resolved = (idx, best_speaker)
+        
+        segments.speaker = np.array(speaker_ids, dtype=np.int32)
+        return segments
+    
+    def _save_results(self, result: Dict, output_path: Path, base_name: str):
+        """
+        Сохранение результатов в различных форматах (JSON, CSV, TXT)
+        
+        Сегменты пишутся во все файлы потоково, без промежуточных копий результата.
+        """
+        keys = list(result)
+        split = keys.index("segments") if "segments" in keys else len(keys)
+        head = {key: result[key] for key in keys[:split]}
+        tail = {key: result[key] for key in keys[split + 1:]}
+        
+        writer = ResultWriter(
+            output_path, base_name, head,
+            language=result["language"],
+            has_speaker_diarization=result["has_speaker_diarization"],
+            compact_json=self.compact_json
+        )
+        for segment in result.get("segments", []):
+            writer.write_segment(segment)
+        writer.close(tail)
+    
+    def _save_stage_outputs(self, transcription: Dict, diarization: Optional[Dict],
+                            diarization_params: Dict, offset: float,
+                            output_path: Path, base_name: str):
+        """
+        Сохранение сырых выходов этапов рядом с результатом (для офлайн realign)
+        
+        Сегменты транскрипции и реплики диаризации хранятся в координатах окна,
+        offset - смещение окна в исходном файле.
+        """
+        stages = {
+            "transcription": {
+                "text": transcription.get("text", ""),
+                "language": transcription.get("language", "unknown"),
+                "segments": [
+                    {"start": s["start"], "end": s["end"], "text": s["text"]}
+                    for s in transcription.get("segments", [])
+                ]
+            },
+            "diarization": {
+                "turns": diarization.get("turns", []) if diarization else None,
+                "params": diarization_params
+            },
+            "offset": offset
+        }
+        
+        stages_path = output_path / f"{base_name}_stages.json"
+        with open(stages_path, 'w', encoding='utf-8') as f:
+            json.dump(stages, f, ensure_ascii=False)
+        print(f"💾 Сырые результаты этапов сохранены: {stages_path}")
+    
+    def realign(self, result_path: str, stages_path: Optional[str] = None,
+                output_dir: Optional[str] = None, alignment_strategy: str = "smart",
+                min_segment_duration: float = 0.5,
+                merge_gap: float = DEFAULT_MERGE_GAP) -> Dict:
+        """
+        Повторное совмещение и экспорт по сохраненным результатам, без загрузки моделей
+        
+        Args:
+            result_path: Путь к *_result.json
+            stages_path: Путь к *_stages.json (по умолчанию - рядом с результатом)
+            output_dir: Директория для новых результатов (по умолчанию - рядом с исходным)
+            alignment_strategy: Стратегия совмещения ('strict', 'smart', 'aggressive')
+            min_segment_duration: Минимальная длительность сегмента диаризации
+            merge_gap: Максимальный промежуток для объединения реплик одного спикера
+            
+        Returns:
+            Обновленный результат
+        """
+        result_path = Path(result_path)
+        with open(result_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        
+        suffix = "_result.json"
+        base_name = result_path.name[:-len(suffix)] if result_path.name.endswith(suffix) else result_path.stem
+        
+        if stages_path is None:
+            stages_path = result_path.with_name(f"{base_name}_stages.json")
+        stages_path = Path(stages_path)
+        
+        if stages_path.exists():
+            with open(stages_path, 'r', encoding='utf-8') as f:
+                stages = json.load(f)
+            
+            turns = stages["diarization"]["turns"]
+            diarization = None
+            if turns is not None:
+                print(f"👥 Пересчитываем диаризацию: мин. сегмент {min_segment_duration}с, склейка {merge_gap}с")
+                diarization = self._postprocess_diarization(
+                    turns, min_segment_duration=min_segment_duration, merge_gap=merge_gap
+                )
+            
+            segments = self._align_transcription_with_speakers(
+                stages["transcription"], diarization, alignment_strategy=alignment_strategy
+            )
+            
+            result["segments"] = segments.shifted(stages.get("offset", 0.0)).to_records()
+            result["has_speaker_diarization"] = diarization is not None
+            result["diarization_stats"] = diarization.get("stats", {}) if diarization else {}
+            result["alignment_strategy"] = alignment_strategy
+        else:
+            # Без сырых выходов доступен только повторный экспорт
+            print(f"⚠️  Не найдены сырые результаты этапов: {stages_path}")
+            print("💡 Выполняем только повторный экспорт без пересовмещения")
+        
+        output_path = Path(output_dir) if output_dir else result_path.parent
+        output_path.mkdir(parents=True, exist_ok=True)
+        self._save_results(result, output_path, base_name)
+        
+        return result
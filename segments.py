@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Компактное колоночное хранилище сегментов
+Время - массивы NumPy, спикеры - интернированные целые ID; словари только на границе JSON
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Сегмент без спикера
+UNKNOWN_SPEAKER = "Unknown"
+UNKNOWN_ID = -1
+
+
+class SpeakerIndex:
+    """Интернирование имен спикеров: имя <-> целый ID (общий для связанных таблиц)"""
+
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        """ID спикера (Unknown всегда UNKNOWN_ID)"""
+        if name == UNKNOWN_SPEAKER:
+            return UNKNOWN_ID
+        speaker_id = self.ids.get(name)
+        if speaker_id is None:
+            speaker_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return speaker_id
+
+    def name(self, speaker_id: int) -> str:
+        return UNKNOWN_SPEAKER if speaker_id == UNKNOWN_ID else self.names[speaker_id]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class SegmentTable:
+    """
+    Таблица сегментов: start/end (float64), speaker (int32 ID) и, опционально, текст
+
+    Операции возвращают новые таблицы с общим SpeakerIndex, поэтому ID
+    спикеров сопоставимы между репликами диаризации и сегментами транскрипции.
+    """
+
+    __slots__ = ("start", "end", "speaker", "speakers", "text")
+
+    def __init__(self, start: np.ndarray, end: np.ndarray, speaker: np.ndarray,
+                 speakers: SpeakerIndex, text: Optional[List[str]] = None):
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+        self.speakers = speakers
+        self.text = text
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], speakers: Optional[SpeakerIndex] = None,
+                     with_text: bool = False) -> "SegmentTable":
+        """
+        Таблица из списка словарей {"start", "end", ["speaker"], ["text"]}
+
+        Args:
+            records: Сегменты (реплики pyannote, сегменты Whisper, JSON)
+            speakers: Общий индекс спикеров (по умолчанию - новый)
+            with_text: Сохранить текст сегментов (без пробелов по краям)
+        """
+        speakers = speakers if speakers is not None else SpeakerIndex()
+        count = len(records)
+        start = np.fromiter((r["start"] for r in records), dtype=np.float64, count=count)
+        end = np.fromiter((r["end"] for r in records), dtype=np.float64, count=count)
+        speaker = np.fromiter(
+            (speakers.intern(r.get("speaker", UNKNOWN_SPEAKER)) for r in records),
+            dtype=np.int32, count=count
+        )
+        text = [r["text"].strip() for r in records] if with_text else None
+        return cls(start, end, speaker, speakers, text)
+
+    @classmethod
+    def coerce(cls, segments) -> "SegmentTable":
+        """Таблица как есть или из списка словарей"""
+        return segments if isinstance(segments, cls) else cls.from_records(segments)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @property
+    def duration(self) -> np.ndarray:
+        return self.end - self.start
+
+    def speaker_name(self, index: int) -> str:
+        return self.speakers.name(int(self.speaker[index]))
+
+    def unique_speakers(self) -> int:
+        """Количество разных известных спикеров в таблице"""
+        return int(np.unique(self.speaker[self.speaker != UNKNOWN_ID]).size)
+
+    def take(self, index: np.ndarray) -> "SegmentTable":
+        """Подтаблица по маске или массиву индексов"""
+        index = np.asarray(index)
+        if self.text is None:
+            text = None
+        else:
+            positions = np.flatnonzero(index) if index.dtype == bool else index
+            text = [self.text[i] for i in positions]
+        return SegmentTable(self.start[index], self.end[index], self.speaker[index],
+                            self.speakers, text)
+
+    def sorted_by_start(self) -> "SegmentTable":
+        """Стабильная сортировка по времени начала"""
+        return self.take(np.argsort(self.start, kind="stable"))
+
+    def merge_consecutive(self, gap_threshold: float) -> "SegmentTable":
+        """
+        Объединение соседних сегментов одного спикера с промежутком <= gap_threshold
+
+        Таблица должна быть отсортирована. Как и в последовательной версии,
+        сегмент сравнивается с концом предыдущего сегмента, а объединенный
+        сегмент заканчивается концом последнего из объединенных.
+        """
+        if len(self) < 2:
+            return self
+        joins = ((self.speaker[1:] == self.speaker[:-1]) &
+                 (self.start[1:] - self.end[:-1] <= gap_threshold))
+        group_starts = np.flatnonzero(np.concatenate(([True], ~joins)))
+        group_ends = np.concatenate((group_starts[1:], [len(self)])) - 1
+        return SegmentTable(self.start[group_starts], self.end[group_ends],
+                            self.speaker[group_starts], self.speakers)
+
+    def renamed(self, template: str = "Спикер {}") -> "SegmentTable":
+        """Переименование спикеров по порядку первого появления (Спикер 1, Спикер 2, ...)"""
+        known = self.speaker != UNKNOWN_ID
+        ids, first_seen = np.unique(self.speaker[known], return_index=True)
+        ordered = ids[np.argsort(first_seen)]
+
+        speakers = SpeakerIndex(template.format(i + 1) for i in range(len(ordered)))
+        mapping = np.full(len(self.speakers) + 1, UNKNOWN_ID, dtype=np.int32)
+        mapping[ordered] = np.arange(len(ordered), dtype=np.int32)
+        # UNKNOWN_ID (-1) указывает на последний элемент mapping и остается -1
+        return SegmentTable(self.start, self.end, mapping[self.speaker], speakers, self.text)
+
+    def shifted(self, offset: float) -> "SegmentTable":
+        """Сдвиг времени (из координат окна в координаты исходного файла)"""
+        if not offset:
+            return self
+        return SegmentTable(self.start + offset, self.end + offset, self.speaker,
+                            self.speakers, self.text)
+
+    def to_records(self, with_duration: bool = False) -> List[Dict]:
+        """Список словарей для JSON (text/duration - если есть)"""
+        names = self.speakers.names + [UNKNOWN_SPEAKER]  # ID -1 -> Unknown
+        starts = self.start.tolist()
+        ends = self.end.tolist()
+        speakers = [names[i] for i in self.speaker.tolist()]
+
+        if self.text is not None:
+            return [
+                {"start": s, "end": e, "text": t, "speaker": n}
+                for s, e, t, n in zip(starts, ends, self.text, speakers)
+            ]
+        if with_duration:
+            return [
+                {"start": s, "end": e, "speaker": n, "duration": e - s}
+                for s, e, n in zip(starts, ends, speakers)
+            ]
+        return [{"start": s, "end": e, "speaker": n} for s, e, n in zip(starts, ends, speakers)]
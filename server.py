@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Локальный сервер инференса с постоянно загруженными моделями
+HTTP (TCP или Unix socket) API: отправка аудио, статус задач, результаты
+"""
+
+import json
+import os
+import queue
+import re
+import shutil
+import socketserver
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from audio_io import AudioData, TARGET_SAMPLE_RATE
+
+# Параметры process(), которые клиент может передать в задаче
+JOB_OPTIONS = {
+    "min_speakers", "max_speakers", "min_segment_duration",
+    "alignment_strategy", "time_limit", "start", "end", "parallel_stages"
+}
+
+# Длительность синтетического аудио для прогрева моделей (секунды)
+WARMUP_DURATION = 5.0
+
+# Максимальный размер загружаемого файла (байты)
+MAX_UPLOAD_SIZE = 2 * 1024 ** 3
+
+# Сколько завершенных задач помнит сервер (файлы результатов остаются на диске)
+DEFAULT_MAX_FINISHED_JOBS = 1000
+
+
+class Job:
+    """Задача обработки одного аудиофайла"""
+
+    def __init__(self, audio_path: Path, options: Dict, output_dir: Path, uploaded: bool = False):
+        self.id = uuid.uuid4().hex
+        self.audio_path = audio_path
+        self.options = options
+        self.output_dir = output_dir / self.id
+        self.uploaded = uploaded
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def result_path(self) -> Path:
+        """*_result.json задачи: результат отдается с диска, а не хранится в памяти"""
+        return self.output_dir / f"{self.audio_path.stem}_result.json"
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "audio_file": self.audio_path.name,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "output_dir": str(self.output_dir),
+        }
+
+
+class InferenceService:
+    """
+    Пул постоянно загруженных AudioProcessor и очередь задач
+
+    Каждый экземпляр процессора обслуживается своим потоком, поэтому модели
+    одного экземпляра никогда не используются конкурентно. В памяти хранятся
+    только метаданные задач и не больше max_finished_jobs завершенных.
+    """
+
+    def __init__(self, processor_factory: Callable, instances: int = 1,
+                 output_dir: str = "output/server", default_options: Optional[Dict] = None,
+                 max_finished_jobs: int = DEFAULT_MAX_FINISHED_JOBS,
+                 input_root: Optional[str] = None):
+        """
+        Args:
+            processor_factory: Функция, создающая загруженный AudioProcessor
+            instances: Количество резидентных экземпляров процессора
+            output_dir: Директория результатов и загруженных файлов
+            default_options: Параметры process() по умолчанию
+            max_finished_jobs: Сколько завершенных задач помнить (более старые забываются)
+            input_root: Каталог, файлы из которого можно указывать в задачах по пути
+                        (None - задачи только загрузкой файла)
+        """
+        self.processor_factory = processor_factory
+        self.instances = max(1, instances)
+        self.output_dir = Path(output_dir)
+        self.upload_dir = self.output_dir / "uploads"
+        self.default_options = default_options or {}
+        self.max_finished_jobs = max(0, max_finished_jobs)
+        self.input_root = Path(input_root).resolve() if input_root else None
+
+        self.jobs: Dict[str, Job] = {}
+        self.jobs_lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.workers: List[threading.Thread] = []
+
+        self.state = "starting"
+        self.ready_workers = 0
+        self.state_lock = threading.Lock()
+        self.warmup_error = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        """Загрузка моделей и прогрев в фоновых потоках (сервер отвечает сразу)"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+
+        for index in range(self.instances):
+            worker = threading.Thread(target=self._worker_loop, args=(index,),
+                                      name=f"inference-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _worker_loop(self, index: int):
+        try:
+            processor = self.processor_factory()
+            self._warm_up(processor)
+        except Exception as e:
+            print(f"❌ Экземпляр {index}: ошибка загрузки/прогрева: {e}")
+            with self.state_lock:
+                self.warmup_error = f"{type(e).__name__}: {e}"
+                if self.ready_workers == 0:
+                    self.state = "failed"
+            return
+
+        with self.state_lock:
+            self.ready_workers += 1
+            self.state = "ready"
+        print(f"✅ Экземпляр {index} прогрет и готов к работе")
+
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            self._run_job(processor, job)
+
+    def _warm_up(self, processor):
+        """Прогон короткого синтетического аудио через все этапы"""
+        print("🔥 Прогрев моделей...")
+        t = np.arange(int(WARMUP_DURATION * TARGET_SAMPLE_RATE)) / TARGET_SAMPLE_RATE
+        waveform = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        warmup_start = time.time()
+        processor.analyze(AudioData(waveform, TARGET_SAMPLE_RATE), audio_name="warmup")
+        print(f"🔥 Прогрев завершен за {time.time() - warmup_start:.1f}с")
+
+    def _run_job(self, processor, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        status = "failed"
+        try:
+            options = {**self.default_options, **job.options}
+            processor.process(str(job.audio_path), str(job.output_dir), **options)
+            status = "done"
+        except Exception as e:
+            print(f"❌ Задача {job.id}: {e}")
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished_at = time.time()
+            if job.uploaded and job.audio_path.exists():
+                job.audio_path.unlink()
+            self._forget_finished()
+            # Статус меняется последним: клиент, дождавшийся done, видит итоговое состояние
+            job.status = status
+
+    def _forget_finished(self):
+        """Удаление из памяти самых старых завершенных задач сверх max_finished_jobs"""
+        with self.jobs_lock:
+            finished = [job for job in self.jobs.values() if job.finished_at is not None]
+            excess = len(finished) - self.max_finished_jobs
+            if excess > 0:
+                for job in sorted(finished, key=lambda job: job.finished_at)[:excess]:
+                    del self.jobs[job.id]
+
+    def resolve_input(self, audio_path: str) -> Path:
+        """
+        Файл на сервере для задачи по пути: только внутри input_root
+
+        Путь разрешается вместе с символическими ссылками, поэтому ни "..",
+        ни ссылка не выводят за пределы каталога.
+
+        Raises:
+            PermissionError: задачи по пути отключены или путь вне input_root
+            FileNotFoundError: файла нет
+        """
+        if self.input_root is None:
+            raise PermissionError("Задачи по audio_path отключены: запустите сервер с --input-root")
+
+        resolved = (self.input_root / audio_path).resolve()
+        if not resolved.is_relative_to(self.input_root):
+            raise PermissionError(f"audio_path вне каталога --input-root: {audio_path}")
+        if not resolved.is_file():
+            raise FileNotFoundError(f"Аудиофайл не найден: {audio_path}")
+        return resolved
+
+    @staticmethod
+    def validate_options(options: Dict):
+        unknown = set(options) - JOB_OPTIONS
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+
+    def submit(self, audio_path: Path, options: Dict, uploaded: bool = False) -> Job:
+        self.validate_options(options)
+
+        job = Job(audio_path, options, self.output_dir, uploaded=uploaded)
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def health(self) -> Dict:
+        with self.jobs_lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {
+            "status": self.state,
+            "ready_instances": self.ready_workers,
+            "instances": self.instances,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "error": self.warmup_error,
+        }
+
+    def shutdown(self):
+        for _ in self.workers:
+            self.queue.put(None)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    API:
+        GET  /health                 - 200 только после прогрева, иначе 503
+        POST /jobs                   - JSON {"audio_path": "...", ...параметры} (путь внутри
+                                       input_root) или тело-файл (?filename=a.mp3&max_speakers=2)
+        GET  /jobs/<id>              - статус задачи
+        GET  /jobs/<id>/result       - результат в формате *_result.json (файл задачи)
+    """
+
+    service: InferenceService = None
+    server_version = "WhisperDiarization/1.0"
+
+    JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/result)?$")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path in ("/health", "/ready"):
+            health = self.service.health()
+            self._send_json(200 if self.service.ready else 503, health)
+            return
+
+        match = self.JOB_PATH.match(path)
+        if not match:
+            self._send_json(404, {"error": "Не найдено"})
+            return
+
+        job = self.service.get(match.group(1))
+        if job is None:
+            self._send_json(404, {"error": "Задача не найдена"})
+            return
+
+        if match.group(2):
+            if job.status == "done":
+                self._send_file(job.result_path)
+            elif job.status == "failed":
+                self._send_json(500, job.to_dict())
+            else:
+                self._send_json(409, job.to_dict())
+        else:
+            self._send_json(200, job.to_dict())
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            self._send_json(404, {"error": "Не найдено"})
+            return
+
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+            except ValueError:
+                raise ValueError("Некорректный заголовок Content-Length") from None
+            if length > MAX_UPLOAD_SIZE:
+                self._send_json(413, {"error": "Файл слишком большой"})
+                return
+
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("application/json"):
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Некорректный JSON: {e}") from None
+                if not isinstance(payload, dict):
+                    self._send_json(400, {"error": "Тело запроса должно быть JSON-объектом с audio_path"})
+                    return
+                try:
+                    audio_path = self.service.resolve_input(str(payload.pop("audio_path", "")))
+                except PermissionError as e:
+                    self._send_json(403, {"error": str(e)})
+                    return
+                except FileNotFoundError as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+                job = self.service.submit(audio_path, payload)
+            else:
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                filename = Path(query.pop("filename", "upload.wav")).name
+                options = {k: _parse_query_value(v) for k, v in query.items()}
+                # Параметры проверяются до сохранения, чтобы не оставлять отклоненные загрузки
+                self.service.validate_options(options)
+                audio_path = self._save_upload(filename, length)
+                job = self.service.submit(audio_path, options, uploaded=True)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        self._send_json(202, job.to_dict())
+
+    def _save_upload(self, filename: str, length: int) -> Path:
+        """Потоковое сохранение тела запроса в каталог загрузок"""
+        upload_path = self.service.upload_dir / f"{uuid.uuid4().hex}_{filename}"
+        remaining = length
+        with open(upload_path, "wb") as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 1 << 20))
+                if not chunk:
+                    break
+                f.write(chunk)
+                remaining -= len(chunk)
+
+        if remaining > 0:
+            upload_path.unlink()
+            raise ValueError("Файл загружен не полностью")
+        return upload_path
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path: Path):
+        """Потоковая отдача JSON-файла результата"""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self._send_json(404, {"error": f"Файл результата не найден: {path.name}"})
+            return
+
+        with f:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def address_string(self) -> str:
+        # Для Unix socket client_address - пустая строка
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def _parse_query_value(value: str):
+    """Значения параметров из query string: числа, true/false, строки"""
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    """HTTP поверх Unix socket"""
+    daemon_threads = True
+
+
+def make_server(service: InferenceService, host: str = "127.0.0.1", port: int = 8765,
+                socket_path: Optional[str] = None) -> socketserver.BaseServer:
+    """HTTP сервер API сервиса (TCP или Unix socket), еще не запущенный"""
+    handler = type("BoundRequestHandler", (RequestHandler,), {"service": service})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        httpd = UnixHTTPServer(socket_path, handler)
+        print(f"🌐 Сервер слушает Unix socket: {socket_path}")
+    else:
+        httpd = ThreadingHTTPServer((host, port), handler)
+        print(f"🌐 Сервер слушает http://{host}:{httpd.server_port}")
+    return httpd
+
+
+def serve(service: InferenceService, host: str = "127.0.0.1", port: int = 8765,
+          socket_path: Optional[str] = None):
+    """
+    Запуск сервера (блокирует до Ctrl+C)
+
+    Args:
+        service: Сервис инференса
+        host: Адрес для TCP
+        port: Порт для TCP
+        socket_path: Путь к Unix socket (вместо TCP)
+    """
+    httpd = make_server(service, host, port, socket_path)
+    service.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка сервера...")
+    finally:
+        httpd.server_close()
+        service.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -32,7 +32,7 @@ pip install --upgrade pip
 # Устанавливаем зависимости
 echo "📥 Устанавливаем зависимости..."
 pip install torch torchaudio --index-url https://download.pytorch.org/whl/cpu
-pip install openai-whisper pyannote.audio transformers librosa soundfile pydub python-dotenv click tqdm matplotlib pandas numpy scipy
+pip install openai-whisper pyannote.audio transformers librosa soundfile pydub python-dotenv click tqdm matplotlib numpy scipy
 
 echo "✅ Окружение готово!"
 echo ""
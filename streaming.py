@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Потоковая обработка: разбиение записи на окна и стабильные метки спикеров между окнами
+"""
+
+import math
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Параметры окон потокового режима по умолчанию (секунды)
+DEFAULT_STREAM_WINDOW = 120.0
+DEFAULT_STREAM_OVERLAP = 10.0
+
+# Параметры живого режима по умолчанию: реплики (секунды) и порог VAD (дБ над шумом)
+DEFAULT_SILENCE_DURATION = 0.6
+DEFAULT_MAX_UTTERANCE = 15.0
+DEFAULT_PARTIAL_INTERVAL = 2.0
+VAD_THRESHOLD_DB = 10.0
+
+# Минимальное косинусное сходство эмбеддингов для совпадения спикеров
+# (порог кластеризации pyannote 3.1 - косинусное расстояние ~0.7)
+SPEAKER_MATCH_THRESHOLD = 0.3
+
+
+def plan_windows(start: float, stop: float, window: float = DEFAULT_STREAM_WINDOW,
+                 overlap: float = DEFAULT_STREAM_OVERLAP) -> Iterator[Tuple[float, float, float]]:
+    """
+    Окна обработки с перекрытием
+
+    Сегмент принадлежит окну, если его начало лежит до точки фиксации окна
+    (середина перекрытия со следующим окном), поэтому на стыке у сегмента
+    есть не меньше overlap/2 секунд контекста.
+
+    Yields:
+        (начало окна, конец окна, точка фиксации); у последнего окна точка фиксации - inf
+    """
+    if window <= 0:
+        raise ValueError("Длительность окна должна быть положительной")
+    overlap = min(max(overlap, 0.0), window / 2)
+    step = window - overlap
+
+    window_start = start
+    while True:
+        window_end = window_start + window
+        if window_end >= stop:
+            yield window_start, stop, math.inf
+            return
+        yield window_start, window_end, window_end - overlap / 2
+        window_start += step
+
+
+class SpeakerRegistry:
+    """
+    Глобальные метки спикеров для окон, диаризуемых независимо
+
+    Локальные метки pyannote окна сопоставляются с уже известными спикерами
+    по эмбеддингам (косинусное сходство с центроидом), а без эмбеддингов -
+    по совпадению реплик в перекрытии с предыдущим окном. Новые спикеры
+    получают следующий номер: "Спикер 1", "Спикер 2", ...
+    """
+
+    def __init__(self, threshold: float = SPEAKER_MATCH_THRESHOLD, template: str = "Спикер {}"):
+        self.threshold = threshold
+        self.template = template
+        self.names: List[str] = []
+        self.centroids: Dict[str, "np.ndarray"] = {}
+        self.previous_turns: List[Dict] = []
+
+    def _new_speaker(self) -> str:
+        name = self.template.format(len(self.names) + 1)
+        self.names.append(name)
+        return name
+
+    def assign(self, turns: Sequence[Dict], embeddings: Optional[Dict[str, Sequence[float]]] = None) -> Dict[str, str]:
+        """
+        Сопоставление локальных меток окна с глобальными
+
+        Args:
+            turns: Реплики окна в абсолютном времени [{"start", "end", "speaker"}]
+            embeddings: Эмбеддинги локальных спикеров {метка: вектор} или None
+
+        Returns:
+            {локальная метка: глобальное имя}
+        """
+        import numpy as np
+
+        durations = {}
+        for turn in turns:
+            durations[turn["speaker"]] = durations.get(turn["speaker"], 0.0) + turn["end"] - turn["start"]
+
+        vectors = {}
+        for label, vector in (embeddings or {}).items():
+            vector = np.asarray(vector, dtype=np.float64)
+            norm = np.linalg.norm(vector)
+            if label in durations and np.isfinite(norm) and norm > 0:
+                vectors[label] = vector / norm
+
+        mapping = {}
+        used = set()
+
+        # 1. Эмбеддинги: жадно по убыванию сходства, один к одному
+        candidates = []
+        for label, vector in vectors.items():
+            for name, centroid in self.centroids.items():
+                centroid_norm = np.linalg.norm(centroid)
+                if centroid_norm == 0:
+                    continue
+                similarity = float(vector @ centroid / centroid_norm)
+                if similarity >= self.threshold:
+                    candidates.append((similarity, label, name))
+        for _, label, name in sorted(candidates, key=lambda c: -c[0]):
+            if label not in mapping and name not in used:
+                mapping[label] = name
+                used.add(name)
+
+        # 2. Без эмбеддингов: наибольшее пересечение с репликами предыдущего окна
+        for label in durations:
+            if label in mapping:
+                continue
+            overlaps = {}
+            for turn in turns:
+                if turn["speaker"] != label:
+                    continue
+                for previous in self.previous_turns:
+                    overlap = min(turn["end"], previous["end"]) - max(turn["start"], previous["start"])
+                    if overlap > 0 and previous["speaker"] not in used:
+                        overlaps[previous["speaker"]] = overlaps.get(previous["speaker"], 0.0) + overlap
+            if overlaps:
+                mapping[label] = max(overlaps, key=overlaps.get)
+                used.add(mapping[label])
+
+        # 3. Остальные - новые спикеры (в порядке первого появления)
+        for label in durations:
+            if label not in mapping:
+                mapping[label] = self._new_speaker()
+
+        # Центроиды - сумма нормированных эмбеддингов, взвешенная длительностью речи
+        # (для косинусного сходства нормировка суммы не нужна)
+        for label, vector in vectors.items():
+            name = mapping[label]
+            self.centroids[name] = self.centroids.get(name, 0.0) + vector * durations[label]
+
+        self.previous_turns = [dict(turn, speaker=mapping[turn["speaker"]]) for turn in turns]
+        return mapping
@@ -0,0 +1,48 @@
+"""
+Процессор без моделей для тестов пайплайна
+
+StubProcessor создается настоящим конструктором AudioProcessor (все поля,
+кеши и параметры - как в работе), пропускается только загрузка Whisper и
+pyannote. Вместо вызова моделей транскрипция и диаризация возвращают одну
+фиксированную реплику, а transcribe (обрезка, кеш этапов) остается настоящим;
+тесты переопределяют методы этапов под свои сценарии.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import AudioProcessor
+
+
+class StubProcessor(AudioProcessor):
+    """
+    AudioProcessor без загрузки моделей
+
+    Параметры - те же, что у AudioProcessor; по умолчанию CPU и без реестра
+    моделей. С custom_whisper_model транскрипция идет через pipeline
+    (_transcribe_with_pipeline), как у кастомной модели.
+    """
+
+    def __init__(self, **options):
+        options.setdefault("device", "cpu")
+        options.setdefault("model_registry", False)
+        super().__init__(**options)
+
+    def _load_models(self):
+        self.load_timings = []
+        self.load_time = 0.0
+        self.diarization_pipeline = "stub"
+        if self.whisper_model_type == "custom":
+            self.whisper_pipeline = "stub"
+
+    def _transcribe_with_standard_model(self, audio):
+        return {"text": " Привет.", "language": "ru",
+                "segments": [{"start": 0.5, "end": 1.5, "text": " Привет."}]}
+
+    def _transcribe_with_pipeline(self, audio):
+        return self._transcribe_with_standard_model(audio)
+
+    def _diarization_turns(self, audio, diarization_params, checkpoint=None):
+        return [{"start": 0.0, "end": 2.0, "speaker": "SPEAKER_00"}]
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Проверка, что векторизованное совмещение и исправление Unknown сегментов
+совпадают с эталонными линейными реализациями
+"""
+
+import copy
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from alignment import AlignmentEngine, MidpointIndex
+from postprocessing import SegmentPostProcessor
+from segments import SegmentTable
+
+STRATEGIES = ["strict", "smart", "aggressive"]
+
+
+def make_case(seed: int, duration: float = 600.0, turns: int = 150, segments: int = 250):
+    """Случайные реплики (с пересечениями и паузами) и сегменты транскрипции"""
+    rng = random.Random(seed)
+
+    speaker_segments = []
+    for _ in range(turns):
+        start = rng.uniform(0, duration)
+        length = rng.choice([rng.uniform(0.2, 3.0), rng.uniform(3.0, 40.0)])
+        speaker_segments.append({
+            "start": round(start, rng.choice([1, 2, 3])),
+            "end": round(start + length, rng.choice([1, 2, 3])),
+            "speaker": f"Спикер {rng.randint(1, 4)}"
+        })
+    # Дубликаты проверяют выбор при равных счетах
+    speaker_segments += [dict(s, speaker="Спикер 9") for s in rng.sample(speaker_segments, 10)]
+    speaker_segments.sort(key=lambda s: s["start"])
+
+    transcription = []
+    for _ in range(segments):
+        start = rng.uniform(-10, duration + 10)
+        transcription.append((round(start, 2), round(start + rng.uniform(0.0, 12.0), 2)))
+
+    return speaker_segments, transcription
+
+
+def find_best_speaker(t_start: float, t_end: float, t_mid: float,
+                      speaker_segments: List[Dict], strategy: str) -> str:
+    """
+    Эталон AlignmentEngine: лучший спикер для сегмента транскрипции
+    линейным перебором всех реплик (O(реплик) на сегмент)
+    """
+    best_speaker = "Unknown"
+    best_score = 0
+
+    for s_segment in speaker_segments:
+        s_start, s_end = s_segment["start"], s_segment["end"]
+        score = 0
+
+        if strategy == "strict":
+            # Только строгое пересечение
+            overlap_start = max(t_start, s_start)
+            overlap_end = min(t_end, s_end)
+            overlap = max(0, overlap_end - overlap_start)
+            score = overlap
+
+        elif strategy == "smart":
+            # Комбинированная стратегия
+            # 1. Пересечение (приоритет)
+            overlap_start = max(t_start, s_start)
+            overlap_end = min(t_end, s_end)
+            overlap = max(0, overlap_end - overlap_start)
+
+            if overlap > 0:
+                score = overlap * 10  # Высокий приоритет пересечениям
+            else:
+                # 2. Близость по времени
+                gap_to_start = abs(t_mid - s_start)
+                gap_to_end = abs(t_mid - s_end)
+                min_gap = min(gap_to_start, gap_to_end)
+
+                # 3. Средняя точка сегмента диаризации
+                s_mid = (s_start + s_end) / 2
+                gap_to_mid = abs(t_mid - s_mid)
+
+                # Чем ближе, тем выше счет (но меньше чем пересечение)
+                if min_gap < 2.0:  # Максимум 2 секунды разрыва
+                    score = max(0, 2.0 - min_gap)
+                elif gap_to_mid < 3.0:  # Альтернатива по средней точке
+                    score = max(0, 1.0 - gap_to_mid / 3.0)
+
+        elif strategy == "aggressive":
+            # Очень агрессивное совмещение
+            # Любое пересечение или близость
+            overlap_start = max(t_start, s_start)
+            overlap_end = min(t_end, s_end)
+            overlap = max(0, overlap_end - overlap_start)
+
+            if overlap > 0:
+                score = overlap * 10
+            else:
+                # Расстояние до ближайшей точки
+                distances = [
+                    abs(t_start - s_start), abs(t_start - s_end),
+                    abs(t_end - s_start), abs(t_end - s_end),
+                    abs(t_mid - s_start), abs(t_mid - s_end)
+                ]
+                min_distance = min(distances)
+
+                if min_distance < 5.0:  # До 5 секунд разрыва
+                    score = max(0, 5.0 - min_distance)
+
+        if score > best_score:
+            best_score = score
+            best_speaker = s_segment["speaker"]
+
+    return best_speaker
+
+
+def reference(speaker_segments, transcription, strategy):
+    return [
+        find_best_speaker(start, end, (start + end) / 2, speaker_segments, strategy)
+        for start, end in transcription
+    ]
+
+
+def test_engine_matches_reference():
+    for seed in range(20):
+        speaker_segments, transcription = make_case(seed)
+        engine = AlignmentEngine(speaker_segments)
+        starts = [start for start, _ in transcription]
+        ends = [end for _, end in transcription]
+
+        for strategy in STRATEGIES:
+            expected = reference(speaker_segments, transcription, strategy)
+            assert engine.assign(starts, ends, strategy) == expected, (seed, strategy)
+
+
+def test_unsorted_input_keeps_tie_order():
+    speaker_segments, transcription = make_case(42)
+    random.Random(0).shuffle(speaker_segments)
+    engine = AlignmentEngine(speaker_segments)
+
+    for strategy in STRATEGIES:
+        expected = reference(speaker_segments, transcription, strategy)
+        actual = engine.assign([s for s, _ in transcription], [e for _, e in transcription], strategy)
+        assert actual == expected, strategy
+
+
+def test_empty_inputs():
+    assert AlignmentEngine([]).assign([1.0], [2.0], "smart") == ["Unknown"]
+    assert AlignmentEngine([{"start": 0, "end": 1, "speaker": "A"}]).assign([], [], "smart") == []
+
+
+def find_nearest_speaker(t_mid: float, speaker_segments: List[Dict]) -> str:
+    """Эталон MidpointIndex: ближайший по средней точке спикер"""
+    min_distance = float('inf')
+    nearest_speaker = "Unknown"
+
+    for s_segment in speaker_segments:
+        s_start, s_end = s_segment["start"], s_segment["end"]
+        s_mid = (s_start + s_end) / 2
+
+        # Расстояние до средней точки сегмента диаризации
+        distance = abs(t_mid - s_mid)
+
+        if distance < min_distance:
+            min_distance = distance
+            nearest_speaker = s_segment["speaker"]
+
+    # Возвращаем только если расстояние разумное (< 10 секунд)
+    return nearest_speaker if min_distance < 10.0 else "Unknown"
+
+
+def find_contextual_speaker(idx: int, segments: List[Dict], known_speakers: List[str]) -> str:
+    """Спикер по контексту соседних сегментов (линейный поиск)"""
+    # Смотрим на соседние сегменты
+    before_speaker = None
+    after_speaker = None
+
+    # Предыдущий известный спикер
+    for i in range(idx - 1, -1, -1):
+        if segments[i]["speaker"] != "Unknown":
+            before_speaker = segments[i]["speaker"]
+            break
+
+    # Следующий известный спикер
+    for i in range(idx + 1, len(segments)):
+        if segments[i]["speaker"] != "Unknown":
+            after_speaker = segments[i]["speaker"]
+            break
+
+    # Если окружен одним спикером, используем его
+    if before_speaker and before_speaker == after_speaker:
+        return before_speaker
+
+    # Иначе используем ближайшего по времени
+    if before_speaker:
+        return before_speaker
+    elif after_speaker:
+        return after_speaker
+
+    return "Unknown"
+
+
+def reference_resolve(segments, speaker_segments):
+    """Исходный квадратичный алгоритм исправления Unknown сегментов"""
+    known_speakers = [s["speaker"] for s in speaker_segments]
+    for idx in [i for i, seg in enumerate(segments) if seg["speaker"] == "Unknown"]:
+        t_mid = (segments[idx]["start"] + segments[idx]["end"]) / 2
+        best_speaker = find_nearest_speaker(t_mid, speaker_segments)
+        if best_speaker == "Unknown":
+            best_speaker = find_contextual_speaker(idx, segments, known_speakers)
+        if best_speaker == "Unknown" and known_speakers:
+            speaker_counts = {}
+            for s in segments:
+                if s["speaker"] != "Unknown":
+                    speaker_counts[s["speaker"]] = speaker_counts.get(s["speaker"], 0) + 1
+            if speaker_counts:
+                best_speaker = max(speaker_counts, key=speaker_counts.get)
+            else:
+                best_speaker = known_speakers[0]
+        segments[idx]["speaker"] = best_speaker
+    return segments
+
+
+def make_resolve_case(seed: int, names=("Спикер 1", "Спикер 2", "Спикер 3")):
+    """Редкие реплики (часть сегментов дальше 10 с) и много Unknown сегментов"""
+    rng = random.Random(seed)
+    speaker_segments = []
+    for _ in range(rng.randint(1, 12)):
+        start = round(rng.uniform(0, 500), 1)
+        speaker_segments.append({"start": start, "end": round(start + rng.uniform(0.2, 6), 1),
+                                 "speaker": rng.choice(names)})
+
+    segments = []
+    position = 0.0
+    for _ in range(rng.randint(1, 300)):
+        length = round(rng.uniform(0.5, 4.0), 1)
+        speaker = "Unknown" if rng.random() < 0.6 else rng.choice(names)
+        segments.append({"start": position, "end": position + length, "text": "", "speaker": speaker})
+        position += length
+    return segments, speaker_segments
+
+
+def test_resolver_matches_reference():
+    processor = SegmentPostProcessor()
+    for seed in range(200):
+        # Пустое имя и спикер с именем "Unknown" проверяют крайние случаи контекста
+        names = ("Спикер 1", "Спикер 2", "", "Unknown") if seed % 4 == 0 else ("Спикер 1", "Спикер 2")
+        segments, speaker_segments = make_resolve_case(seed, names)
+        expected = reference_resolve(copy.deepcopy(segments), speaker_segments)
+
+        turns = SegmentTable.from_records(speaker_segments)
+        table = SegmentTable.from_records(segments, speakers=turns.speakers, with_text=True)
+        actual = processor._resolve_unknown_speakers(table, turns).to_records()
+        assert actual == expected, seed
+
+
+def test_midpoint_index_matches_reference():
+    rng = random.Random(7)
+    speaker_segments, _ = make_case(3)
+    speaker_segments += [dict(s, speaker="Дубликат") for s in speaker_segments[:20]]
+    index = MidpointIndex(speaker_segments)
+
+    for _ in range(2000):
+        t_mid = round(rng.uniform(-20, 700), rng.choice([0, 1, 2]))
+        nearest, distance = index.nearest(t_mid)
+        expected = find_nearest_speaker(t_mid, speaker_segments)
+        assert (nearest if distance < 10.0 else "Unknown") == expected, t_mid
+
+
+def main():
+    print("🧪 Проверка векторизованного совмещения")
+    for test in (test_engine_matches_reference, test_unsorted_input_keeps_tie_order, test_empty_inputs,
+                 test_resolver_matches_reference, test_midpoint_index_matches_reference):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Проверка загрузки аудио: однократное декодирование, окна без копирования и потоковый декодер
+"""
+
+import os
+import stat
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import AudioData, StreamingDecoder, _rebatch, load_audio, probe_duration
+from main import AudioProcessor
+from stubs import StubProcessor
+
+SAMPLE_RATE = 16000
+
+
+class RecordingProcessor(StubProcessor):
+    """Процессор без моделей: запоминает аудио, которое получил каждый этап"""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = {}
+
+    def transcribe(self, audio, time_limit=None):
+        self.seen["transcription"] = self._ensure_audio(audio)
+        return super().transcribe(audio, time_limit)
+
+    def _diarization_turns(self, audio, diarization_params, checkpoint=None):
+        self.seen["diarization"] = audio
+        return super()._diarization_turns(audio, diarization_params, checkpoint)
+
+
+def write_wav(path: Path, waveform: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    sf.write(path, waveform, sample_rate, subtype="FLOAT")
+
+
+def test_window_and_trim_do_not_copy():
+    audio = AudioData(np.arange(10 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE, offset=5.0)
+
+    window = audio.window(2.0, 4.0)
+    assert np.shares_memory(window.waveform, audio.waveform)
+    assert window.duration == 2.0 and window.offset == 7.0
+    assert window.waveform[0] == 2 * SAMPLE_RATE
+
+    trimmed = audio.trim(3.0)
+    assert np.shares_memory(trimmed.waveform, audio.waveform)
+    assert trimmed.duration == 3.0 and trimmed.offset == 5.0
+
+    # Окно на все аудио и обрезка длиннее аудио возвращают тот же объект
+    assert audio.window() is audio and audio.trim(60.0) is audio
+
+
+def test_load_audio_resamples_to_mono():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "stereo.wav"
+        t = np.arange(2 * 44100) / 44100
+        left = 0.5 * np.sin(2 * np.pi * 440 * t)
+        write_wav(path, np.stack([left, left], axis=1).astype(np.float32), 44100)
+
+        audio = load_audio(path)
+        assert audio.sample_rate == SAMPLE_RATE and audio.waveform.ndim == 1
+        assert audio.waveform.dtype == np.float32
+        assert abs(len(audio.waveform) - 2 * SAMPLE_RATE) <= 1
+        assert audio.source_path == str(path) and audio.offset == 0.0
+        assert 0.45 < np.abs(audio.waveform).max() < 0.55
+
+
+def test_process_decodes_once_for_all_stages():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "call.wav"
+        write_wav(path, np.zeros(3 * SAMPLE_RATE, dtype=np.float32))
+
+        processor = RecordingProcessor()
+        result = processor.process(str(path), output_dir=directory)
+
+        transcription_audio = processor.seen["transcription"]
+        assert transcription_audio is processor.seen["diarization"]
+        assert processor._ensure_audio(transcription_audio) is transcription_audio
+        assert result["segments"] == [{"start": 0.5, "end": 1.5, "text": "Привет.", "speaker": "Спикер 1"}]
+        assert result["time_window"] == {"start": 0.0, "end": 3.0}
+
+
+def test_decoder_yields_fixed_size_blocks():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "long.wav"
+        waveform = np.random.default_rng(0).uniform(-0.5, 0.5, 25 * SAMPLE_RATE).astype(np.float32)
+        write_wav(path, waveform)
+
+        decoder = StreamingDecoder(path, block_duration=10.0)
+        assert decoder.backend == "soundfile" and decoder.duration == 25.0 == probe_duration(path)
+
+        blocks = list(decoder.blocks())
+        assert [len(block) for block in blocks] == [10 * SAMPLE_RATE, 10 * SAMPLE_RATE, 5 * SAMPLE_RATE]
+        assert np.array_equal(np.concatenate(blocks), waveform)
+        assert list(decoder.blocks(5.0, 5.0)) == []
+
+
+def test_decoder_window_matches_full_read():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "call.wav"
+        waveform = np.random.default_rng(1).uniform(-0.5, 0.5, 20 * SAMPLE_RATE).astype(np.float32)
+        write_wav(path, waveform)
+
+        decoder = StreamingDecoder(path, block_duration=3.0)
+        full = decoder.read()
+        window = decoder.read(4.0, 11.5)
+        assert window.offset == 4.0 and window.duration == 7.5
+        assert np.array_equal(window.waveform, full.waveform[4 * SAMPLE_RATE:int(11.5 * SAMPLE_RATE)])
+        # Окно за концом файла обрезается по длительности файла
+        assert decoder.read(18.0, 60.0).duration == 2.0
+
+
+def test_rebatch_regroups_chunks():
+    chunks = [np.arange(0, 3), np.arange(3, 10), np.arange(10, 11)]
+    blocks = list(_rebatch(iter(chunks), 4))
+    assert [block.tolist() for block in blocks] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10]]
+    assert all(block.dtype == np.float32 for block in blocks)
+    assert list(_rebatch(iter([]), 4)) == []
+
+
+def test_time_window_validation():
+    resolve = AudioProcessor._resolve_time_window
+    assert resolve(None, None, None) == (0.0, None)
+    assert resolve(10.0, None, 30.0) == (10.0, 40.0)
+    # При заданных end и time_limit берется более ранний конец
+    assert resolve(10.0, 25.0, 30.0) == (10.0, 25.0)
+    assert resolve(10.0, 60.0, 30.0) == (10.0, 40.0)
+
+    for start, end, time_limit in ((-1.0, None, None), (10.0, 10.0, None), (10.0, 5.0, None),
+                                   (10.0, None, 0.0)):
+        try:
+            resolve(start, end, time_limit)
+            raise AssertionError(f"окно {start}-{end} (limit {time_limit}) должно отклоняться")
+        except ValueError:
+            pass
+
+
+def test_process_window_keeps_file_timestamps():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "call.wav"
+        write_wav(path, np.zeros(10 * SAMPLE_RATE, dtype=np.float32))
+
+        processor = RecordingProcessor()
+        result = processor.process(str(path), output_dir=directory, start=4.0, end=7.0)
+
+        decoded = processor.seen["transcription"]
+        assert decoded.offset == 4.0 and decoded.duration == 3.0
+        assert result["time_window"] == {"start": 4.0, "end": 7.0}
+        # Сегменты окна переводятся в координаты исходного файла
+        assert [(s["start"], s["end"]) for s in result["segments"]] == [(4.5, 5.5)]
+
+
+def test_ffmpeg_error_does_not_block_on_stderr():
+    with tempfile.TemporaryDirectory() as directory:
+        # Поддельный ffmpeg пишет в stderr больше буфера pipe и завершается с ошибкой
+        fake = Path(directory) / "ffmpeg"
+        fake.write_text("#!/bin/sh\nhead -c 200000 /dev/zero | tr '\\0' x >&2\necho 'Invalid data found' >&2\nexit 1\n")
+        fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+
+        path = os.environ.get("PATH", "")
+        os.environ["PATH"] = f"{directory}{os.pathsep}{path}"
+        try:
+            decoder = StreamingDecoder(Path(directory) / "broken.m4a", backend="ffmpeg")
+            list(decoder.blocks())
+            raise AssertionError("ожидалась ошибка ffmpeg")
+        except RuntimeError as e:
+            assert str(e).endswith("Invalid data found")
+        finally:
+            os.environ["PATH"] = path
+
+
+def main():
+    print("🧪 Проверка загрузки аудио")
+    for test in (test_window_and_trim_do_not_copy, test_load_audio_resamples_to_mono,
+                 test_process_decodes_once_for_all_stages, test_decoder_yields_fixed_size_blocks,
+                 test_decoder_window_matches_full_read, test_rebatch_regroups_chunks,
+                 test_time_window_validation, test_process_window_keeps_file_timestamps,
+                 test_ffmpeg_error_does_not_block_on_stderr):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Проверка пакетного режима: сбор файлов, пропуск готовых, планирование в нескольких процессах
+"""
+
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch import (BatchItem, BatchRunner, PrefetchingBatchRunner, collect_batch_items,
+                   estimate_duration, is_batch_input, longest_first)
+from checkpoint import MANIFEST_NAME
+from parallel import process_memory, worker_cpu_sets
+from stubs import StubProcessor as BaseStubProcessor
+
+SAMPLE_RATE = 16000
+
+
+class StubProcessor(BaseStubProcessor):
+    """Процессор без моделей: одна реплика на файл, ошибка на файлах с "broken" в имени"""
+
+    def __init__(self, decode_delay: float = 0.0):
+        # Кастомная модель: отпечаток задачи для контрольных точек строится без весов
+        super().__init__(custom_whisper_model="stub/whisper")
+        self.decode_delay = decode_delay
+        self.decoded = []
+        self.transcribed = []
+        self.checkpoints = []
+
+    def decode(self, audio_path, **options):
+        time.sleep(self.decode_delay)
+        self.decoded.append(Path(audio_path).name)
+        return super().decode(audio_path, **options)
+
+    def _transcribe_checkpointed(self, audio, checkpoint):
+        self.checkpoints.append(checkpoint.job_dir)
+        return self.transcribe(audio)
+
+    def transcribe(self, audio, time_limit=None):
+        audio = self._ensure_audio(audio)
+        if "broken" in audio.source_path:
+            raise RuntimeError("модель упала")
+        self.transcribed.append(Path(audio.source_path).name)
+        return super().transcribe(audio, time_limit)
+
+
+def write_silence(path: Path, seconds: float = 2.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sf.write(path, np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32), SAMPLE_RATE)
+
+
+def test_collect_directory_keeps_structure():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory) / "calls"
+        for name in ("b.wav", "a.WAV", "day2/a.wav"):
+            write_silence(root / name)
+        (root / "notes.txt").write_text("не аудио")
+
+        items = collect_batch_items(str(root), "out")
+        assert [item.audio_path.relative_to(root).as_posix() for item in items] == ["a.WAV", "b.wav", "day2/a.wav"]
+        # Одинаковые имена в подкаталогах не конфликтуют
+        assert [item.output_dir.as_posix() for item in items] == ["out", "out", "out/day2"]
+        assert items[2].result_path == Path("out/day2/a_result.json")
+
+
+def test_collect_glob_and_manifest():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        for name in ("one.wav", "two.wav", "skip.mp3"):
+            write_silence(root / name)
+
+        pattern = str(root / "*.wav")
+        assert is_batch_input(pattern) and is_batch_input(str(root)) and not is_batch_input(str(root / "one.wav"))
+        assert [item.audio_path.name for item in collect_batch_items(pattern, "out")] == ["one.wav", "two.wav"]
+
+        manifest = root / "jobs.jsonl"
+        manifest.write_text("\n".join([
+            json.dumps({"audio": "one.wav", "start": 1.0, "alignment_strategy": "strict", "unknown": 1}),
+            "",
+            json.dumps({"path": str(root / "two.wav"), "output": str(root / "custom")}),
+        ]))
+        assert is_batch_input(str(manifest))
+        first, second = collect_batch_items(str(manifest), "out")
+        # Относительные пути - от каталога манифеста, лишние поля отбрасываются
+        assert first.audio_path == root / "one.wav" and first.output_dir == Path("out")
+        assert first.options == {"start": 1.0, "alignment_strategy": "strict"}
+        assert second.output_dir == root / "custom" and second.options == {}
+
+        for line, message in (("{обрыв", "некорректный JSON"), ('{"start": 1}', "'audio'")):
+            manifest.write_text(line)
+            try:
+                collect_batch_items(str(manifest), "out")
+                raise AssertionError(f"строка {line!r} должна отклоняться")
+            except ValueError as e:
+                assert f"{manifest}:1" in str(e) and message in str(e)
+
+
+def test_runner_skips_existing_and_isolates_failures():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        for name in ("done.wav", "broken.wav", "new.wav"):
+            write_silence(root / "in" / name)
+        (root / "out").mkdir()
+        (root / "out" / "done_result.json").write_text("{}")
+
+        processor = StubProcessor()
+        items = collect_batch_items(str(root / "in"), str(root / "out"))
+        report = BatchRunner(processor).run(items, report_path=root / "out" / "report.json")
+
+        statuses = {Path(r["audio_file"]).name: r["status"] for r in report["files"]}
+        assert statuses == {"broken.wav": "failed", "done.wav": "skipped", "new.wav": "ok"}
+        assert processor.transcribed == ["new.wav"]
+        assert (root / "out" / "new_result.json").exists()
+        assert report["summary"]["ok"] == 1 and report["summary"]["skipped"] == 1
+        with open(root / "out" / "report.json", "r", encoding="utf-8") as f:
+            assert json.load(f)["summary"] == report["summary"]
+
+        # Без пропуска готовых файлов обрабатывается и done.wav
+        BatchRunner(processor, skip_existing=False).run(items[1:2])
+        assert processor.transcribed == ["new.wav", "done.wav"]
+
+
+def test_prefetch_goes_through_process():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        for name in ("a.wav", "b.wav", "c.wav"):
+            write_silence(root / "in" / name, seconds=3.0)
+
+        processor = StubProcessor(decode_delay=0.2)
+        items = collect_batch_items(str(root / "in"), str(root / "out"))
+        report = PrefetchingBatchRunner(processor, {"start": 0.5}, prefetch=1).run(items)
+
+        assert [r["status"] for r in report["files"]] == ["ok", "ok", "ok"]
+        # Каждый файл декодируется один раз, окно применяется при декодировании
+        assert sorted(processor.decoded) == ["a.wav", "b.wav", "c.wav"]
+        assert processor.transcribed == ["a.wav", "b.wav", "c.wav"]
+        with open(root / "out" / "b_result.json", "r", encoding="utf-8") as f:
+            result = json.load(f)
+        assert result["audio_file"] == "b.wav" and result["time_window"] == {"start": 0.5, "end": 3.0}
+        # Время декодирования в фоне входит в total_time файла
+        assert result["total_time"] >= 0.2
+
+
+def test_prefetch_keeps_job_checkpoints():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        write_silence(root / "in" / "long.wav")
+
+        processor = StubProcessor()
+        items = collect_batch_items(str(root / "in"), str(root / "out"))
+        report = PrefetchingBatchRunner(processor, {"job_dir": str(root / "job")}).run(items)
+
+        assert report["files"][0]["status"] == "ok"
+        assert processor.checkpoints == [root / "job"]
+        with open(root / "job" / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            assert json.load(f)["completed"]
+
+
+def test_estimate_duration_respects_window():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "call.wav"
+        sf.write(path, np.zeros(60 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+
+        assert estimate_duration(BatchItem(path, Path(directory))) == 60.0
+        assert estimate_duration(BatchItem(path, Path(directory)), {"start": 10.0, "end": 40.0}) == 30.0
+        # Окно из манифеста важнее общих параметров, time_limit ограничивает длительность
+        item = BatchItem(path, Path(directory), {"start": 50.0})
+        assert estimate_duration(item, {"start": 10.0}) == 10.0
+        assert estimate_duration(BatchItem(path, Path(directory)), {"time_limit": 5.0}) == 5.0
+        # Нечитаемый файл планируется последним
+        assert estimate_duration(BatchItem(Path(directory) / "missing.wav", Path(directory))) == 0.0
+
+
+def test_longest_first_is_stable():
+    durations = {0: 5.0, 1: 40.0, 2: 12.0, 3: 40.0, 4: 0.0}
+    assert longest_first([0, 1, 2, 3, 4], durations) == [1, 3, 2, 0, 4]
+
+
+def test_worker_cpu_sets_are_disjoint():
+    cpu_sets = worker_cpu_sets(1, 1)
+    if cpu_sets is None:
+        return  # привязка к ядрам не поддерживается платформой
+    assert len(cpu_sets) == 1 and len(cpu_sets[0]) == 1
+    assert worker_cpu_sets(1, 10 ** 6) is None
+
+    cpus = worker_cpu_sets(2, 1)
+    if cpus is not None:
+        assert len(cpus) == 2 and not set(cpus[0]) & set(cpus[1])
+
+
+def test_process_memory_reports_rss():
+    memory = process_memory()
+    assert set(memory) == {"rss", "private", "shared"}
+    assert memory["rss"] > 0
+    if memory["private"] is not None:
+        # Выделенный и заполненный массив - собственные страницы процесса
+        before = process_memory()["private"]
+        block = np.ones(64 * 1024 * 1024, dtype=np.uint8)
+        assert process_memory()["private"] - before >= 60 * 1024 * 1024
+        del block
+
+
+def main():
+    print("🧪 Проверка пакетного режима")
+    for test in (test_collect_directory_keeps_structure, test_collect_glob_and_manifest,
+                 test_runner_skips_existing_and_isolates_failures, test_prefetch_goes_through_process,
+                 test_prefetch_keeps_job_checkpoints, test_estimate_duration_respects_window, test_longest_first_is_stable,
+                 test_worker_cpu_sets_are_disjoint, test_process_memory_reports_rss):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
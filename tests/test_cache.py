@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Проверка кешей: mmap-кеш декодированного PCM, его вытеснение и кеш результатов этапов
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import AudioData
+from cache import PCMCache, StageCache, default_cache_dir
+from stubs import StubProcessor
+
+SAMPLE_RATE = 16000
+# Размер записи .npy с секундой аудио: заголовок 128 байт + float32 данные
+ENTRY_SIZE = 128 + 4 * SAMPLE_RATE
+
+
+class CountingProcessor(StubProcessor):
+    """Кастомная модель без весов: считает реальные вызовы транскрипции"""
+
+    def __init__(self, cache_dir: str):
+        super().__init__(custom_whisper_model="stub/whisper", cache_dir=cache_dir, audio_cache=False)
+        self.language = "russian"
+        self.calls = 0
+
+    def _transcription_options(self):
+        return dict(super()._transcription_options(), language=self.language)
+
+    def _transcribe_with_pipeline(self, audio):
+        self.calls += 1
+        return {"text": f" вызов {self.calls}", "segments": [], "language": "ru"}
+
+
+def write_audio_files(directory: Path, count: int) -> list:
+    """Разные по содержимому файлы (ключ кеша - хеш содержимого)"""
+    paths = []
+    for index in range(count):
+        path = directory / f"call{index}.wav"
+        sf.write(path, np.full(SAMPLE_RATE, index / 10, dtype=np.float32), SAMPLE_RATE)
+        paths.append(path)
+    return paths
+
+
+def test_pcm_cache_round_trip_is_mmap():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        cache = PCMCache(directory / "pcm")
+        path, = write_audio_files(directory, 1)
+        assert cache.get(path, SAMPLE_RATE) is None
+
+        waveform = np.linspace(-1, 1, SAMPLE_RATE, dtype=np.float32)
+        stored = cache.put(path, AudioData(waveform, SAMPLE_RATE, str(path)))
+        assert isinstance(stored.waveform, np.memmap) and np.array_equal(stored.waveform, waveform)
+
+        cached = cache.get(path, SAMPLE_RATE)
+        assert isinstance(cached.waveform, np.memmap) and np.array_equal(cached.waveform, waveform)
+        assert cached.content_hash == stored.content_hash == cache.content_hash(path)
+        # Другая частота - другая запись
+        assert cache.get(path, 8000) is None
+
+
+def test_pcm_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        cache = PCMCache(directory / "pcm", max_size=2 * ENTRY_SIZE)
+        first, second, third = write_audio_files(directory, 3)
+
+        for path in (first, second):
+            cache.put(path, AudioData(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE))
+        # Явные времена доступа: first старше second, затем first читается
+        for age, path in ((200, first), (100, second)):
+            entry = cache._entry_path(cache.content_hash(path), SAMPLE_RATE)
+            past = entry.stat().st_mtime - age
+            os.utime(entry, (past, past))
+        assert cache.get(first, SAMPLE_RATE) is not None
+
+        cache.put(third, AudioData(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE))
+        assert cache.get(second, SAMPLE_RATE) is None
+        assert cache.get(first, SAMPLE_RATE) is not None and cache.get(third, SAMPLE_RATE) is not None
+        assert sum(entry.stat().st_size for entry in (directory / "pcm").glob("*.npy")) <= 2 * ENTRY_SIZE
+
+
+def test_pcm_cache_skips_arrays_over_limit():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        cache = PCMCache(directory / "pcm", max_size=4 * SAMPLE_RATE - 1)
+        path, = write_audio_files(directory, 1)
+
+        audio = AudioData(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+        assert cache.put(path, audio) is audio
+        assert not list((directory / "pcm").glob("*.npy"))
+
+        # Массив меньше лимита, но файл с заголовком .npy - больше
+        cache.max_size = 4 * SAMPLE_RATE
+        assert cache.put(path, audio) is audio
+        assert not list((directory / "pcm").glob("*.npy"))
+
+
+def test_default_cache_dir_is_outside_project():
+    previous = os.environ.get("XDG_CACHE_HOME")
+    try:
+        os.environ["XDG_CACHE_HOME"] = "/var/cache/user"
+        assert default_cache_dir() == Path("/var/cache/user/whisper-diarization")
+        del os.environ["XDG_CACHE_HOME"]
+        assert default_cache_dir() == Path.home() / ".cache" / "whisper-diarization"
+    finally:
+        if previous is not None:
+            os.environ["XDG_CACHE_HOME"] = previous
+
+
+def test_stage_key_is_order_independent():
+    key = StageCache.make_key(audio="abc", options={"language": "ru", "beam": 5})
+    assert key == StageCache.make_key(options={"beam": 5, "language": "ru"}, audio="abc")
+    assert key != StageCache.make_key(audio="abc", options={"language": "ru", "beam": 1})
+
+
+def test_transcription_cache_follows_options():
+    with tempfile.TemporaryDirectory() as directory:
+        processor = CountingProcessor(directory)
+        assert processor.stage_cache is not None and processor.pcm_cache is None
+        audio = AudioData(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE, content_hash="abc")
+
+        first = processor.transcribe(audio)
+        assert processor.transcribe(audio) == first and processor.calls == 1
+
+        # Другой параметр транскрипции, окно или файл - новый ключ и повторный инференс
+        processor.language = "english"
+        assert processor.transcribe(audio)["text"] == " вызов 2"
+        processor.transcribe(audio.window(0.5))
+        processor.transcribe(AudioData(audio.waveform, SAMPLE_RATE, content_hash="def"))
+        assert processor.calls == 4
+
+        processor.language = "russian"
+        assert processor.transcribe(audio) == first and processor.calls == 4
+
+        # Без хеша содержимого кеш не используется
+        processor.transcribe(AudioData(audio.waveform, SAMPLE_RATE))
+        processor.transcribe(AudioData(audio.waveform, SAMPLE_RATE))
+        assert processor.calls == 6
+
+
+def test_corrupted_stage_entry_is_dropped():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = StageCache(directory)
+        key = StageCache.make_key(audio="abc")
+        cache.put("diarization", key, [{"start": np.float32(0.5), "end": 1.0, "speaker": "A"}])
+        assert cache.get("diarization", key) == [{"start": 0.5, "end": 1.0, "speaker": "A"}]
+
+        entry = Path(directory) / "diarization" / f"{key}.json"
+        entry.write_text("{обрыв")
+        assert cache.get("diarization", key) is None and not entry.exists()
+
+
+def main():
+    print("🧪 Проверка кешей")
+    for test in (test_pcm_cache_round_trip_is_mmap, test_pcm_cache_evicts_least_recently_used,
+                 test_pcm_cache_skips_arrays_over_limit, test_default_cache_dir_is_outside_project,
+                 test_stage_key_is_order_independent, test_transcription_cache_follows_options,
+                 test_corrupted_stage_entry_is_dropped):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Проверка контрольных точек: план фрагментов, объединение транскрипций и возобновление задачи
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import AudioData
+from checkpoint import (PYANNOTE_CACHED_EMBEDDINGS, JobCheckpoint, merge_transcriptions,
+                        plan_chunks)
+
+SAMPLE_RATE = 16000
+FINGERPRINT = {"audio": "abc", "duration": 100.0, "whisper": {"model": "base"}}
+
+
+def test_chunk_boundaries_fall_into_silence():
+    rng = np.random.default_rng(0)
+    waveform = (0.1 * rng.standard_normal(100 * SAMPLE_RATE)).astype(np.float32)
+    # Паузы в 31.5 с и 58.0 с - рядом с целевыми границами 30 с и 30 + 30 с
+    for pause in (31.5, 58.0):
+        waveform[int(pause * SAMPLE_RATE):int((pause + 0.3) * SAMPLE_RATE)] = 0.0
+
+    chunks = plan_chunks(AudioData(waveform, SAMPLE_RATE), chunk_duration=30.0)
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 100.0
+    assert all(previous[1] == current[0] for previous, current in zip(chunks, chunks[1:]))
+    assert 31.5 <= chunks[0][1] <= 31.8 and 58.0 <= chunks[1][1] <= 58.3
+
+
+def test_short_audio_is_single_chunk():
+    audio = AudioData(np.zeros(10 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+    assert plan_chunks(audio, chunk_duration=300.0) == [(0.0, 10.0)]
+
+
+def test_merge_shifts_segments_and_words():
+    merged = merge_transcriptions([
+        (0.0, {"text": " Привет.", "language": "ru",
+               "segments": [{"id": 0, "start": 0.5, "end": 2.0, "text": " Привет."}]}),
+        (30.0, {"text": " Как дела?", "language": "ru",
+                "segments": [{"id": 0, "start": 1.0, "end": 2.5, "text": " Как дела?",
+                              "words": [{"word": " Как", "start": 1.0, "end": 1.3}]}]}),
+    ])
+    assert merged["text"] == "Привет. Как дела?" and merged["language"] == "ru"
+    assert [(s["id"], s["start"], s["end"]) for s in merged["segments"]] == [(0, 0.5, 2.0), (1, 31.0, 32.5)]
+    assert merged["segments"][1]["words"][0]["start"] == 31.0
+
+
+def test_resume_keeps_chunks_and_rejects_other_input():
+    with tempfile.TemporaryDirectory() as job_dir:
+        audio = AudioData(np.zeros(100 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+        checkpoint = JobCheckpoint(job_dir, FINGERPRINT, chunk_duration=30.0)
+        chunks = checkpoint.transcription_chunks(audio)
+        saved = checkpoint.save_transcription_chunk(0, {"text": "a", "segments": [], "score": np.float32(0.5)})
+        assert saved == {"text": "a", "segments": [], "score": 0.5}
+
+        resumed = JobCheckpoint(job_dir, dict(FINGERPRINT), resume=True, chunk_duration=30.0)
+        assert resumed.transcription_chunks(audio) == chunks
+        assert resumed.load_transcription_chunk(0) == saved
+        assert resumed.load_transcription_chunk(1) is None
+
+        try:
+            JobCheckpoint(job_dir, dict(FINGERPRINT, audio="other"), resume=True, chunk_duration=30.0)
+            raise AssertionError("ожидалась ошибка несовпадения задачи")
+        except ValueError:
+            pass
+
+        # Без --resume задача начинается заново
+        fresh = JobCheckpoint(job_dir, FINGERPRINT, chunk_duration=30.0)
+        assert fresh.load_transcription_chunk(0) is None and "chunks" not in fresh.manifest
+
+
+def test_pyannote_hook_saves_embeddings_for_resume():
+    with tempfile.TemporaryDirectory() as job_dir:
+        checkpoint = JobCheckpoint(job_dir, FINGERPRINT)
+        hook = checkpoint.pyannote_hook()
+        embeddings = np.arange(12, dtype=np.float32).reshape(2, 3, 2)
+        hook("embeddings", None, file={}, total=10, completed=5)  # прогресс - не сохраняется
+        assert not (Path(job_dir) / "diarization" / "embeddings.npy").exists()
+        hook("embeddings", embeddings, file={})
+
+        # Эмбеддинги подставляются только вместе с сегментацией, на которой они посчитаны
+        file = {}
+        assert checkpoint.restore_diarization_steps(file) == []
+        assert PYANNOTE_CACHED_EMBEDDINGS not in file
+        assert np.array_equal(np.load(Path(job_dir) / "diarization" / "embeddings.npy"), embeddings)
+
+
+def main():
+    print("🧪 Проверка контрольных точек")
+    for test in (test_chunk_boundaries_fall_into_silence, test_short_audio_is_single_chunk,
+                 test_merge_shifts_segments_and_words, test_resume_keeps_chunks_and_rejects_other_input,
+                 test_pyannote_hook_saves_embeddings_for_resume):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
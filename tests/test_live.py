@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Проверка живого режима: VAD, буфер с абсолютной нумерацией и события сессии
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from live import EnergyVAD, LiveSession, RollingBuffer, latency_summary, read_pcm
+
+SAMPLE_RATE = 16000
+
+
+def make_signal(*parts):
+    """Склейка тишины (шум -70 dBFS) и тона (-20 dBFS): [("silence"|"tone", секунды)]"""
+    rng = np.random.default_rng(0)
+    chunks = []
+    for kind, duration in parts:
+        count = int(duration * SAMPLE_RATE)
+        noise = rng.normal(0, 10 ** (-70 / 20), count)
+        if kind == "tone":
+            noise += 0.1 * np.sin(2 * np.pi * 220 * np.arange(count) / SAMPLE_RATE)
+        chunks.append(noise)
+    return np.concatenate(chunks).astype(np.float32)
+
+
+class FakeProcessor:
+    """Вместо моделей: один сегмент на все аудио"""
+
+    def __init__(self):
+        self.windows = []
+
+    def transcribe(self, audio):
+        return {"segments": [{"start": 0.0, "end": audio.duration, "text": " слово "}]}
+
+    def analyze_window(self, audio, registry, diarization_params, **kwargs):
+        self.windows.append((audio.offset, audio.offset + audio.duration))
+        return [{"start": audio.offset, "end": audio.offset + audio.duration,
+                 "text": "фраза", "speaker": "Спикер 1"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_session(signal, chunk=0.1, processing_delay=0.05, **options):
+    """Подача сигнала блоками в темпе реального времени с задержкой моделей"""
+    clock = FakeClock()
+    session = LiveSession(FakeProcessor(), clock=clock, **options)
+    events = []
+    step = int(chunk * SAMPLE_RATE)
+    for position in range(0, len(signal), step):
+        clock.now = (position + step) / SAMPLE_RATE
+        session.feed(signal[position:position + step])
+        clock.now += processing_delay
+        events.extend(session.events())
+    events.extend(session.flush())
+    return session, events
+
+
+def test_vad_detects_tone_after_silence():
+    vad = EnergyVAD(SAMPLE_RATE)
+    frames = vad.process(make_signal(("silence", 1.0), ("tone", 0.5), ("silence", 0.5)))
+    speech = [end / SAMPLE_RATE for end, is_speech in frames if is_speech]
+    assert speech and 1.0 <= speech[0] <= 1.04 and speech[-1] <= 1.52
+
+
+def test_vad_frames_span_blocks():
+    signal = make_signal(("silence", 0.5), ("tone", 0.5))
+    whole = EnergyVAD(SAMPLE_RATE).process(signal)
+    vad = EnergyVAD(SAMPLE_RATE)
+    pieces = []
+    for position in range(0, len(signal), 1001):
+        pieces.extend(vad.process(signal[position:position + 1001]))
+    assert pieces == whole
+
+
+def test_rolling_buffer_keeps_absolute_positions():
+    buffer = RollingBuffer(capacity=10)
+    buffer.append(np.arange(8, dtype=np.float32))
+    buffer.discard_before(5)
+    buffer.append(np.arange(8, 20, dtype=np.float32))
+    assert (buffer.start, buffer.end) == (5, 20)
+    assert buffer.slice(6, 9).tolist() == [6, 7, 8]
+    assert buffer.slice(0, 7).tolist() == [5, 6]
+
+
+def test_session_emits_partial_then_final():
+    signal = make_signal(("silence", 1.0), ("tone", 3.0), ("silence", 1.5))
+    session, events = run_session(signal, partial_interval=1.0)
+
+    kinds = [event["type"] for event in events]
+    assert "partial" in kinds and kinds[-1] == "final"
+    assert kinds.index("partial") < kinds.index("final")
+    assert all(event["text"] == "слово" for event in events if event["type"] == "partial")
+
+    final = events[-1]
+    assert final["speaker"] == "Спикер 1"
+    assert 0.6 <= final["start"] <= 1.0 and 4.0 <= final["end"] <= 4.4
+    # Реплика закрывается после паузы 0.6 с, а сегмент кончается через 0.3 с после речи:
+    # задержка = пауза - запас + обработка
+    assert 0.3 <= final["latency"] <= 0.5
+
+
+def test_long_speech_is_cut_at_max_utterance():
+    signal = make_signal(("silence", 0.5), ("tone", 7.0), ("silence", 1.0))
+    session, events = run_session(signal, max_utterance=3.0, partial_interval=0)
+
+    assert [event["type"] for event in events] == ["final"] * 3
+    # Граница реплики - конец кадра VAD (30 мс)
+    assert all(end - start <= 3.0 + 0.03 for start, end in session.processor.windows)
+    # Отрезки идут встык, без потерь аудио
+    for (_, previous_end), (start, _) in zip(session.processor.windows, session.processor.windows[1:]):
+        assert abs(start - previous_end) < 1e-9
+    # Отрезанные по длине реплики выдаются без ожидания паузы
+    assert max(session.latencies[:2]) < 0.1
+
+
+def test_buffer_stays_bounded_in_silence():
+    signal = make_signal(("silence", 20.0))
+    session, events = run_session(signal)
+    assert events == []
+    assert session.buffer.length <= int(0.4 * SAMPLE_RATE)
+
+
+def test_read_pcm_handles_odd_bytes():
+    samples = np.array([0, 16384, -32768, 32767], dtype="<i2")
+
+    class Trickle(io.RawIOBase):
+        """Поток, отдающий по 3 байта (разрыв посреди отсчета)"""
+        def __init__(self, data):
+            self.data = data
+
+        def read(self, size=-1):
+            chunk, self.data = self.data[:3], self.data[3:]
+            return chunk
+
+    decoded = np.concatenate(list(read_pcm(Trickle(samples.tobytes()))))
+    assert decoded.tolist() == [0.0, 0.5, -1.0, 32767 / 32768]
+
+
+def test_latency_summary():
+    summary = latency_summary([0.1 * i for i in range(1, 21)])
+    assert summary["count"] == 20 and abs(summary["p50"] - 1.05) < 1e-9
+    assert abs(summary["p95"] - 1.905) < 1e-9 and summary["max"] == 2.0
+    assert latency_summary([])["p95"] is None
+
+
+def main():
+    print("🧪 Проверка живого режима")
+    for test in (test_vad_detects_tone_after_silence, test_vad_frames_span_blocks,
+                 test_rolling_buffer_keeps_absolute_positions, test_session_emits_partial_then_final,
+                 test_long_speech_is_cut_at_max_utterance, test_buffer_stays_bounded_in_silence,
+                 test_read_pcm_handles_odd_bytes, test_latency_summary):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Проверка загрузки моделей: Whisper и диаризация одновременно, замер шагов с неудачными попытками
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import AudioProcessor
+from stubs import StubProcessor
+
+LOAD_DELAY = 0.3
+
+
+class SlowLoadingProcessor(AudioProcessor):
+    """Вместо моделей: задержки загрузки и одна неудачная попытка pyannote"""
+
+    def __init__(self, parallel_load: bool, whisper_error: bool = False):
+        self.load_diarization = True
+        self.parallel_load = parallel_load
+        self.whisper_error = whisper_error
+
+    def _load_whisper(self):
+        with self._load_step("Whisper (base)"):
+            time.sleep(LOAD_DELAY)
+            if self.whisper_error:
+                raise OSError("нет файла модели")
+
+    def _load_diarization(self):
+        try:
+            with self._load_step("pyannote: кеш"):
+                raise RuntimeError("нет в кеше")
+        except RuntimeError:
+            pass
+        with self._load_step("pyannote: HuggingFace"):
+            time.sleep(LOAD_DELAY)
+            self.diarization_pipeline = "pipeline"
+
+
+def test_parallel_load_takes_slowest_model():
+    processor = SlowLoadingProcessor(parallel_load=True)
+    processor._load_models()
+    assert processor.load_time < 1.5 * LOAD_DELAY
+    assert processor.diarization_pipeline == "pipeline"
+
+    steps = {step["step"]: step for step in processor.load_timings}
+    assert set(steps) == {"Whisper (base)", "pyannote: кеш", "pyannote: HuggingFace"}
+    assert steps["pyannote: кеш"]["status"] == "failed"
+    assert steps["pyannote: кеш"]["error"] == "RuntimeError: нет в кеше"
+    assert steps["pyannote: HuggingFace"]["seconds"] >= LOAD_DELAY
+
+
+def test_sequential_load_sums_models():
+    processor = SlowLoadingProcessor(parallel_load=False)
+    processor._load_models()
+    assert processor.load_time >= 2 * LOAD_DELAY
+
+
+def test_whisper_error_propagates():
+    processor = SlowLoadingProcessor(parallel_load=True, whisper_error=True)
+    try:
+        processor._load_models()
+        raise AssertionError("ожидалась ошибка загрузки Whisper")
+    except OSError:
+        pass
+    assert any(step["step"] == "Whisper (base)" and step["status"] == "failed"
+               for step in processor.load_timings)
+
+
+def test_quantize_only_on_cpu():
+    processor = StubProcessor(quantize="int8")
+    parameter = SimpleNamespace(device=SimpleNamespace(type="cuda"))
+    processor.whisper_model = SimpleNamespace(parameters=lambda: iter([parameter]))
+    processor._quantize_whisper()
+    assert processor.quantize is None
+
+    # Квантованная модель отделяется от обычной в ключах кеша этапов
+    with tempfile.TemporaryDirectory() as directory:
+        assert "quantize" not in StubProcessor(custom_whisper_model=directory)._whisper_model_identity()
+        quantized = StubProcessor(custom_whisper_model=directory, quantize="int8")
+        assert quantized._whisper_model_identity()["quantize"] == "int8"
+
+
+def test_package_variant_in_cache_identity():
+    with tempfile.TemporaryDirectory() as directory:
+        processor = StubProcessor(custom_whisper_model=directory)
+        # Варианты весов одного оптимизированного пакета не делят кеш этапов
+        processor.whisper_variant = "fp16"
+        fp16 = processor._whisper_model_identity()
+        processor.whisper_variant = "fp32"
+        assert fp16["variant"] == "fp16" and fp16 != processor._whisper_model_identity()
+
+
+def main():
+    print("🧪 Проверка загрузки моделей")
+    for test in (test_parallel_load_takes_slowest_model, test_sequential_load_sums_models,
+                 test_whisper_error_propagates, test_quantize_only_on_cpu,
+                 test_package_variant_in_cache_identity):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Проверка реестра разрешенных моделей и строгого офлайн-режима
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from model_registry import (FORMAT_PYANNOTE, FORMAT_WHISPER, OFFLINE_VARIABLES, ModelRegistry,
+                            enable_offline_mode, pyannote_key, registry_path, whisper_key)
+
+
+def test_record_and_get_resolved_path():
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Path(directory) / "large-v3.pt"
+        checkpoint.write_bytes(b"weights")
+        registry = ModelRegistry(registry_path(directory))
+
+        registry.record(whisper_key("large"), checkpoint, FORMAT_WHISPER, model="large")
+        entry = ModelRegistry(registry_path(directory)).get(whisper_key("large"))
+        assert entry["path"] == str(checkpoint.resolve()) and entry["format"] == FORMAT_WHISPER
+        assert entry["size"] == 7 and entry["model"] == "large"
+        assert registry.get(whisper_key("base")) is None
+
+
+def test_changed_or_missing_file_invalidates_entry():
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = Path(directory) / "base.pt"
+        checkpoint.write_bytes(b"weights")
+        registry = ModelRegistry(Path(directory) / "registry.json")
+        registry.record(whisper_key("base"), checkpoint, FORMAT_WHISPER)
+
+        checkpoint.write_bytes(b"other weights")
+        assert registry.get(whisper_key("base")) is None
+
+        registry.record(whisper_key("base"), checkpoint, FORMAT_WHISPER)
+        assert registry.get(whisper_key("base")) is not None
+        checkpoint.unlink()
+        assert registry.get(whisper_key("base")) is None
+
+
+def test_directories_and_forget():
+    with tempfile.TemporaryDirectory() as directory:
+        pipeline_dir = Path(directory) / "speaker-diarization-3.1"
+        pipeline_dir.mkdir()
+        registry = ModelRegistry(Path(directory) / "registry.json")
+        key = pyannote_key("pyannote/speaker-diarization-3.1")
+
+        registry.record(key, pipeline_dir, FORMAT_PYANNOTE, source="local", use_token=False)
+        assert registry.get(key)["source"] == "local" and "size" not in registry.get(key)
+
+        registry.forget(key)
+        assert registry.get(key) is None
+
+
+def test_other_version_is_ignored():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "registry.json"
+        path.write_text(json.dumps({"version": 0, "models": {"whisper/base": {"path": directory}}}))
+        assert ModelRegistry(path).get("whisper/base") is None
+
+        path.write_text("{поврежден")
+        assert ModelRegistry(path).get("whisper/base") is None
+
+
+def test_offline_mode_sets_hub_variables():
+    saved = {variable: os.environ.get(variable) for variable in OFFLINE_VARIABLES}
+    try:
+        enable_offline_mode()
+        assert all(os.environ[variable] == "1" for variable in OFFLINE_VARIABLES)
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def main():
+    print("🧪 Проверка реестра моделей")
+    for test in (test_record_and_get_resolved_path, test_changed_or_missing_file_invalidates_entry,
+                 test_directories_and_forget, test_other_version_is_ignored,
+                 test_offline_mode_sets_hub_variables):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Проверка оптимизированных пакетов моделей: манифест, выбор варианта, раскладка safetensors,
+отображение весов, int8-квантование весов и слоев Linear, загрузка крошечного пакета Whisper
+(проверки с моделями - при наличии torch)
+"""
+
+import json
+import struct
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from optimized_models import (INT8_SCALE_SUFFIX, MANIFEST_NAME, PACKAGE_FORMAT, PACKAGE_VERSION,
+                              PRIMARY_WEIGHTS, choose_variant, dequantize_int8, is_optimized_package,
+                              load_optimized_whisper, mmap_state_dict, optimize_model, parse_variants,
+                              quantize_int8, quantize_linear_int8, read_manifest, safetensors_layout, variant_files)
+
+
+def write_safetensors(path: Path, tensors: dict):
+    """Минимальная запись safetensors: заголовок выравнивается до 8 байт, как в safetensors"""
+    dtypes = {np.float32: "F32", np.float16: "F16", np.int8: "I8"}
+    header = {"__metadata__": {"format": "pt"}}
+    data = b""
+    for name, array in tensors.items():
+        raw = array.tobytes()
+        header[name] = {"dtype": dtypes[array.dtype.type], "shape": list(array.shape),
+                        "data_offsets": [len(data), len(data) + len(raw)]}
+        data += raw
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (-len(encoded) % 8)
+    path.write_bytes(struct.pack("<Q", len(encoded)) + encoded + data)
+
+
+def write_manifest(directory: Path, variants: dict, **fields):
+    manifest = {"format": PACKAGE_FORMAT, "version": PACKAGE_VERSION, "variants": variants, **fields}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest))
+
+
+def test_safetensors_layout_points_at_tensor_bytes():
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "model.safetensors"
+        weight = np.arange(12, dtype=np.float32).reshape(3, 4)
+        quantized = np.array([[-127, 0, 127]], dtype=np.int8)
+        write_safetensors(path, {"fc.weight": weight, "fc.q": quantized})
+
+        data_start, layout = safetensors_layout(path)
+        assert data_start % 8 == 0
+        assert layout["fc.weight"][:2] == ("float32", (3, 4))
+        assert layout["fc.q"][:2] == ("int8", (1, 3))
+
+        raw = path.read_bytes()
+        _, _, begin, end = layout["fc.weight"]
+        restored = np.frombuffer(raw[data_start + begin:data_start + end], dtype=np.float32)
+        assert np.array_equal(restored.reshape(3, 4), weight)
+
+
+def test_manifest_validation():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        assert not is_optimized_package(directory)
+
+        write_manifest(directory, {"bf16": {"file": PRIMARY_WEIGHTS, "dtype": "bfloat16"}})
+        assert is_optimized_package(directory)
+        assert read_manifest(directory)["variants"]["bf16"]["file"] == PRIMARY_WEIGHTS
+
+        (directory / MANIFEST_NAME).write_text(json.dumps({"format": "other", "version": 1}))
+        assert not is_optimized_package(directory)
+
+        write_manifest(directory, {})
+        try:
+            read_manifest(directory)
+            raise AssertionError("пакет без вариантов должен отклоняться")
+        except ValueError:
+            pass
+
+
+def test_choose_variant_by_device():
+    manifest = {"variants": {"bf16": {}, "fp16": {}, "int8": {}}}
+    assert choose_variant(manifest, "cuda") == "fp16"
+    assert choose_variant(manifest, "cpu") == "bf16"
+    assert choose_variant(manifest, "cpu", "int8") == "int8"
+    assert choose_variant({"variants": {"int8": {}}}, "cuda") == "int8"
+    try:
+        choose_variant(manifest, "cpu", "fp32")
+        raise AssertionError("отсутствующий вариант должен отклоняться")
+    except ValueError:
+        pass
+
+
+def test_variant_files_keep_transformers_layout():
+    assert parse_variants("int8, FP16,fp16,bf16") == ("int8", "fp16", "bf16")
+    files = variant_files(("int8", "fp16", "bf16"))
+    # Первый вариант с плавающей точкой - model.safetensors для from_pretrained
+    assert files == {"int8": "model.int8.safetensors", "fp16": PRIMARY_WEIGHTS,
+                     "bf16": "model.bf16.safetensors"}
+    for spec in ("fp8", ","):
+        try:
+            parse_variants(spec)
+            raise AssertionError(f"вариант {spec!r} должен отклоняться")
+        except ValueError:
+            pass
+
+
+def test_mmap_state_dict_maps_file():
+    torch = pytest.importorskip("torch")
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "model.safetensors"
+        tensors = {"fc.weight": np.arange(12, dtype=np.float32).reshape(3, 4),
+                   "fc.bias": np.array([0.5, -1.5, 2.0], dtype=np.float16),
+                   "fc.q": np.array([[-127, 0, 127]], dtype=np.int8),
+                   "empty": np.zeros((0, 4), dtype=np.float32)}
+        write_safetensors(path, tensors)
+        raw = path.read_bytes()
+
+        state = mmap_state_dict(path)
+        assert set(state) == set(tensors)
+        for name, array in tensors.items():
+            assert state[name].dtype == getattr(torch, array.dtype.name), name
+            assert tuple(state[name].shape) == array.shape, name
+            assert np.array_equal(state[name].numpy(), array), name
+
+        # Отображение с копированием при записи: изменение тензора не трогает файл
+        state["fc.weight"].zero_()
+        assert path.read_bytes() == raw
+
+
+def test_int8_round_trip_within_half_scale():
+    torch = pytest.importorskip("torch")
+    generator = torch.Generator().manual_seed(0)
+    weight = torch.randn(16, 33, generator=generator) * torch.logspace(-3, 2, 16)[:, None]
+    weight[3] = 0.0
+    bias = torch.randn(16, generator=generator)
+
+    quantized, scale = quantize_int8(weight)
+    assert quantized.dtype == torch.int8 and scale.dtype == torch.float32
+    assert quantized.shape == weight.shape and scale.shape == (16,)
+    assert int(quantized.abs().max()) == 127
+
+    restored = dequantize_int8({"fc.weight": quantized, "fc.weight" + INT8_SCALE_SUFFIX: scale,
+                                "fc.bias": bias}, torch.float32)
+    # Масштабы не попадают в состояние, тензоры без масштаба только приводятся к типу
+    assert set(restored) == {"fc.weight", "fc.bias"} and torch.equal(restored["fc.bias"], bias)
+    error = (restored["fc.weight"] - weight).abs().amax(dim=1)
+    assert bool((error <= scale / 2 * (1 + 1e-5)).all()), (error / scale).max()
+    assert float(restored["fc.weight"][3].abs().max()) == 0.0
+
+
+def save_tiny_whisper(directory: Path):
+    """Крошечная случайная модель Whisper с процессором в формате save_pretrained (без сети)"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import (WhisperConfig, WhisperFeatureExtractor, WhisperForConditionalGeneration,
+                              WhisperTokenizerFast)
+
+    # Байтовый BPE без слияний: каждый байт - отдельный токен
+    vocab = {char: index for index, char in enumerate(sorted(pre_tokenizers.ByteLevel.alphabet()))}
+    vocab["<|endoftext|>"] = len(vocab)
+    bpe = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    tokenizer = WhisperTokenizerFast(tokenizer_object=bpe)
+
+    special = vocab["<|endoftext|>"]
+    config = WhisperConfig(vocab_size=len(vocab), d_model=16, encoder_layers=1, decoder_layers=1,
+                           encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=32,
+                           decoder_ffn_dim=32, num_mel_bins=8, max_source_positions=8,
+                           max_target_positions=8, pad_token_id=special, bos_token_id=special,
+                           eos_token_id=special, decoder_start_token_id=special)
+    torch.manual_seed(0)
+    model = WhisperForConditionalGeneration(config).eval()
+    model.save_pretrained(directory)
+    tokenizer.save_pretrained(directory)
+    WhisperFeatureExtractor(feature_size=8).save_pretrained(directory)
+    return model
+
+
+def test_tiny_package_loads_without_meta_tensors():
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        original = save_tiny_whisper(directory / "source")
+        manifest = optimize_model(str(directory / "source"), directory / "package", variants=("fp32", "int8"))
+        assert is_optimized_package(directory / "package")
+        assert manifest["variants"]["int8"]["quantized"] > 0
+
+        features = torch.randn(1, 8, 16, generator=torch.Generator().manual_seed(1))
+        decoder_ids = torch.tensor([[original.config.decoder_start_token_id, 3, 7]])
+        with torch.no_grad():
+            expected = original(input_features=features, decoder_input_ids=decoder_ids).logits
+
+        for variant, tolerance in (("fp32", 0.0), ("int8", 0.05)):
+            model, processor, dtype, chosen = load_optimized_whisper(directory / "package", variant=variant)
+            assert chosen == variant and dtype == torch.float32
+            meta = [name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+                    if tensor.is_meta]
+            assert not meta, (variant, meta)
+            # Связанные веса восстанавливаются после загрузки
+            assert model.proj_out.weight is model.model.decoder.embed_tokens.weight
+            ids = processor.tokenizer("Привет").input_ids
+            assert processor.tokenizer.decode(ids, skip_special_tokens=True) == "Привет"
+
+            with torch.no_grad():
+                logits = model(input_features=features, decoder_input_ids=decoder_ids).logits
+            assert float((logits - expected).abs().max()) <= tolerance, variant
+
+
+def test_quantize_linear_int8_replaces_linear_layers():
+    torch = pytest.importorskip("torch")
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    class CastingLinear(torch.nn.Linear):
+        """Как whisper.model.Linear: веса приводятся к типу входа"""
+
+        def forward(self, x):
+            return torch.nn.functional.linear(x, self.weight.to(x.dtype), self.bias.to(x.dtype))
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(
+        torch.nn.Linear(64, 128), torch.nn.GELU(),
+        torch.nn.Sequential(CastingLinear(128, 128), torch.nn.LayerNorm(128)),
+        CastingLinear(128, 32),
+    ).eval()
+    inputs = torch.randn(8, 64)
+    with torch.no_grad():
+        expected = model(inputs)
+
+    # Веса bf16 (вариант пакета) переводятся в float32 перед квантованием
+    model.to(torch.bfloat16)
+    assert quantize_linear_int8(model) == 3
+    assert all(type(layer) is DynamicLinear for layer in (model[0], model[2][0], model[3]))
+    assert type(model[2][1]) is torch.nn.LayerNorm and model[2][1].weight.dtype == torch.float32
+
+    with torch.no_grad():
+        actual = model(inputs)
+    error = float((actual - expected).abs().max() / expected.abs().max())
+    assert error < 0.05, error
+
+
+def main():
+    print("🧪 Проверка оптимизированных пакетов моделей")
+    for test in (test_safetensors_layout_points_at_tensor_bytes, test_manifest_validation,
+                 test_choose_variant_by_device, test_variant_files_keep_transformers_layout,
+                 test_mmap_state_dict_maps_file, test_int8_round_trip_within_half_scale,
+                 test_tiny_package_loads_without_meta_tensors,
+                 test_quantize_linear_int8_replaces_linear_layers):
+        try:
+            test()
+        except pytest.skip.Exception as e:
+            print(f"⏭️  {test.__name__}: {e}")
+            continue
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Проверка параллельной транскрипции: план фрагментов с перекрытием и склейка без дублей
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import AudioData
+from parallel import plan_parallel_chunks, stitch_chunks
+
+SAMPLE_RATE = 16000
+
+
+def segment(start, end, text, **extra):
+    return dict({"start": start, "end": end, "text": text}, **extra)
+
+
+def test_plan_cores_cover_audio_and_windows_overlap():
+    rng = np.random.default_rng(0)
+    audio = AudioData((0.1 * rng.standard_normal(100 * SAMPLE_RATE)).astype(np.float32), SAMPLE_RATE)
+    chunks = plan_parallel_chunks(audio, workers=2, chunk_duration=30.0, overlap=1.0)
+
+    assert len(chunks) == 3
+    assert chunks[0][2] == 0.0 and chunks[-1][3] == 100.0
+    assert all(previous[3] == current[2] for previous, current in zip(chunks, chunks[1:]))
+    for window_start, window_end, core_start, core_end in chunks:
+        assert window_start == max(0.0, core_start - 1.0)
+        assert window_end == min(100.0, core_end + 1.0)
+
+
+def test_plan_auto_duration_balances_workers():
+    rng = np.random.default_rng(1)
+    audio = AudioData((0.1 * rng.standard_normal(600 * SAMPLE_RATE)).astype(np.float32), SAMPLE_RATE)
+    # 600 с на 4 процесса: около двух фрагментов по 75 с на процесс (границы сдвигаются в паузы)
+    assert len(plan_parallel_chunks(audio, workers=4)) in (8, 9)
+    # Короткий файл не режется мельче MIN_AUTO_CHUNK
+    short = AudioData(np.zeros(30 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+    assert len(plan_parallel_chunks(short, workers=8)) == 1
+
+
+def test_stitch_keeps_segment_by_midpoint():
+    stitched = stitch_chunks([
+        # Окно 0-31 с, зона 0-30 с: сегмент 29.5-30.8 (середина 30.15) принадлежит следующему
+        (0.0, (0.0, 30.0), {"language": "ru", "segments": [
+            segment(1.0, 5.0, " Первая."), segment(29.5, 30.8, " Стык."),
+        ]}),
+        # Окно 29-61 с: стык видит и второй фрагмент, а последний сегмент
+        # (59.5-60.5, середина 60.0) принадлежит уже третьему
+        (29.0, (30.0, 60.0), {"language": "ru", "segments": [
+            segment(0.5, 1.8, " Стык."), segment(30.5, 31.5, " Чужая."),
+        ]}),
+    ])
+    assert stitched["text"] == "Первая. Стык."
+    assert [(s["id"], s["start"], s["end"]) for s in stitched["segments"]] == [(0, 1.0, 5.0), (1, 29.5, 30.8)]
+    assert stitched["language"] == "ru"
+
+
+def test_stitch_drops_duplicate_across_boundary():
+    stitched = stitch_chunks([
+        (0.0, (0.0, 30.0), {"segments": [segment(27.0, 29.9, " Длинная фраза.")]}),
+        # Та же фраза, распознанная вторым фрагментом чуть позже: середина в его зоне,
+        # но больше половины перекрыто предыдущим сегментом
+        (29.0, (30.0, 60.0), {"segments": [
+            segment(0.0, 1.2, " фраза."), segment(2.0, 4.0, " Новая."),
+        ]}),
+    ])
+    assert [s["text"] for s in stitched["segments"]] == [" Длинная фраза.", " Новая."]
+    assert stitched["language"] == "unknown"
+
+
+def test_stitch_shifts_words():
+    stitched = stitch_chunks([
+        (59.0, (60.0, 90.0), {"segments": [segment(2.0, 3.0, " Слово.", words=[
+            {"word": " Слово.", "start": 2.0, "end": 3.0}
+        ])]}),
+    ])
+    word = stitched["segments"][0]["words"][0]
+    assert (word["start"], word["end"]) == (61.0, 62.0)
+
+
+def main():
+    print("🧪 Проверка параллельной транскрипции")
+    for test in (test_plan_cores_cover_audio_and_windows_overlap, test_plan_auto_duration_balances_workers,
+                 test_stitch_keeps_segment_by_midpoint, test_stitch_drops_duplicate_across_boundary,
+                 test_stitch_shifts_words):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Проверка одновременного запуска транскрипции и диаризации (--parallel-stages)
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_io import AudioData
+from stubs import StubProcessor
+
+SAMPLE_RATE = 16000
+
+
+class BarrierProcessor(StubProcessor):
+    """
+    Процессор без моделей: этапы ждут друг друга на барьере
+
+    При последовательном запуске барьер не пройти, поэтому успешное завершение
+    означает, что этапы выполнялись одновременно.
+    """
+
+    def __init__(self, parties: int = 2):
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=10)
+        self.threads = {}
+        self.audio = {}
+
+    def _wait(self, stage, audio):
+        import torch
+
+        self.threads[stage] = torch.get_num_threads()
+        self.audio[stage] = audio
+        self.barrier.wait()
+
+    def _transcribe_with_standard_model(self, audio):
+        self._wait("transcription", audio)
+        return super()._transcribe_with_standard_model(audio)
+
+    def _diarization_turns(self, audio, diarization_params, checkpoint=None):
+        self._wait("diarization", audio)
+        return super()._diarization_turns(audio, diarization_params, checkpoint)
+
+
+def test_stages_run_concurrently_on_shared_audio():
+    torch = pytest.importorskip("torch")
+    total_threads = torch.get_num_threads()
+    audio = AudioData(np.zeros(3 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE, offset=1.0)
+
+    processor = BarrierProcessor()
+    result, stages = processor.analyze(audio, "call.wav", parallel_stages=True)
+
+    assert processor.audio["transcription"] is processor.audio["diarization"] is audio
+    assert result["parallel_stages"] and result["has_speaker_diarization"]
+    assert result["segments"] == [{"start": 1.5, "end": 2.5, "text": "Привет.", "speaker": "Спикер 1"}]
+    assert stages["offset"] == 1.0
+    # Бюджет потоков делится между этапами (Whisper - большая половина) и восстанавливается
+    assert max(processor.threads.values()) <= max(1, (total_threads + 1) // 2)
+    assert torch.get_num_threads() == total_threads
+
+
+def test_parallel_result_matches_sequential():
+    torch = pytest.importorskip("torch")
+    total_threads = torch.get_num_threads()
+    audio = AudioData(np.zeros(3 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+
+    parallel, _ = BarrierProcessor().analyze(audio, "call.wav", parallel_stages=True)
+    sequential, _ = BarrierProcessor(parties=1).analyze(audio, "call.wav")
+
+    ignored = {"parallel_stages", "transcription_time", "diarization_time", "total_time"}
+    assert {k: v for k, v in parallel.items() if k not in ignored} == \
+        {k: v for k, v in sequential.items() if k not in ignored}
+    assert torch.get_num_threads() == total_threads
+
+
+def main():
+    print("🧪 Проверка параллельных этапов")
+    for test in (test_stages_run_concurrently_on_shared_audio, test_parallel_result_matches_sequential):
+        try:
+            test()
+        except pytest.skip.Exception as e:
+            print(f"⏭️  {test.__name__}: {e}")
+            continue
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Проверка команды realign: повторное совмещение по *_stages.json без загрузки моделей
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from click.testing import CliRunner
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from main import cli
+from stubs import StubProcessor
+
+SAMPLE_RATE = 16000
+
+
+class TwoSpeakerProcessor(StubProcessor):
+    """Процессор без моделей: фиксированные сырые выходы транскрипции и диаризации"""
+
+    def transcribe(self, audio, time_limit=None):
+        return {"text": " Один. Два.", "language": "ru",
+                "segments": [{"start": 0.5, "end": 1.5, "text": " Один."},
+                             {"start": 3.2, "end": 3.8, "text": " Два."}]}
+
+    def _diarization_turns(self, audio, diarization_params, checkpoint=None):
+        return [{"start": 0.0, "end": 3.0, "speaker": "SPEAKER_00"},
+                {"start": 3.0, "end": 4.0, "speaker": "SPEAKER_01"}]
+
+
+def run_processed(directory: Path) -> Path:
+    """Обработка окна со 2-й секунды; возвращает путь к *_result.json"""
+    path = directory / "call.wav"
+    sf.write(path, np.zeros(10 * SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE)
+    TwoSpeakerProcessor().process(str(path), output_dir=str(directory), start=2.0)
+    return directory / "call_result.json"
+
+
+def realign(*args: str):
+    outcome = CliRunner().invoke(cli, ["realign", *args])
+    assert outcome.exit_code == 0, outcome.output
+    return outcome
+
+
+def load_segments(path: Path) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["segments"]
+
+
+def test_realign_reproduces_result():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        result_path = run_processed(directory)
+        original = load_segments(result_path)
+        assert [s["speaker"] for s in original] == ["Спикер 1", "Спикер 2"]
+
+        realign(str(result_path), "-o", str(directory / "again"))
+        # Смещение окна сохраняется в stages.json, сегменты остаются в координатах файла
+        assert load_segments(directory / "again" / "call_result.json") == original
+        assert {p.name for p in (directory / "again").iterdir()} == {
+            "call_result.json", "call_segments.csv", "call_transcript.txt"}
+
+
+def test_realign_applies_new_parameters():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        result_path = run_processed(directory)
+
+        # Реплика второго спикера (1 с) короче нового минимума - остается один спикер
+        realign(str(result_path), "-o", str(directory / "filtered"), "--min-segment", "1.5")
+        segments = load_segments(directory / "filtered" / "call_result.json")
+        assert [(s["start"], s["speaker"]) for s in segments] == [(2.5, "Спикер 1"), (5.2, "Спикер 1")]
+
+        with open(directory / "filtered" / "call_result.json", "r", encoding="utf-8") as f:
+            assert json.load(f)["diarization_stats"]["unique_speakers"] == 1
+
+
+def test_realign_without_stages_only_exports():
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        result_path = run_processed(directory)
+        (directory / "call_stages.json").unlink()
+
+        outcome = realign(str(result_path), "-o", str(directory / "export"), "--min-segment", "1.5")
+        assert "только повторный экспорт" in outcome.output
+        assert load_segments(directory / "export" / "call_result.json") == load_segments(result_path)
+
+
+def main():
+    print("🧪 Проверка команды realign")
+    for test in (test_realign_reproduces_result, test_realign_applies_new_parameters,
+                 test_realign_without_stages_only_exports):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
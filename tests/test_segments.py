@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Проверка колоночной таблицы сегментов против исходной обработки списков словарей
+"""
+
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from postprocessing import SegmentPostProcessor
+from segments import UNKNOWN_ID, SegmentTable, SpeakerIndex
+
+
+def reference_postprocess(raw_turns, min_segment_duration, gap_threshold):
+    """Исходная фильтрация, объединение и переименование на словарях"""
+    speakers = [
+        {"start": t["start"], "end": t["end"], "speaker": t["speaker"], "duration": t["end"] - t["start"]}
+        for t in raw_turns if t["end"] - t["start"] >= min_segment_duration
+    ]
+    if not speakers:
+        return speakers
+
+    speakers = sorted(speakers, key=lambda x: x["start"])
+    merged = [speakers[0]]
+    for current in speakers[1:]:
+        last = merged[-1]
+        if current["speaker"] == last["speaker"] and current["start"] - last["end"] <= gap_threshold:
+            merged[-1] = {"start": last["start"], "end": current["end"], "speaker": last["speaker"],
+                          "duration": current["end"] - last["start"]}
+        else:
+            merged.append(current)
+
+    unique_speakers = []
+    for segment in merged:
+        if segment["speaker"] not in unique_speakers:
+            unique_speakers.append(segment["speaker"])
+    for segment in merged:
+        segment["speaker"] = f"Спикер {unique_speakers.index(segment['speaker']) + 1}"
+    return merged
+
+
+def make_turns(seed: int):
+    rng = random.Random(seed)
+    turns = []
+    for _ in range(rng.randint(0, 200)):
+        start = round(rng.uniform(0, 300), 2)
+        turns.append({"start": start, "end": round(start + rng.uniform(0.05, 8.0), 2),
+                      "speaker": f"SPEAKER_{rng.randint(0, 3):02d}"})
+    return turns
+
+
+def test_postprocess_matches_reference():
+    processor = SegmentPostProcessor()
+    for seed in range(100):
+        turns = make_turns(seed)
+        for min_segment, gap in ((0.5, 0.3), (0.0, 1.0), (2.0, 0.0)):
+            result = processor._postprocess_diarization(turns, min_segment_duration=min_segment, merge_gap=gap)
+            expected = reference_postprocess(turns, min_segment, gap)
+            assert result["speakers"].to_records(with_duration=True) == expected, (seed, min_segment, gap)
+            assert result["stats"]["segments_after_filter"] == len(expected)
+
+
+def test_speaker_index_interning():
+    speakers = SpeakerIndex()
+    assert speakers.intern("A") == 0
+    assert speakers.intern("B") == 1
+    assert speakers.intern("A") == 0
+    assert speakers.intern("Unknown") == UNKNOWN_ID
+    assert speakers.name(UNKNOWN_ID) == "Unknown"
+
+
+def test_records_roundtrip_and_shift():
+    records = [{"start": 0.5, "end": 1.5, "text": " привет ", "speaker": "A"},
+               {"start": 2.0, "end": 3.0, "text": "мир", "speaker": "Unknown"}]
+    table = SegmentTable.from_records(records, with_text=True)
+    assert table.shifted(10.0).to_records() == [
+        {"start": 10.5, "end": 11.5, "text": "привет", "speaker": "A"},
+        {"start": 12.0, "end": 13.0, "text": "мир", "speaker": "Unknown"},
+    ]
+
+
+def main():
+    print("🧪 Проверка таблицы сегментов")
+    for test in (test_postprocess_matches_reference, test_speaker_index_interning,
+                 test_records_roundtrip_and_shift):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
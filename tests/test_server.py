@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Проверка сервера инференса: готовность после прогрева, задачи и результаты через HTTP API
+"""
+
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import InferenceService, make_server
+from stubs import StubProcessor as BaseStubProcessor
+
+SAMPLE_RATE = 16000
+
+
+class StubProcessor(BaseStubProcessor):
+    """Процессор без моделей: одна реплика, параметры диаризации запоминаются"""
+
+    def __init__(self):
+        super().__init__()
+        self.diarization_params = []
+
+    def _diarization_turns(self, audio, diarization_params, checkpoint=None):
+        self.diarization_params.append(diarization_params)
+        return super()._diarization_turns(audio, diarization_params, checkpoint)
+
+
+def wav_bytes(seconds: float = 2.0) -> bytes:
+    buffer = io.BytesIO()
+    sf.write(buffer, np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32), SAMPLE_RATE, format="WAV")
+    return buffer.getvalue()
+
+
+def request(url: str, body: bytes = None, headers: dict = None):
+    """(HTTP статус, JSON ответа)"""
+    req = urllib.request.Request(url, data=body, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("условие не выполнилось за отведенное время")
+        time.sleep(0.02)
+
+
+@contextmanager
+def running_server(service: InferenceService):
+    """Сервер на свободном порту в фоновом потоке; возвращает базовый URL"""
+    httpd = make_server(service, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    service.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_port}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        service.shutdown()
+
+
+def test_health_is_503_until_warmed_up():
+    loaded = threading.Event()
+    processors = []
+
+    def factory():
+        loaded.wait(10)
+        processors.append(StubProcessor())
+        return processors[-1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = InferenceService(factory, output_dir=directory)
+        with running_server(service) as url:
+            status, health = request(f"{url}/health")
+            assert status == 503 and health["status"] == "starting" and health["ready_instances"] == 0
+
+            loaded.set()
+            wait_for(lambda: request(f"{url}/health")[0] == 200)
+            status, health = request(f"{url}/ready")
+            assert status == 200 and health["status"] == "ready" and health["ready_instances"] == 1
+            # Прогрев прошел через все этапы на синтетическом аудио
+            assert len(processors[0].diarization_params) == 1
+
+
+def test_failed_warmup_reports_error():
+    def factory():
+        raise RuntimeError("нет модели")
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = InferenceService(factory, output_dir=directory)
+        with running_server(service) as url:
+            wait_for(lambda: request(f"{url}/health")[1]["status"] == "failed")
+            status, health = request(f"{url}/health")
+            assert status == 503 and health["error"] == "RuntimeError: нет модели"
+
+
+def test_uploaded_job_result():
+    processor = StubProcessor()
+    with tempfile.TemporaryDirectory() as directory:
+        service = InferenceService(lambda: processor, output_dir=directory,
+                                   default_options={"min_speakers": 1, "max_speakers": 10})
+        with running_server(service) as url:
+            wait_for(lambda: service.ready)
+            status, job = request(f"{url}/jobs?filename=call.wav&max_speakers=2", body=wav_bytes(),
+                                  headers={"Content-Type": "audio/wav"})
+            assert status == 202 and job["audio_file"].endswith("_call.wav")
+
+            job_url = f"{url}/jobs/{job['job_id']}"
+            wait_for(lambda: request(job_url)[1]["status"] == "done")
+            status, result = request(f"{job_url}/result")
+            assert status == 200
+            assert result["segments"] == [{"start": 0.5, "end": 1.5, "text": "Привет.", "speaker": "Спикер 1"}]
+            # Параметр из query string переопределяет значение сервера по умолчанию
+            assert processor.diarization_params[-1] == {"min_speakers": 1, "max_speakers": 2}
+            # Загруженный файл удаляется после обработки
+            assert not list(service.upload_dir.iterdir())
+
+            assert request(f"{url}/jobs/{'0' * 32}") == (404, {"error": "Задача не найдена"})
+            # Загрузка с неизвестным параметром отклоняется и не сохраняется
+            assert request(f"{url}/jobs?filename=a.wav&beam=5", body=b"x")[0] == 400
+            assert not list(service.upload_dir.iterdir())
+
+
+def test_results_are_served_from_disk_and_old_jobs_forgotten():
+    with tempfile.TemporaryDirectory() as directory:
+        service = InferenceService(StubProcessor, output_dir=directory, max_finished_jobs=1)
+        with running_server(service) as url:
+            wait_for(lambda: service.ready)
+            jobs = []
+            for _ in range(2):
+                status, job = request(f"{url}/jobs?filename=call.wav", body=wav_bytes())
+                assert status == 202
+                wait_for(lambda: request(f"{url}/jobs/{job['job_id']}")[1]["status"] == "done")
+                jobs.append(job)
+
+            first, second = jobs
+            # Первая задача забыта сервером, но ее файлы на диске остались
+            assert request(f"{url}/jobs/{first['job_id']}")[0] == 404
+            assert list(Path(first["output_dir"]).glob("*_result.json"))
+            assert list(service.jobs) == [second["job_id"]]
+
+            result_path = service.get(second["job_id"]).result_path
+            assert not hasattr(service.get(second["job_id"]), "result")
+            status, result = request(f"{url}/jobs/{second['job_id']}/result")
+            assert status == 200 and result == json.loads(result_path.read_text(encoding="utf-8"))
+
+            result_path.unlink()
+            assert request(f"{url}/jobs/{second['job_id']}/result")[0] == 404
+
+
+def test_audio_path_is_confined_to_input_root():
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        (root / "input" / "day1").mkdir(parents=True)
+        (root / "input" / "day1" / "call.wav").write_bytes(wav_bytes())
+        (root / "secret.wav").write_bytes(wav_bytes())
+        (root / "input" / "link.wav").symlink_to(root / "secret.wav")
+
+        def submit(url, audio_path):
+            body = json.dumps({"audio_path": audio_path, "max_speakers": 2}).encode("utf-8")
+            return request(f"{url}/jobs", body=body, headers={"Content-Type": "application/json"})
+
+        # Без --input-root задачи по пути не принимаются
+        closed = InferenceService(StubProcessor, output_dir=str(root / "closed"))
+        with running_server(closed) as url:
+            assert submit(url, str(root / "input" / "day1" / "call.wav"))[0] == 403
+
+        service = InferenceService(StubProcessor, output_dir=str(root / "out"), input_root=str(root / "input"))
+        with running_server(service) as url:
+            for outside in (str(root / "secret.wav"), "../secret.wav", "day1/../../secret.wav", "link.wav"):
+                status, error = submit(url, outside)
+                assert status == 403 and "--input-root" in error["error"], outside
+            status, error = submit(url, "day1/missing.wav")
+            assert status == 400 and error["error"] == "Аудиофайл не найден: day1/missing.wav"
+            # Тело - корректный JSON, но не объект: ответ 400, а не обрыв соединения
+            for body in (b"[1]", b'"x"', b"null", b"5"):
+                status, error = request(f"{url}/jobs", body=body, headers={"Content-Type": "application/json"})
+                assert status == 400 and "audio_path" in error["error"], body
+            status, error = request(f"{url}/jobs", body=b"{", headers={"Content-Type": "application/json"})
+            assert status == 400 and error["error"].startswith("Некорректный JSON")
+            assert request(f"{url}/health")[0] == 200
+
+            status, job = submit(url, "day1/call.wav")
+            assert status == 202 and job["audio_file"] == "call.wav"
+            status, job = submit(url, str(root / "input" / "day1" / "call.wav"))
+            assert status == 202
+            wait_for(lambda: request(f"{url}/jobs/{job['job_id']}")[1]["status"] == "done")
+            # Файл из input_root не удаляется после обработки (в отличие от загрузок)
+            assert (root / "input" / "day1" / "call.wav").exists()
+
+
+def main():
+    print("🧪 Проверка сервера инференса")
+    for test in (test_health_is_503_until_warmed_up, test_failed_warmup_reports_error,
+                 test_uploaded_job_result, test_results_are_served_from_disk_and_old_jobs_forgotten,
+                 test_audio_path_is_confined_to_input_root):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Бюджет времени старта CLI: --help и ошибки аргументов не загружают ML-стек
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from bench_startup import measure_startup
+
+# Суммарное время импортов для --help (мс); с запасом на медленные машины и CI.
+# До ленивых импортов только torch + whisper + pyannote занимали несколько секунд.
+IMPORT_TIME_BUDGET_MS = 400
+
+
+def check_startup(args):
+    run = measure_startup(args)
+    assert not run["heavy"], f"{' '.join(args)}: загружены {run['heavy']}"
+    assert run["import_ms"] < IMPORT_TIME_BUDGET_MS, (
+        f"{' '.join(args)}: импорты {run['import_ms']:.0f} мс > {IMPORT_TIME_BUDGET_MS} мс"
+    )
+    return run
+
+
+def test_help_is_fast():
+    for args in (["--help"], ["process", "--help"], ["realign", "--help"], ["serve", "--help"]):
+        assert check_startup(args)["returncode"] == 0
+
+
+def test_argument_errors_are_fast():
+    assert check_startup(["--min-speakers", "abc", "audio.wav"])["returncode"] != 0
+    assert check_startup(["no_such_file.wav"])["returncode"] != 0
+
+
+def main():
+    print("🧪 Проверка времени старта CLI")
+    for test in (test_help_is_fast, test_argument_errors_are_fast):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Проверка потокового режима: разбиение на окна и стабильные метки спикеров
+"""
+
+import math
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from streaming import SpeakerRegistry, plan_windows
+
+
+def test_windows_cover_recording_once():
+    windows = list(plan_windows(0.0, 250.0, window=100.0, overlap=10.0))
+    assert windows[0] == (0.0, 100.0, 95.0)
+    assert windows[-1][1] == 250.0 and windows[-1][2] == math.inf
+
+    # Зоны фиксации идут встык: каждый момент записи принадлежит ровно одному окну
+    previous_commit = -math.inf
+    for window_start, window_end, commit in windows:
+        assert window_start <= max(previous_commit, 0.0) < commit
+        previous_commit = commit
+
+
+def test_short_recording_is_single_window():
+    assert list(plan_windows(5.0, 30.0, window=120.0, overlap=10.0)) == [(5.0, 30.0, math.inf)]
+
+
+def test_registry_matches_by_embeddings():
+    registry = SpeakerRegistry()
+    first = registry.assign(
+        [{"start": 0, "end": 5, "speaker": "SPEAKER_00"}, {"start": 5, "end": 9, "speaker": "SPEAKER_01"}],
+        {"SPEAKER_00": [1.0, 0.0], "SPEAKER_01": [0.0, 1.0]}
+    )
+    # Во втором окне pyannote назвал тех же людей наоборот
+    second = registry.assign(
+        [{"start": 20, "end": 25, "speaker": "SPEAKER_00"}, {"start": 25, "end": 30, "speaker": "SPEAKER_01"}],
+        {"SPEAKER_00": [0.1, 0.9], "SPEAKER_01": [0.9, 0.2]}
+    )
+    assert first == {"SPEAKER_00": "Спикер 1", "SPEAKER_01": "Спикер 2"}
+    assert second == {"SPEAKER_00": "Спикер 2", "SPEAKER_01": "Спикер 1"}
+
+
+def test_registry_falls_back_to_window_overlap():
+    registry = SpeakerRegistry()
+    registry.assign([{"start": 0, "end": 10, "speaker": "A"}, {"start": 10, "end": 20, "speaker": "B"}])
+    mapping = registry.assign([{"start": 16, "end": 20, "speaker": "X"}, {"start": 20, "end": 30, "speaker": "Y"}])
+    assert mapping == {"X": "Спикер 2", "Y": "Спикер 3"}
+
+
+def main():
+    print("🧪 Проверка потокового режима")
+    for test in (test_windows_cover_recording_once, test_short_recording_is_single_window,
+                 test_registry_matches_by_embeddings, test_registry_falls_back_to_window_overlap):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
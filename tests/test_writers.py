@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Проверка потоковых писателей: вывод совпадает с json.dump(indent=2) и pandas.to_csv
+(ожидаемый CSV записан литералом, pandas для тестов не нужен)
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from postprocessing import SegmentPostProcessor
+
+RESULT = {
+    "audio_file": "интервью \"1\".wav",
+    "transcription": "Привет, мир",
+    "segments": [
+        {"start": 0.0, "end": 1.5, "text": "Привет,", "speaker": "Спикер 1"},
+        {"start": 0.30000000000000004, "end": 1e-05, "text": "say \"hi\"\nagain", "speaker": "Unknown"},
+        {"start": 61.25, "end": 3600.125, "text": "", "speaker": "Спикер 2"},
+    ],
+    "language": "ru",
+    "has_speaker_diarization": True,
+    "transcription_time": 1.25,
+    "diarization_time": None,
+    "diarization_stats": {"segments_before_filter": 3, "nested": [1, {"a": []}]},
+    "time_window": {"start": 0.0, "end": None},
+}
+
+
+def save(result, compact=False):
+    processor = SegmentPostProcessor()
+    processor.compact_json = compact
+    directory = Path(tempfile.mkdtemp())
+    processor._save_results(result, directory, "test")
+    return directory
+
+
+def test_json_matches_json_dump():
+    for result in (RESULT, dict(RESULT, segments=[])):
+        directory = save(result)
+        expected = json.dumps(result, ensure_ascii=False, indent=2)
+        assert (directory / "test_result.json").read_text(encoding="utf-8") == expected
+
+
+def test_compact_json_roundtrip():
+    directory = save(RESULT, compact=True)
+    text = (directory / "test_result.json").read_text(encoding="utf-8")
+    assert "\n" not in text.replace("\\n", "")
+    assert json.loads(text) == RESULT
+
+
+# Вывод pd.DataFrame(RESULT["segments"]).to_csv(index=False, encoding="utf-8")
+EXPECTED_CSV = (
+    'start,end,text,speaker\n'
+    '0.0,1.5,"Привет,",Спикер 1\n'
+    '0.30000000000000004,1e-05,"say ""hi""\nagain",Unknown\n'
+    '61.25,3600.125,,Спикер 2\n'
+)
+
+
+def test_csv_matches_pandas():
+    directory = save(RESULT)
+    assert (directory / "test_segments.csv").read_bytes() == EXPECTED_CSV.encode("utf-8")
+
+
+def test_no_csv_without_segments():
+    directory = save(dict(RESULT, segments=[]))
+    assert not (directory / "test_segments.csv").exists()
+    assert (directory / "test_transcript.txt").exists()
+
+
+def main():
+    print("🧪 Проверка потоковых писателей результатов")
+    for test in (test_json_matches_json_dump, test_compact_json_roundtrip,
+                 test_csv_matches_pandas, test_no_csv_without_segments):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Потоковая запись результатов: JSON, CSV и TXT пополняются по мере готовности сегментов
+Формат файлов совпадает байт в байт с прежним экспортом (json.dump indent=2 и pandas to_csv)
+"""
+
+import csv
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class JSONResultWriter:
+    """
+    Запись результата с потоковым списком сегментов
+
+    Поля до "segments" пишутся при открытии, сегменты - по одному,
+    остальные поля - при закрытии. В режиме indent вывод совпадает с
+    json.dump(result, indent=2, ensure_ascii=False), в компактном - без отступов.
+    """
+
+    def __init__(self, path: Path, head: Dict, compact: bool = False):
+        """
+        Args:
+            path: Путь к *_result.json
+            head: Поля результата, идущие до списка сегментов
+            compact: Компактный JSON (без отступов и пробелов)
+        """
+        self.path = path
+        self.compact = compact
+        self.count = 0
+        self.file = open(path, "w", encoding="utf-8")
+
+        self.file.write("{" if compact else "{\n")
+        for key, value in head.items():
+            self._write_field(key, value)
+        self.file.write(self._key("segments") + "[")
+
+    def _dumps(self, value, depth: int) -> str:
+        if self.compact:
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        # Переводы строк внутри значений экранированы, поэтому отступ добавляется построчно
+        return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + "  " * depth)
+
+    def _key(self, key: str) -> str:
+        encoded = json.dumps(key, ensure_ascii=False)
+        return f"{encoded}:" if self.compact else f"  {encoded}: "
+
+    def _write_field(self, key: str, value):
+        self.file.write(self._key(key) + self._dumps(value, 1) + ("," if self.compact else ",\n"))
+
+    def write_segment(self, segment: Dict):
+        if self.compact:
+            prefix = "," if self.count else ""
+        else:
+            prefix = ",\n    " if self.count else "\n    "
+        self.file.write(prefix + self._dumps(segment, 2))
+        self.count += 1
+
+    def close(self, tail: Dict):
+        """Закрытие списка сегментов и запись оставшихся полей"""
+        if self.count and not self.compact:
+            self.file.write("\n  ")
+        self.file.write("]")
+
+        for key, value in tail.items():
+            self.file.write("," if self.compact else ",\n")
+            self.file.write(self._key(key) + self._dumps(value, 1))
+
+        self.file.write("}" if self.compact else "\n}")
+        self.file.close()
+
+
+class CSVSegmentWriter:
+    """
+    CSV сегментов через stdlib csv (формат pandas.DataFrame.to_csv(index=False))
+
+    Файл создается при первом сегменте: без сегментов CSV не пишется.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = None
+        self.writer = None
+        self.columns = None
+
+    def write_segment(self, segment: Dict):
+        if self.writer is None:
+            self.file = open(self.path, "w", encoding="utf-8", newline="")
+            self.writer = csv.writer(self.file, lineterminator=os.linesep)
+            self.columns = list(segment)
+            self.writer.writerow(self.columns)
+        self.writer.writerow([_csv_value(segment.get(column)) for column in self.columns])
+
+    def close(self) -> bool:
+        """Закрывает файл; True, если он был создан"""
+        if self.file is None:
+            return False
+        self.file.close()
+        return True
+
+
+def _csv_value(value):
+    """Значение ячейки как у pandas: None -> пустая строка, float - repr"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value)
+    return value
+
+
+class TranscriptWriter:
+    """Читаемый транскрипт по спикерам (*_transcript.txt)"""
+
+    def __init__(self, path: Path, audio_file: str, language: str,
+                 has_speaker_diarization: bool, transcription: str = ""):
+        self.path = path
+        self.diarized = has_speaker_diarization
+        self.current_speaker = None
+        self.file = open(path, "w", encoding="utf-8")
+
+        self.file.write(f"Транскрипция: {audio_file}\n")
+        self.file.write(f"Язык: {language}\n")
+        self.file.write(f"Диаризация: {'Да' if has_speaker_diarization else 'Нет'}\n\n")
+
+        if self.diarized:
+            self.file.write("=== ТРАНСКРИПЦИЯ ПО СПИКЕРАМ ===\n\n")
+        else:
+            self.file.write("=== ТРАНСКРИПЦИЯ ===\n\n")
+            self.file.write(transcription)
+
+    def write_segment(self, segment: Dict):
+        if not self.diarized:
+            return
+        if segment["speaker"] != self.current_speaker:
+            self.current_speaker = segment["speaker"]
+            self.file.write(f"\n[{self.current_speaker}]:\n")
+
+        start_time = f"{int(segment['start']//60):02d}:{int(segment['start']%60):02d}"
+        self.file.write(f"{start_time} - {segment['text']}\n")
+
+    def close(self):
+        self.file.close()
+
+
+class ResultWriter:
+    """
+    Все форматы результата сразу: сегменты добавляются по мере готовности
+
+    Пример:
+        writer = ResultWriter(output_path, base_name, head)
+        for segment in segments:
+            writer.write_segment(segment)
+        writer.close(tail)
+    """
+
+    def __init__(self, output_path: Path, base_name: str, head: Dict,
+                 language: str, has_speaker_diarization: bool, compact_json: bool = False):
+        """
+        Args:
+            output_path: Директория результатов
+            base_name: Имя файла без расширения
+            head: Поля результата до "segments" (audio_file, transcription)
+            language: Язык (для заголовка транскрипта)
+            has_speaker_diarization: Есть ли спикеры (формат транскрипта)
+            compact_json: JSON без отступов
+        """
+        self.json_path = output_path / f"{base_name}_result.json"
+        self.csv_path = output_path / f"{base_name}_segments.csv"
+        self.txt_path = output_path / f"{base_name}_transcript.txt"
+
+        self.json = JSONResultWriter(self.json_path, head, compact=compact_json)
+        self.csv = CSVSegmentWriter(self.csv_path)
+        self.txt = TranscriptWriter(self.txt_path, head.get("audio_file", ""), language,
+                                    has_speaker_diarization, head.get("transcription", ""))
+
+    def write_segment(self, segment: Dict):
+        self.json.write_segment(segment)
+        self.csv.write_segment(segment)
+        self.txt.write_segment(segment)
+
+    def close(self, tail: Optional[Dict] = None):
+        """Запись оставшихся полей результата и закрытие файлов"""
+        self.json.close(tail or {})
+        print(f"💾 Результат сохранен: {self.json_path}")
+
+        if self.csv.close():
+            print(f"💾 Сегменты сохранены: {self.csv_path}")
+
+        self.txt.close()
+        print(f"💾 Транскрипт сохранен: {self.txt_path}")